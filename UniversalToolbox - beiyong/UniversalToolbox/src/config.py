@@ -4,6 +4,7 @@ import pathlib
 import sys
 import time
 import importlib
+import threading
 import traceback
 from typing import Any, Callable
 
@@ -49,6 +50,33 @@ def safe_call(func: Callable, *args, **kwargs) -> Any:
         # log(traceback.format_exc(), level="DEBUG") 
         return None
 
+def run_background(func: Callable, on_done: Callable = None, *args, **kwargs) -> threading.Thread:
+    """
+    在后台守护线程中执行 func(*args, **kwargs)，避免阻塞 GUI。
+    完成后调用 on_done(result, exc)：成功时 exc 为 None，失败时 result 为 None。
+    GUI 已启动时回调通过 Tk 的 after() 调度到主线程执行，可以直接操作控件。
+    """
+    def worker():
+        result, exc = None, None
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            exc = e
+            func_name = getattr(func, '__name__', 'anonymous')
+            log(f"[ERROR] Background task {func_name} failed: {type(e).__name__}: {e}", level="ERROR")
+        if on_done is None:
+            return
+        import tkinter
+        root = getattr(tkinter, '_default_root', None)
+        if root is not None:
+            root.after(0, lambda: safe_call(on_done, result, exc))
+        else:
+            safe_call(on_done, result, exc)
+
+    thread = threading.Thread(target=worker, name=f"bg-{getattr(func, '__name__', 'task')}", daemon=True)
+    thread.start()
+    return thread
+
 # ----------------------------------------------------------------------
 # 3. 插件发现逻辑
 # ----------------------------------------------------------------------
@@ -0,0 +1,337 @@
+# conversion_bench.py
+
+"""
+数据转换基准测试（无界面）。
+
+生成可配置行数、列数、列类型和文本基数的合成数据表，把它写成 FORMAT_MAP 中的
+每种输入格式，然后对每一对 (输入格式, 输出格式) 和每个可用的读取引擎执行一次转换，
+记录耗时、峰值内存 (RSS) 和输出文件大小。每次转换都在独立的子进程中运行，
+峰值内存互不影响。
+
+结果可以保存为基线 JSON，之后的运行与基线对比，超出容差的耗时或内存即视为回归：
+
+    python conversion_bench.py --rows 200000 --save-baseline ~/bench_baseline.json
+    python conversion_bench.py --rows 200000 --baseline ~/bench_baseline.json
+
+基线记录的是绝对耗时和内存，只在生成它的机器上有意义，因此不随代码提交：
+每台机器先用 --save-baseline 生成自己的基线。基线中保存了机器信息（见 machine_info），
+与当前机器不一致时拒绝对比。
+
+--engines 模式不生成合成数据，而是用各读取引擎分别转换一个已有文件，对比 pandas 与 Arrow 的吞吐量：
+
+    python conversion_bench.py --engines data.csv --output-format Parquet --repeat 3
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import conversion_engine
+from conversion_engine import FORMAT_MAP, ENGINE_PANDAS, ENGINE_ARROW
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# ----------------------------------------------------------------------
+# 1. 合成数据
+# ----------------------------------------------------------------------
+
+DTYPES = ("int", "float", "str", "datetime", "bool")
+DEFAULT_DTYPES = ("int", "float", "str", "datetime")
+
+# 单次转换的结果。peak_rss_mb 在无法测量的平台上为 None
+BenchResult = namedtuple("BenchResult", ["input_format", "output_format", "engine", "rows",
+                                         "seconds", "peak_rss_mb", "output_bytes"])
+
+
+def make_table(rows: int, columns: int = 8, dtypes=DEFAULT_DTYPES, cardinality: int = 1000,
+               seed: int = 0) -> pd.DataFrame:
+    """
+    生成合成数据表。各列依次循环使用 dtypes 中的类型；
+    str 列从 cardinality 个随机单词中取值，用于模拟低基数或高基数文本。
+    """
+    unknown = set(dtypes) - set(DTYPES)
+    if unknown:
+        raise ValueError(f"未知的列类型: {', '.join(sorted(unknown))}")
+    rng = np.random.default_rng(seed)
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    words = np.array(["".join(rng.choice(letters, size=rng.integers(4, 12))) for _ in range(max(1, cardinality))])
+    data = {}
+    for i in range(columns):
+        kind = dtypes[i % len(dtypes)]
+        name = f"{kind}_{i}"
+        if kind == "int":
+            data[name] = rng.integers(-1_000_000, 1_000_000, size=rows)
+        elif kind == "float":
+            data[name] = rng.random(rows) * 1000
+        elif kind == "str":
+            data[name] = words[rng.integers(0, len(words), size=rows)]
+        elif kind == "datetime":
+            data[name] = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365 * 86400, size=rows), unit="s")
+        else:
+            data[name] = rng.random(rows) < 0.5
+    return pd.DataFrame(data)
+
+
+def write_table(df: pd.DataFrame, path, fmt: str, chunk_rows: int = conversion_engine.DEFAULT_CHUNK_ROWS):
+    """用转换引擎自身的写入器把数据表写成 fmt 格式。"""
+    writer = conversion_engine.open_writer(path, fmt)
+    try:
+        for start in range(0, max(1, len(df)), chunk_rows):
+            writer.write(df.iloc[start:start + chunk_rows])
+    finally:
+        writer.close()
+
+
+# ----------------------------------------------------------------------
+# 2. 执行
+# ----------------------------------------------------------------------
+
+def _peak_rss_mb():
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        # Windows 提供峰值工作集；其他平台的 psutil 只有当前 RSS，改用 getrusage
+        if hasattr(info, "peak_wset"):
+            return info.peak_wset / 2**20
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 以 KB 为单位，macOS 以字节为单位
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+    return None
+
+
+def _run_case(input_path, output_path, input_fmt, output_fmt, engine, chunk_rows) -> BenchResult:
+    """在子进程中执行的单次转换（必须位于模块顶层以便序列化）。"""
+    started = time.perf_counter()
+    result = conversion_engine.convert(input_path, output_path, input_fmt, output_fmt,
+                                       chunk_rows=chunk_rows, engine=engine)
+    seconds = time.perf_counter() - started
+    return BenchResult(input_fmt, output_fmt, result.engine, result.rows, round(seconds, 4),
+                       _round(_peak_rss_mb()), os.path.getsize(output_path))
+
+
+def _round(value):
+    return None if value is None else round(value, 1)
+
+
+def case_key(result) -> str:
+    return f"{result['input_format']}->{result['output_format']}/{result['engine']}"
+
+
+def _best_run(source, output_path, input_fmt, output_fmt, engine, repeat, chunk_rows):
+    """
+    执行 repeat 次转换，返回耗时最短的 BenchResult；引擎不支持此输入（已回退到其他引擎）时返回 None。
+    """
+    best = None
+    for _ in range(max(1, repeat)):
+        # 每次都使用新的子进程，峰值内存只反映这一次转换
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            result = pool.submit(_run_case, source, output_path, input_fmt, output_fmt, engine, chunk_rows).result()
+        if result.engine != engine:
+            return None
+        if best is None or result.seconds < best.seconds:
+            best = result
+    return best
+
+
+def run_benchmark(df: pd.DataFrame, formats=None, engines=(ENGINE_PANDAS, ENGINE_ARROW), repeat: int = 1,
+                  chunk_rows: int = conversion_engine.DEFAULT_CHUNK_ROWS, on_result=None) -> list:
+    """
+    对 formats 中每一对输入/输出格式和每个引擎执行转换，返回结果字典列表。
+    repeat > 1 时每个组合重复执行，取耗时最短的一次。引擎不支持的输入格式会被跳过。
+    """
+    formats = list(formats or FORMAT_MAP)
+    on_result = on_result or (lambda result: None)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = {}
+        for fmt in formats:
+            sources[fmt] = os.path.join(tmp, "source" + conversion_engine.format_ext(fmt))
+            write_table(df, sources[fmt], fmt, chunk_rows)
+        for input_fmt in formats:
+            for output_fmt in formats:
+                output_path = os.path.join(tmp, "output" + conversion_engine.format_ext(output_fmt))
+                for engine in engines:
+                    best = _best_run(sources[input_fmt], output_path, input_fmt, output_fmt, engine, repeat,
+                                     chunk_rows)
+                    if best is None:
+                        continue
+                    results.append(best._asdict())
+                    on_result(results[-1])
+    return results
+
+
+def compare_engines(input_path, input_fmt: str, output_fmt: str, engines=(ENGINE_PANDAS, ENGINE_ARROW),
+                    repeat: int = 1, chunk_rows: int = conversion_engine.DEFAULT_CHUNK_ROWS) -> list:
+    """用各读取引擎分别转换一个已有文件，返回结果字典列表；不支持该输入的引擎被跳过。"""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = os.path.join(tmp, "output" + conversion_engine.format_ext(output_fmt))
+        for engine in engines:
+            best = _best_run(input_path, output_path, input_fmt, output_fmt, engine, repeat, chunk_rows)
+            if best is not None:
+                results.append(best._asdict())
+    return results
+
+
+def format_of(path) -> str:
+    """按扩展名推断格式，无法推断时返回 None。"""
+    ext = os.path.splitext(path)[1].lower()
+    return next((fmt for fmt in FORMAT_MAP if conversion_engine.format_ext(fmt) == ext), None)
+
+
+# ----------------------------------------------------------------------
+# 3. 基线对比
+# ----------------------------------------------------------------------
+
+def machine_info() -> dict:
+    """标识基线所属的机器：主机名、系统、CPU 数和 Python 版本不同的结果不可比较。"""
+    return {"host": platform.node(), "system": platform.platform(), "cpus": os.cpu_count(),
+            "python": platform.python_version()}
+
+
+def load_baseline(path) -> dict:
+    with open(os.path.expanduser(path), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path, results: list, params: dict):
+    with open(os.path.expanduser(path), "w", encoding="utf-8") as f:
+        json.dump({"machine": machine_info(), "params": params, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+def compare(results: list, baseline: dict, tolerance: float = 0.2) -> list:
+    """
+    与基线对比，返回 [(case, 指标, 基线值, 当前值), ...] 形式的回归列表。
+    耗时或峰值内存超过基线的 (1 + tolerance) 倍即为回归；基线中不存在的组合不参与对比。
+    """
+    previous = {case_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        base = previous.get(case_key(result))
+        if base is None:
+            continue
+        for metric in ("seconds", "peak_rss_mb"):
+            old, new = base.get(metric), result.get(metric)
+            if old and new and new > old * (1 + tolerance):
+                regressions.append((case_key(result), metric, old, new))
+    return regressions
+
+
+def fastest_engines(results: list) -> dict:
+    """返回 {(输入格式, 输出格式): 最快的引擎}，用于选择默认引擎。"""
+    best = {}
+    for result in results:
+        pair = (result["input_format"], result["output_format"])
+        if pair not in best or result["seconds"] < best[pair]["seconds"]:
+            best[pair] = result
+    return {pair: result["engine"] for pair, result in best.items()}
+
+
+# ----------------------------------------------------------------------
+# 4. 命令行
+# ----------------------------------------------------------------------
+
+def _format_result(result: dict, base: dict = None) -> str:
+    rss = "-" if result["peak_rss_mb"] is None else f"{result['peak_rss_mb']:.0f} MB"
+    line = (f"{case_key(result):<26} {result['seconds']:8.3f}s {rss:>9} "
+            f"{result['output_bytes'] / 2**20:9.1f} MB")
+    if base and base.get("seconds"):
+        line += f"  ({result['seconds'] / base['seconds'] - 1:+.0%} 耗时)"
+    return line
+
+
+def _engines_main(args, parser):
+    input_fmt = args.input_format or format_of(args.engines)
+    if input_fmt not in FORMAT_MAP:
+        parser.error("无法从扩展名推断输入格式，请指定 --input-format")
+    output_fmt = args.output_format or input_fmt
+    if output_fmt not in FORMAT_MAP:
+        parser.error(f"不支持的格式: {output_fmt}")
+    results = compare_engines(args.engines, input_fmt, output_fmt, repeat=args.repeat, chunk_rows=args.chunk_rows)
+    baseline = next((r["seconds"] for r in results if r["engine"] == ENGINE_PANDAS), None)
+    print(f"{'组合':<26} {'耗时':>9} {'峰值内存':>9} {'输出大小':>12} {'行/秒':>14}")
+    for result in results:
+        speedup = f"  x{baseline / result['seconds']:.2f}" if baseline and result["seconds"] else ""
+        rate = result["rows"] / max(result["seconds"], 1e-9)
+        print(f"{_format_result(result)} {rate:>14,.0f}{speedup}")
+    return 0
+
+
+def _main(argv=None):
+    parser = argparse.ArgumentParser(description="数据格式转换基准测试")
+    parser.add_argument("--rows", type=int, default=100_000, help="合成数据的行数")
+    parser.add_argument("--columns", type=int, default=8, help="合成数据的列数")
+    parser.add_argument("--dtypes", default=",".join(DEFAULT_DTYPES),
+                        help=f"逗号分隔的列类型，可选 {', '.join(DTYPES)}")
+    parser.add_argument("--cardinality", type=int, default=1000, help="文本列的不同取值个数")
+    parser.add_argument("--formats", default=",".join(FORMAT_MAP), help="逗号分隔的参与测试的格式")
+    parser.add_argument("--repeat", type=int, default=1, help="每个组合重复次数，取最佳耗时")
+    parser.add_argument("--chunk-rows", type=int, default=conversion_engine.DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--baseline", help="与本机生成的基线 JSON 对比，存在回归时退出码为 1")
+    parser.add_argument("--save-baseline", help="把本次结果保存为基线 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="判定回归的相对容差")
+    parser.add_argument("--engines", metavar="FILE", help="对比各读取引擎转换该文件的吞吐量（不生成合成数据）")
+    parser.add_argument("--input-format", help="--engines 模式的输入格式，默认按扩展名推断")
+    parser.add_argument("--output-format", help="--engines 模式的输出格式，默认与输入相同")
+    args = parser.parse_args(argv)
+    if args.engines:
+        return _engines_main(args, parser)
+
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in FORMAT_MAP]
+    if unknown:
+        parser.error(f"不支持的格式: {', '.join(unknown)}")
+    params = {"rows": args.rows, "columns": args.columns, "dtypes": args.dtypes,
+              "cardinality": args.cardinality, "chunk_rows": args.chunk_rows}
+    baseline = load_baseline(args.baseline) if args.baseline else None
+    if baseline and baseline.get("machine") != machine_info():
+        print(f"基线来自另一台机器 ({baseline.get('machine')})，绝对耗时和内存无法比较。"
+              f"请先在本机用 --save-baseline 重新生成基线。")
+        return 2
+    if baseline and baseline.get("params") != params:
+        print(f"警告: 基线的数据参数与本次不同 ({baseline.get('params')})，对比结果仅供参考")
+    previous = {case_key(r): r for r in (baseline or {}).get("results", [])}
+
+    df = make_table(args.rows, args.columns, tuple(d.strip() for d in args.dtypes.split(",")), args.cardinality)
+    print(f"{'组合':<26} {'耗时':>9} {'峰值内存':>9} {'输出大小':>12}")
+    results = run_benchmark(df, formats, repeat=args.repeat, chunk_rows=args.chunk_rows,
+                            on_result=lambda r: print(_format_result(r, previous.get(case_key(r)))))
+
+    print("\n各格式组合最快的引擎:")
+    for (input_fmt, output_fmt), engine in fastest_engines(results).items():
+        print(f"  {input_fmt} -> {output_fmt}: {engine}")
+
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results, params)
+        print(f"\n基线已保存: {args.save_baseline}")
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n发现 {len(regressions)} 项回归 (容差 {args.tolerance:.0%}):")
+            for case, metric, old, new in regressions:
+                print(f"  {case}: {metric} {old} -> {new}")
+            return 1
+        print("\n未发现回归。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main())
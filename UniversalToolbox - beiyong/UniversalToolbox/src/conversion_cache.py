@@ -0,0 +1,293 @@
+# conversion_cache.py
+
+"""
+数据转换结果的内容寻址缓存。
+
+缓存键由输入文件指纹（大小、mtime，可选的内容哈希）、转换选项和目标格式计算得到；
+转换产物保存在 CONFIG_DIR/conversion_cache/objects/ 下，索引保存在同目录的 SQLite 数据库中
+（WAL 模式，批量转换的多个进程可以同时读写）。
+
+对未变化的输入重复执行同一转换时：
+- 输出文件就是上次由缓存写出且未被修改过的文件：什么也不做；
+- 否则把缓存产物克隆到输出路径（文件系统支持 reflink 时写时复制，否则完整复制）。
+产物与输出文件从不共享 inode：写入器以 "wb" 就地截断输出文件，硬链接会让同一产物的
+其他输出和缓存本身被一起改写。产物的大小和 mtime 在入库时记录，使用前校验，不一致的产物会被丢弃。
+缓存总大小超过上限时按最近使用时间 (LRU) 淘汰。
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import pathlib
+import threading
+from collections import namedtuple
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import config
+    log = config.log
+except ImportError:
+    config = None
+    def log(*args, level="INFO"):
+        print(f"[{time.strftime('%H:%M:%S')}] [{level}] [CACHE] {' '.join(str(a) for a in args)}")
+
+
+_APP_DIR = pathlib.Path(config.APP_DIR) if config else pathlib.Path(__file__).resolve().parent
+CACHE_DIR = pathlib.Path(getattr(config, "CONFIG_DIR", _APP_DIR / "config")) / "conversion_cache"
+
+# 缓存总大小上限
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+# 计算内容哈希时每次读取的字节数
+HASH_BLOCK = 8 * 1024 * 1024
+# Linux 的 FICLONE ioctl（btrfs、XFS 等支持 reflink 的文件系统）
+_FICLONE = 0x40049409 if fcntl is not None and sys.platform.startswith("linux") else None
+
+# 缓存命中的方式
+RESTORE_CURRENT = "current"   # 输出已是最新，未做任何操作
+RESTORE_CLONED = "cloned"    # reflink，写时复制
+RESTORE_COPIED = "copied"
+
+# 一次命中：how 为上面三种方式之一，rows / chunks 为原转换的统计
+CacheHit = namedtuple("CacheHit", ["how", "rows", "chunks"])
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    chunks INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outputs (
+    path TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+
+def clone_file(src, dst) -> str:
+    """把 src 的内容写到新文件 dst：优先 reflink，不支持时完整复制。返回 RESTORE_CLONED 或 RESTORE_COPIED。"""
+    if _FICLONE is not None:
+        try:
+            with open(src, "rb") as s, open(dst, "wb") as d:
+                fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+            return RESTORE_CLONED
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
+    return RESTORE_COPIED
+
+
+def content_hash(path) -> str:
+    """文件内容的 BLAKE2b 摘要。"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ConversionCache:
+    """
+    转换产物缓存。所有方法都可以在任意线程或进程中调用（每次操作使用独立的数据库连接）。
+    hash_content 为真时缓存键使用输入文件的内容哈希而不是路径和 mtime：
+    内容相同的文件（复制、重命名、touch 之后）也能命中，但每次都要完整读取一遍输入。
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES, hash_content: bool = False):
+        self.root = pathlib.Path(root)
+        self.objects_dir = self.root / "objects"
+        self.db_path = self.root / "index.sqlite3"
+        self.max_bytes = max_bytes
+        self.hash_content = hash_content
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    # --- 存储 ---
+
+    def _connect(self):
+        with self._init_lock:
+            if not self._initialized:
+                self.objects_dir.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._init_lock:
+            if not self._initialized:
+                conn.executescript(_SCHEMA)
+                self._initialized = True
+        return conn
+
+    def _object_path(self, key: str) -> pathlib.Path:
+        return self.objects_dir / key[:2] / key
+
+    # --- 键 ---
+
+    def key(self, input_path, options: dict) -> str:
+        """由输入指纹和转换选项（必须可以 JSON 序列化，包含目标格式）计算缓存键。"""
+        st = os.stat(input_path)
+        if self.hash_content:
+            fingerprint = {"size": st.st_size, "hash": content_hash(input_path)}
+        else:
+            fingerprint = {"path": os.path.abspath(input_path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        text = json.dumps({"input": fingerprint, "options": options}, sort_keys=True, default=str)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    # --- 查询与恢复 ---
+
+    def restore(self, key: str, output_path) -> Optional[CacheHit]:
+        """缓存中存在该键时把产物恢复到 output_path 并返回 CacheHit，否则返回 None。"""
+        output_path = os.path.abspath(output_path)
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT size, mtime_ns, rows, chunks FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            size, mtime_ns, rows, chunks = row
+            obj = self._object_path(key)
+            try:
+                st = obj.stat()
+            except OSError:
+                st = None
+            if st is None or (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                # 产物丢失或被就地修改，不再可信
+                self._drop(conn, key)
+                conn.commit()
+                return None
+
+            how = None
+            current = conn.execute("SELECT key, size, mtime_ns FROM outputs WHERE path = ?", (output_path,)).fetchone()
+            if current is not None and current[0] == key:
+                try:
+                    out = os.stat(output_path)
+                    if (out.st_size, out.st_mtime_ns) == current[1:]:
+                        how = RESTORE_CURRENT
+                except OSError:
+                    pass
+            if how is None:
+                how = self._materialize(obj, output_path)
+                out = os.stat(output_path)
+                conn.execute("INSERT OR REPLACE INTO outputs (path, key, size, mtime_ns) VALUES (?, ?, ?, ?)",
+                             (output_path, key, out.st_size, out.st_mtime_ns))
+            conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            return CacheHit(how, rows, chunks)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _materialize(obj: pathlib.Path, output_path: str) -> str:
+        """把产物克隆到 output_path（先写临时文件再替换，已有的输出文件不会被就地截断）。"""
+        if os.path.dirname(output_path):
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        tmp_path = f"{output_path}.cache-tmp"
+        try:
+            how = clone_file(obj, tmp_path)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        return how
+
+    # --- 写入 ---
+
+    def store(self, key: str, output_path, rows: int, chunks: int):
+        """把刚写出的 output_path 克隆到缓存，然后按需淘汰。超过缓存上限的产物不缓存。"""
+        output_path = os.path.abspath(output_path)
+        if os.path.getsize(output_path) > self.max_bytes:
+            return
+        obj = self._object_path(key)
+        obj.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = obj.with_name(f"{obj.name}.{os.getpid()}.tmp")
+        try:
+            clone_file(output_path, tmp_path)
+            os.replace(tmp_path, obj)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        st = obj.stat()
+        out = os.stat(output_path)
+        conn = self._connect()
+        try:
+            conn.execute("INSERT OR REPLACE INTO entries (key, size, mtime_ns, rows, chunks, last_used) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", (key, st.st_size, st.st_mtime_ns, rows, chunks, time.time()))
+            conn.execute("INSERT OR REPLACE INTO outputs (path, key, size, mtime_ns) VALUES (?, ?, ?, ?)",
+                         (output_path, key, out.st_size, out.st_mtime_ns))
+            self._evict(conn)
+            conn.commit()
+        finally:
+            conn.close()
+
+    # --- 淘汰 ---
+
+    def _drop(self, conn, key: str):
+        conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        conn.execute("DELETE FROM outputs WHERE key = ?", (key,))
+        try:
+            self._object_path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            self._drop(conn, key)
+            total -= size
+            log(f"转换缓存已淘汰 {key[:12]} ({size / 2**20:.1f} MB)")
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        """删除全部缓存。"""
+        conn = self._connect()
+        try:
+            for (key,) in conn.execute("SELECT key FROM entries").fetchall():
+                self._drop(conn, key)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def stats(self) -> tuple:
+        """返回 (条目数, 总字节数)。"""
+        conn = self._connect()
+        try:
+            return tuple(conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone())
+        finally:
+            conn.close()
+
+
+# ----------------------------------------------------------------------
+# 进程内共享实例
+# ----------------------------------------------------------------------
+
+_caches = {}
+_cache_lock = threading.Lock()
+
+
+def get_cache(hash_content: bool = False) -> ConversionCache:
+    """返回共享的缓存实例；两种指纹方式共用同一个缓存目录和容量上限（键不同，互不命中）。"""
+    with _cache_lock:
+        if hash_content not in _caches:
+            _caches[hash_content] = ConversionCache(hash_content=hash_content)
+        return _caches[hash_content]
@@ -0,0 +1,1805 @@
+# conversion_engine.py
+
+"""
+数据格式转换引擎（无界面）。
+
+data_converter 插件通过它完成实际的读写。转换以流式方式进行：
+- 读取端按块产出 DataFrame：CSV 使用 chunksize，JSON Lines 按行分块，JSON 记录数组
+  增量解析（安装了 orjson 时用它解析），Parquet 按行组批次读取。
+- 写入端逐块追加：CSV / JSON / JSON Lines 直接追加文本，Parquet 通过 ParquetWriter 逐块写入行组。
+因此峰值内存由块大小而不是文件大小决定。
+文本输出可以用 gzip / bz2 / xz / zstd 压缩：数据按块交给线程池并行压缩，与解析和编码重叠；
+Parquet 可选 snappy / zstd / lz4 / gzip 等编码和压缩级别，行组的编码与压缩在后台线程中进行。
+无法分块读取的输入（自定义格式）退化为整体读入后作为单块处理。
+
+Excel 不经过 pandas 的 read_excel / to_excel（它们会构建完整的 openpyxl 对象模型）：
+读取时使用 python-calamine（若已安装且工作表不超过 EXCEL_IN_MEMORY_LIMIT），
+否则使用 openpyxl 的只读模式逐行流式读取；写入时使用 xlsxwriter 的 constant_memory 模式
+（未安装时用 openpyxl 的 write_only 工作簿），写满一个工作表后续写到下一个工作表。
+
+读取引擎有两种：pandas，以及 Arrow 原生引擎（pyarrow.csv.open_csv 多线程解析、
+pyarrow.json、pyarrow.parquet）。Arrow 引擎直接产出 RecordBatch，写入 CSV / Parquet
+时全程不经过 pandas；Excel 始终使用 pandas。
+
+转换过程通过 ConversionProgress 报告已读字节数和已处理行数，
+并在块与块之间检查取消标志；取消或失败时会删除未写完的输出文件。
+
+CSV 的编码在转换前通过对文件头、中、尾部采样一次性确定，并按文件指纹缓存，
+不会因为深处的解码错误而整体重新解析。
+
+可选的类型优化根据第一块推断更紧凑的列类型（整数/浮点降级、低基数文本转分类、
+日期时间解析），推断结果按文件指纹缓存并应用到后续所有数据块。
+
+preview 只读取文件头部若干行和元数据（Parquet 的行数与表结构来自文件尾部的元数据），
+用于在转换前快速查看表结构和样本数据，耗时与文件大小基本无关。
+
+可以只转换部分列和满足筛选条件的行：列投影和行筛选下推到读取端——CSV 只解析选中的列
+（pandas 的 usecols / Arrow 的 include_columns），Parquet 通过 Arrow 数据集扫描只读取选中的列，
+并按行组统计信息跳过不满足条件的行组；其余格式在解析每块后立即筛选。
+因此耗时和内存随选中的子集而不是整个文件增长。
+
+批量转换把一个目录或 glob 匹配到的文件分发到进程池中并行转换。
+
+传入 ConversionCache（见 conversion_cache）时，输入和选项都未变化的重复转换直接从缓存恢复输出。
+"""
+
+import io
+import os
+import re
+import ast
+import bz2
+import gzip
+import json
+import lzma
+import queue
+import operator
+import codecs
+import zipfile
+import glob
+import time
+import datetime
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import conversion_cache
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:
+    np = pd = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Excel 读写引擎（均为可选）
+try:
+    import python_calamine
+except ImportError:
+    python_calamine = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute
+    import pyarrow.csv as pa_csv
+    import pyarrow.json as pa_json
+    import pyarrow.dataset as pa_ds
+    import pyarrow.parquet as pq
+    HAS_PARQUET = True
+except ImportError:
+    pa = pa_csv = pa_json = pa_ds = pq = None
+    HAS_PARQUET = False
+
+try:
+    import config
+    log = config.log
+except ImportError:
+    def log(*args, level="INFO"):
+        print(f"[{time.strftime('%H:%M:%S')}] [{level}] [CONVERT] {' '.join(str(a) for a in args)}")
+
+
+# ----------------------------------------------------------------------
+# 1. 格式定义
+# ----------------------------------------------------------------------
+
+# 映射格式名到其扩展名、pandas 读取和写入函数
+FORMAT_MAP = {
+    "CSV": {
+        "ext": ".csv",
+        "read": "read_csv",
+        "write": "to_csv"
+    },
+    "Excel": {
+        "ext": ".xlsx",
+        "read": "read_excel",
+        "write": "to_excel"
+    },
+    "JSON": {
+        "ext": ".json",
+        "read": "read_json",
+        "write": "to_json"
+    },
+    # 每行一个 JSON 对象（日志常用的 NDJSON）
+    "JSONL": {
+        "ext": ".jsonl",
+        "read": "read_json",
+        "write": "to_json"
+    },
+}
+
+# 动态添加 Parquet (如果依赖存在)
+if HAS_PARQUET:
+    FORMAT_MAP["Parquet"] = {
+        "ext": ".parquet",
+        "read": "read_parquet",
+        "write": "to_parquet"
+    }
+
+SUPPORTED_FORMATS = list(FORMAT_MAP.keys())
+
+# 每块的默认行数
+DEFAULT_CHUNK_ROWS = 100_000
+
+# CSV 默认编码
+CSV_ENCODING = "utf-8"
+
+# 编码探测：依次尝试的候选编码（gb18030 是 gbk 的超集，放在最后）
+CSV_CANDIDATE_ENCODINGS = ("utf-8", "gbk", "gb18030")
+# 编码探测时在文件头、中、尾各读取的字节数
+ENCODING_SAMPLE_BYTES = 64 * 1024
+
+# Excel 单个工作表的最大行数（含表头）
+EXCEL_MAX_ROWS = 1_048_576
+# 工作表 XML 解压后的总大小不超过该值时用 calamine 读取（整张表载入内存，约快 10 倍）；
+# 超过时改用 openpyxl 只读模式逐行读取，内存占用与行数无关
+EXCEL_IN_MEMORY_LIMIT = 128 * 1024 * 1024
+
+# 增量解析 JSON 记录数组时每次读取的字节数
+JSON_READ_BLOCK = 1024 * 1024
+
+# 预览读取的行数，以及估算 CSV / JSON Lines 总行数时采样的字节数
+PREVIEW_ROWS = 1000
+PREVIEW_SAMPLE_BYTES = 1024 * 1024
+
+# 读取引擎。auto: 格式支持且已安装 pyarrow 时使用 Arrow 引擎，否则使用 pandas
+ENGINE_AUTO = "auto"
+ENGINE_PANDAS = "pandas"
+ENGINE_ARROW = "arrow"
+ENGINES = [ENGINE_AUTO, ENGINE_PANDAS, ENGINE_ARROW]
+
+# Arrow 引擎可以直接读取的格式（JSON 仅限 JSON Lines）
+_ARROW_READ_FORMATS = {"CSV", "JSON", "JSONL", "Parquet"}
+
+# Arrow 读取 CSV / JSON 时每块的字节数（也是多线程解析的粒度）
+ARROW_BLOCK_SIZE = 16 * 1024 * 1024
+
+# 压缩方式。文本格式默认不压缩，Parquet 默认使用 pyarrow 的默认编码 snappy
+COMPRESSION_NONE = "none"
+_TEXT_OUTPUT_FORMATS = ("CSV", "JSON", "JSONL")
+TEXT_CODECS = ("gzip", "bz2", "xz", "zstd")
+PARQUET_CODECS = ("snappy", "zstd", "lz4", "gzip", "brotli")
+# 未指定级别时 Parquet 使用的级别（Arrow 的 gzip 默认最高级别 9，速度很慢）
+PARQUET_DEFAULT_LEVELS = {"gzip": 6}
+# 压缩后的文本输出在格式扩展名后追加的扩展名
+COMPRESSION_EXT = {"gzip": ".gz", "bz2": ".bz2", "xz": ".xz", "zstd": ".zst"}
+# 文本压缩的 (最低, 最高, 默认) 级别
+TEXT_COMPRESSION_LEVELS = {"gzip": (1, 9, 6), "bz2": (1, 9, 9), "xz": (0, 9, 6), "zstd": (1, 22, 3)}
+# 文本压缩时每个独立压缩块的大小，以及并行压缩的线程数
+COMPRESSION_BLOCK = 4 * 1024 * 1024
+COMPRESSION_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+# 一次转换的结果
+# total_rows 为总行数；estimated 为真时它是按采样估算的近似值，为 None 表示未知
+PreviewResult = namedtuple("PreviewResult", ["columns", "dtypes", "rows", "total_rows", "estimated", "encoding"])
+
+# memory 为类型优化前后第一块的内存占用 (before, after)，未启用优化时为 None；
+# cached 为从缓存恢复输出的方式（conversion_cache.RESTORE_*），实际执行了转换时为 None
+ConversionResult = namedtuple("ConversionResult",
+                              ["output_path", "rows", "chunks", "elapsed", "engine", "encoding", "memory", "cached"])
+
+
+def format_ext(fmt: str) -> str:
+    """返回格式的扩展名；未知格式按格式名推断。"""
+    return FORMAT_MAP[fmt]['ext'] if fmt in FORMAT_MAP else f".{fmt.lower()}"
+
+
+def default_output_path(input_path, input_fmt: str, output_fmt: str, output_dir=None, compression=None) -> str:
+    """
+    根据输入文件和输出格式生成默认输出路径；output_dir 为空时与输入文件放在同一目录。
+    文本输出启用压缩时追加压缩扩展名（如 .csv.gz）。
+    """
+    base_name = os.path.splitext(input_path)[0]
+    if output_dir:
+        base_name = os.path.join(output_dir, os.path.basename(base_name))
+    if output_fmt not in FORMAT_MAP:
+        return f"{base_name}{format_ext(output_fmt)}"
+
+    # 移除输入文件原有的扩展名，避免出现 file.csv.xlsx 的情况
+    parts = base_name.rsplit('.', 1)
+    known_extensions = [v['ext'].strip('.') for v in FORMAT_MAP.values()]
+    clean_base_name = parts[0] if len(parts) > 1 and parts[-1] in known_extensions else base_name
+
+    # 如果输入输出格式相同，添加 '_converted'
+    suffix = "_converted" if input_fmt == output_fmt else ""
+    compression_ext = COMPRESSION_EXT.get(compression, "") if output_fmt in _TEXT_OUTPUT_FORMATS else ""
+    return f"{clean_base_name}{suffix}{FORMAT_MAP[output_fmt]['ext']}{compression_ext}"
+
+
+def pandas_func_name(fmt: str, prefix: str) -> str:
+    """返回格式对应的 pandas 函数名；未知格式按约定推断 (e.g., HDF5 -> read_hdf5, to_hdf5)。"""
+    if fmt in FORMAT_MAP:
+        return FORMAT_MAP[fmt]['read' if prefix == 'read' else 'write']
+    return f"{prefix}_{fmt.lower()}"
+
+
+# ----------------------------------------------------------------------
+# 2. 编码探测
+# ----------------------------------------------------------------------
+
+class _FingerprintCache:
+    """以文件指纹 (绝对路径, 大小, mtime_ns) 及附加键为键的进程内缓存；超出容量时淘汰最早的条目。"""
+
+    def __init__(self, max_entries: int = 1024):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._max_entries = max_entries
+
+    @staticmethod
+    def key(path, *extra) -> tuple:
+        st = os.stat(path)
+        return (os.path.abspath(path), st.st_size, st.st_mtime_ns) + extra
+
+    def get(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, value):
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self._max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = value
+
+
+_encodings = _FingerprintCache()
+
+
+def _read_samples(path) -> list:
+    """读取文件头、中、尾三段样本；小文件直接整体作为一个样本。"""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if size <= 3 * ENCODING_SAMPLE_BYTES:
+            return [f.read()]
+        samples = []
+        for offset in (0, size // 2, size - ENCODING_SAMPLE_BYTES):
+            f.seek(offset)
+            samples.append(f.read(ENCODING_SAMPLE_BYTES))
+        return samples
+
+
+def _decodes(sample: bytes, encoding: str, at_start: bool) -> bool:
+    """
+    判断样本能否按 encoding 解码。
+    文件中部/尾部的样本可能从多字节字符中间开始，允许跳过开头最多 3 个字节；
+    样本末尾被截断的字符不视为错误。
+    """
+    for skip in ((0,) if at_start else range(4)):
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(sample[skip:], final=False)
+            return True
+        except UnicodeDecodeError:
+            continue
+    return False
+
+
+def detect_encoding(path) -> str:
+    """
+    对文件头、中、尾采样，一次性确定 CSV 的文本编码（utf-8 / utf-8-sig / gbk / gb18030）。
+    结果按 (路径, 大小, mtime) 缓存，文件未变化时不会重复探测。
+    """
+    key = _encodings.key(path)
+    cached = _encodings.get(key)
+    if cached is not None:
+        return cached
+
+    samples = _read_samples(path)
+    if samples[0].startswith(codecs.BOM_UTF8):
+        encoding = "utf-8-sig"
+    else:
+        # 都无法解码时使用覆盖范围最大的 gb18030，由解析器报告具体错误
+        encoding = next((enc for enc in CSV_CANDIDATE_ENCODINGS
+                         if all(_decodes(sample, enc, i == 0) for i, sample in enumerate(samples))),
+                        CSV_CANDIDATE_ENCODINGS[-1])
+
+    _encodings.put(key, encoding)
+    return encoding
+
+
+# ----------------------------------------------------------------------
+# 3. 类型优化
+# ----------------------------------------------------------------------
+
+# 文本列的不同值个数不超过非空值的该比例（且不超过 CATEGORY_MAX_VALUES）时转为分类类型
+CATEGORY_MAX_RATIO = 0.5
+CATEGORY_MAX_VALUES = 65535
+# 文本列中能被解析为日期时间的比例达到该值时转为 datetime
+DATETIME_MIN_RATIO = 0.95
+# 只有形如 2024-01-31 开头的文本才尝试按日期时间解析，避免对普通文本做昂贵的解析
+_DATETIME_PREFIX = re.compile(r"^\d{4}-\d{1,2}-\d{1,2}")
+
+_UNSIGNED_INTS = ("uint8", "uint16", "uint32", "uint64")
+_SIGNED_INTS = ("int8", "int16", "int32", "int64")
+
+# (指纹, 输入格式) -> 类型计划
+_dtype_plans = _FingerprintCache()
+
+
+def _narrowest_int(lo: int, hi: int) -> str:
+    for name in (_UNSIGNED_INTS if lo >= 0 else _SIGNED_INTS):
+        info = np.iinfo(name)
+        if info.min <= lo and hi <= info.max:
+            return name
+    return "int64"
+
+
+def _widen_int(target: str, lo: int, hi: int) -> str:
+    """返回同时容纳 target 的取值范围和 [lo, hi] 的最窄整数类型。"""
+    info = np.iinfo(target)
+    return _narrowest_int(min(lo, int(info.min)), max(hi, int(info.max)))
+
+
+def _to_datetime(col):
+    try:
+        return pd.to_datetime(col, errors='coerce', format='ISO8601')
+    except (TypeError, ValueError):
+        # pandas < 2.0 不支持 format='ISO8601'
+        return pd.to_datetime(col, errors='coerce')
+
+
+def infer_dtype_plan(df) -> dict:
+    """
+    根据样本块推断每列更紧凑的类型，返回 {列名: 目标类型}，目标类型为
+    'int8' ... 'uint64'、'float32'（采样值可无损表示时）、'category' 或 'datetime'。
+    未列出的列保持原类型。
+    """
+    plan = {}
+    for name in df.columns:
+        col = df[name]
+        if pd.api.types.is_bool_dtype(col) or isinstance(col.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_integer_dtype(col):
+            if len(col):
+                target = _narrowest_int(int(col.min()), int(col.max()))
+                if target != str(col.dtype):
+                    plan[name] = target
+        elif pd.api.types.is_float_dtype(col):
+            values = col.to_numpy(dtype=np.float64)
+            if col.dtype == np.float64 and np.array_equal(values.astype(np.float32), values, equal_nan=True):
+                plan[name] = 'float32'
+        elif pd.api.types.is_string_dtype(col) or pd.api.types.is_object_dtype(col):
+            non_null = col.dropna()
+            if non_null.empty:
+                continue
+            first = non_null.iloc[0]
+            if isinstance(first, str) and _DATETIME_PREFIX.match(first):
+                if _to_datetime(non_null).notna().mean() >= DATETIME_MIN_RATIO:
+                    plan[name] = 'datetime'
+                    continue
+            nunique = non_null.nunique()
+            if nunique <= CATEGORY_MAX_VALUES and nunique <= len(non_null) * CATEGORY_MAX_RATIO:
+                plan[name] = 'category'
+    return plan
+
+
+def apply_dtype_plan(df, plan: dict):
+    """
+    按类型计划转换一个 DataFrame 数据块。
+    某块的整数超出计划类型的范围时，该列放宽到能容纳的最窄类型；某块的浮点数无法
+    用 float32 无损表示、或文本无法全部解析为日期时间时，该列从计划中移除。plan 同步更新。
+    """
+    for name, target in list(plan.items()):
+        if name not in df.columns:
+            continue
+        col = df[name]
+        if target == 'category':
+            df[name] = col.astype('category')
+        elif target == 'datetime':
+            parsed = _to_datetime(col)
+            if parsed.isna().sum() > col.isna().sum():
+                del plan[name]
+            else:
+                df[name] = parsed
+        elif target == 'float32':
+            if pd.api.types.is_float_dtype(col):
+                narrowed = col.astype('float32')
+                if np.array_equal(narrowed.to_numpy(dtype=np.float64), col.to_numpy(dtype=np.float64), equal_nan=True):
+                    df[name] = narrowed
+                else:
+                    del plan[name]
+        elif pd.api.types.is_integer_dtype(col):
+            if len(col):
+                target = plan[name] = _widen_int(target, int(col.min()), int(col.max()))
+            df[name] = col.astype(target)
+    return df
+
+
+def _apply_dtype_plan_arrow(batch, plan: dict):
+    """Arrow 引擎下的 apply_dtype_plan：整数/浮点转换、字典编码和时间戳解析都在 Arrow 内完成。"""
+    arrays = []
+    for field, col in zip(batch.schema, batch.columns):
+        target = plan.get(field.name)
+        try:
+            if target == 'category':
+                if not pa.types.is_dictionary(col.type):
+                    col = col.dictionary_encode()
+            elif target == 'datetime':
+                if pa.types.is_string(col.type) or pa.types.is_large_string(col.type):
+                    col = col.cast(pa.timestamp('us'))
+            elif target == 'float32':
+                if pa.types.is_floating(col.type):
+                    narrowed = col.cast(pa.float32(), safe=False)
+                    if narrowed.cast(col.type).equals(col):
+                        col = narrowed
+                    else:
+                        del plan[field.name]
+            elif target and pa.types.is_integer(col.type):
+                bounds = pa.compute.min_max(col)
+                if bounds['min'].is_valid:
+                    target = plan[field.name] = _widen_int(target, bounds['min'].as_py(), bounds['max'].as_py())
+                col = col.cast(getattr(pa, target)())
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            # 无法转换（如文本不是合法的时间戳）时该列保持原类型，后续块也不再转换
+            plan.pop(field.name, None)
+        arrays.append(col)
+    return pa.RecordBatch.from_arrays(arrays, names=batch.schema.names)
+
+
+def _memory_bytes(chunk) -> int:
+    if HAS_PARQUET and isinstance(chunk, pa.RecordBatch):
+        return chunk.nbytes
+    return int(chunk.memory_usage(deep=True).sum())
+
+
+# ----------------------------------------------------------------------
+# 4. 分块读取
+# ----------------------------------------------------------------------
+
+def _is_json_lines(path) -> bool:
+    """JSON 文件以 '[' 开头为记录数组，否则视为每行一个对象的 JSON Lines。"""
+    with open(path, "rb") as f:
+        head = f.read(4096).lstrip(b"\xef\xbb\xbf \t\r\n")
+    return not head.startswith(b"[")
+
+
+# 记录数组中两条记录之间的空白和逗号
+_JSON_ARRAY_GAP = re.compile(r"[\s,]*")
+# 可能是两条记录之间的边界：'}' 后跟逗号
+_JSON_RECORD_END = re.compile(r"\}\s*,")
+# 快速路径最多尝试的候选边界数
+_JSON_BOUNDARY_ATTEMPTS = 4
+
+_json_loads = orjson.loads if orjson is not None else json.loads
+_json_decoder = json.JSONDecoder()
+
+
+def _parse_json_records(buf: str, records: list, eof: bool) -> tuple:
+    """
+    从 buf 中解析尽可能多的完整记录追加到 records，返回 (未解析的剩余文本, 是否已到数组末尾)。
+
+    快速路径把最后一个候选边界之前的文本作为一个数组整体解析（安装了 orjson 时用它）。
+    边界若落在字符串或嵌套对象内部，前面的文本必然含有未闭合的引号或括号而解析失败，
+    此时改试更早的边界；都失败时逐条 raw_decode。
+    """
+    pos = _JSON_ARRAY_GAP.match(buf).end()
+    candidates = [m.start() for m in _JSON_RECORD_END.finditer(buf, pos)][-_JSON_BOUNDARY_ATTEMPTS:]
+    for end in reversed(candidates):
+        try:
+            records.extend(_json_loads("[" + buf[pos:end + 1] + "]"))
+        except ValueError:
+            continue
+        pos = end + 1
+        break
+    while True:
+        pos = _JSON_ARRAY_GAP.match(buf, pos).end()
+        if pos >= len(buf):
+            return "", False
+        if buf[pos] == "]":
+            return "", True
+        try:
+            record, pos = _json_decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            return buf[pos:], False  # 记录被块边界截断，读取更多数据后重试
+        records.append(record)
+
+
+def _iter_json_array(source, chunk_rows: int):
+    """
+    增量解析 JSON 记录数组，每 chunk_rows 条记录产出一个 DataFrame。
+    每次从 source（二进制文件对象）读取 JSON_READ_BLOCK 字节，
+    内存中只保留当前块的记录和未解析完的尾部文本。
+    """
+    text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buf = ""
+    started = done = False
+    records = []
+    while not done:
+        block = source.read(JSON_READ_BLOCK)
+        eof = not block
+        buf += text_decoder.decode(block, final=eof)
+        if not started:
+            stripped = buf.lstrip()
+            if not stripped and not eof:
+                continue
+            if not stripped.startswith("["):
+                raise ValueError("JSON 文件不是记录数组")
+            buf = stripped[1:]
+            started = True
+        buf, done = _parse_json_records(buf, records, eof)
+        while len(records) >= chunk_rows:
+            yield pd.DataFrame.from_records(records[:chunk_rows])
+            del records[:chunk_rows]
+        done = done or eof
+    if records:
+        yield pd.DataFrame.from_records(records)
+
+
+def list_excel_sheets(path) -> list:
+    """返回工作簿中的工作表名称（不加载单元格）。"""
+    if python_calamine is not None:
+        workbook = python_calamine.CalamineWorkbook.from_path(path)
+        try:
+            return list(workbook.sheet_names)
+        finally:
+            workbook.close()
+    if openpyxl is not None and os.path.splitext(path)[1].lower() != ".xls":
+        workbook = openpyxl.load_workbook(path, read_only=True)
+        try:
+            return list(workbook.sheetnames)
+        finally:
+            workbook.close()
+    return list(pd.ExcelFile(path).sheet_names)
+
+
+def _excel_xml_size(path) -> int:
+    """工作表 XML 解压后的总大小；.xls 等非 zip 格式返回 0。"""
+    try:
+        with zipfile.ZipFile(path) as archive:
+            return sum(info.file_size for info in archive.infolist() if info.filename.startswith("xl/worksheets/"))
+    except (zipfile.BadZipFile, OSError):
+        return 0
+
+
+def _calamine_value(value):
+    # calamine 以空字符串表示空单元格，并把零点的日期时间读为 date；与 read_excel 一样统一为 datetime
+    if value == "":
+        return None
+    if type(value) is datetime.date:
+        return datetime.datetime(value.year, value.month, value.day)
+    return value
+
+
+def _iter_excel_rows(path, sheet=None, streaming: bool = False):
+    """
+    逐行产出工作表的单元格值（第一行为表头），sheet 为名称或序号，默认第一个工作表。
+    streaming 为真或工作表过大时使用 openpyxl 只读模式，否则优先使用 calamine。
+    """
+    use_calamine = python_calamine is not None and not (
+        openpyxl is not None and (streaming or _excel_xml_size(path) > EXCEL_IN_MEMORY_LIMIT))
+    if use_calamine:
+        workbook = python_calamine.CalamineWorkbook.from_path(path)
+        try:
+            if isinstance(sheet, str):
+                worksheet = workbook.get_sheet_by_name(sheet)
+            else:
+                worksheet = workbook.get_sheet_by_index(sheet or 0)
+            for row in worksheet.iter_rows():
+                yield [_calamine_value(value) for value in row]
+        finally:
+            workbook.close()
+    elif openpyxl is not None:
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            worksheet = workbook[sheet] if isinstance(sheet, str) else workbook.worksheets[sheet or 0]
+            yield from worksheet.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    else:
+        df = pd.read_excel(path, sheet_name=sheet or 0, header=None)
+        yield from df.itertuples(index=False, name=None)
+
+
+def _excel_frame(records: list, columns: list):
+    df = pd.DataFrame.from_records(records, columns=columns)
+    # calamine 把所有数值读为浮点数；整列都是整数值时还原为整数（与 read_excel 一致）
+    for name in df.columns:
+        col = df[name]
+        if col.dtype == np.float64 and col.notna().all() and (col % 1 == 0).all():
+            df[name] = col.astype(np.int64)
+    return df
+
+
+def _iter_excel(path, sheet, chunk_rows: int, streaming: bool = False, usecols=None):
+    """
+    按块产出工作表的 DataFrame。与 read_excel 一样，末尾的空行被忽略。
+    usecols 为列名列表时只为这些列构建 DataFrame（按给定顺序）。
+    """
+    rows = _iter_excel_rows(path, sheet, streaming)
+    header = next(rows, None)
+    if header is None:
+        yield pd.DataFrame()
+        return
+    header = list(header)
+    while header and header[-1] is None:
+        header.pop()
+    columns = [f"Unnamed: {i}" if name is None else str(name) for i, name in enumerate(header)]
+    width = len(columns)
+    indices = None
+    if usecols is not None:
+        _check_columns(columns, usecols)
+        indices = [columns.index(name) for name in usecols]
+        columns = list(usecols)
+    records = []
+    blank_rows = 0
+    yielded = False
+    for row in rows:
+        row = tuple(row[:width]) if len(row) >= width else tuple(row) + (None,) * (width - len(row))
+        if indices is not None:
+            row = tuple(row[i] for i in indices)
+        if all(value is None for value in row):
+            # 空行只有在后面还有数据时才保留
+            blank_rows += 1
+            continue
+        records.extend([(None,) * len(columns)] * blank_rows)
+        blank_rows = 0
+        records.append(row)
+        if len(records) >= chunk_rows:
+            yield _excel_frame(records, columns)
+            records = []
+            yielded = True
+    if records or not yielded:
+        yield _excel_frame(records, columns)
+
+
+# 行筛选支持的比较运算
+_FILTER_OPS = {ast.Eq: "==", ast.NotEq: "!=", ast.Lt: "<", ast.LtE: "<=", ast.Gt: ">", ast.GtE: ">=",
+               ast.In: "in", ast.NotIn: "not in"}
+_COMPARE_FUNCS = {"==": operator.eq, "!=": operator.ne, "<": operator.lt, "<=": operator.le,
+                  ">": operator.gt, ">=": operator.ge}
+# 用反引号括起来的列名（可以包含空格等字符）
+_QUOTED_COLUMN = re.compile(r"`([^`]+)`")
+
+
+def parse_columns(text) -> list:
+    """把逗号分隔的列名解析为列表；为空时返回 None（全部列）。"""
+    columns = [name.strip() for name in (text or "").split(",") if name.strip()]
+    return columns or None
+
+
+def parse_row_filter(text) -> list:
+    """
+    解析行筛选表达式，返回条件列表 [(列名, 运算符, 值), ...]，各条件之间是"且"的关系。
+    表达式由 and 连接的比较组成，例如 ``date >= '2024-01-01' and status in ('ok', 'retry')``；
+    运算符为 == != < <= > >= in / not in，左边是列名（含空格等字符时用反引号括起），
+    右边是数字、字符串、布尔值或它们的列表。表达式为空时返回空列表。
+    """
+    text = (text or "").strip()
+    if not text:
+        return []
+    names = {}
+
+    def placeholder(match):
+        names[f"__column_{len(names)}"] = match.group(1)
+        return f"__column_{len(names) - 1}"
+
+    source = _QUOTED_COLUMN.sub(placeholder, text)
+    try:
+        tree = ast.parse(source, mode="eval").body
+    except SyntaxError as e:
+        raise ValueError(f"筛选表达式语法错误: {e.msg}") from None
+    comparisons = tree.values if isinstance(tree, ast.BoolOp) and isinstance(tree.op, ast.And) else [tree]
+    conditions = []
+    for node in comparisons:
+        segment = re.sub(r"__column_\d+", lambda m: f"`{names[m.group(0)]}`", ast.get_source_segment(source, node))
+        if (not isinstance(node, ast.Compare) or len(node.ops) != 1 or type(node.ops[0]) not in _FILTER_OPS
+                or not isinstance(node.left, ast.Name)):
+            raise ValueError(f"不支持的筛选条件: {segment}（应为 列名 运算符 值，多个条件用 and 连接）")
+        op = _FILTER_OPS[type(node.ops[0])]
+        try:
+            value = ast.literal_eval(node.comparators[0])
+        except ValueError:
+            raise ValueError(f"筛选条件的值必须是常量: {segment}") from None
+        if op in ("in", "not in"):
+            if not isinstance(value, (list, tuple, set)):
+                raise ValueError(f"in / not in 的值必须是列表: {segment}")
+            value = list(value)
+        conditions.append((names.get(node.left.id, node.left.id), op, value))
+    return conditions
+
+
+def _needed_columns(columns, conditions) -> list:
+    """需要读取的列：选中的列加上筛选条件引用的列；未选择列时返回 None（全部列）。"""
+    if columns is None:
+        return None
+    return list(dict.fromkeys(list(columns) + [name for name, _, _ in conditions]))
+
+
+def _check_columns(available, wanted):
+    missing = [name for name in dict.fromkeys(wanted) if name not in available]
+    if missing:
+        raise ValueError(f"输入中不存在这些列: {', '.join(missing)}")
+
+
+def _check_csv_columns(path, encoding: str, wanted):
+    """只读取 CSV 表头，检查选中的列是否存在。"""
+    if wanted:
+        _check_columns(pd.read_csv(path, encoding=encoding, nrows=0).columns, wanted)
+
+
+def _select_frame(df, columns, conditions):
+    """对一个 DataFrame 数据块应用行筛选和列投影。"""
+    if conditions:
+        _check_columns(df.columns, [name for name, _, _ in conditions])
+        mask = np.ones(len(df), dtype=bool)
+        for name, op, value in conditions:
+            col = df[name]
+            try:
+                if op == "in":
+                    matched = col.isin(value)
+                elif op == "not in":
+                    matched = ~col.isin(value)
+                else:
+                    matched = _COMPARE_FUNCS[op](col, value)
+            except TypeError as e:
+                raise ValueError(f"无法比较列 {name} ({col.dtype}) 与 {value!r}: {e}") from None
+            mask &= matched.to_numpy(dtype=bool, na_value=False)
+        df = df[mask]
+    if columns is not None:
+        _check_columns(df.columns, columns)
+        df = df[columns]
+    return df
+
+
+def _arrow_literal(value, arrow_type):
+    """
+    把筛选条件中的值转换为列的 Arrow 类型（例如日期字符串与时间戳列比较），无法转换时保持原值。
+    非字符串的值不会转换为字符串，文本列与数字比较时与 pandas 一样报错。
+    """
+    if pa.types.is_dictionary(arrow_type):
+        arrow_type = arrow_type.value_type
+    literal = pa.array(value) if isinstance(value, list) else pa.scalar(value)
+    is_text = pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)
+    if is_text and not (pa.types.is_string(literal.type) or pa.types.is_null(literal.type)):
+        return literal
+    try:
+        return literal.cast(arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+        return literal
+
+
+def _arrow_filter(conditions, schema):
+    """把条件列表转换为 pyarrow.compute 表达式；没有条件时返回 None。"""
+    _check_columns(schema.names, [name for name, _, _ in conditions])
+    expression = None
+    for name, op, value in conditions:
+        field = pa.compute.field(name)
+        literal = _arrow_literal(value, schema.field(name).type)
+        if op == "in":
+            term = field.isin(literal)
+        elif op == "not in":
+            term = ~field.isin(literal)
+        else:
+            term = _COMPARE_FUNCS[op](field, literal)
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def _select_batches(batches, columns, conditions):
+    """对 RecordBatch 流应用行筛选和列投影；筛选表达式按第一个批次的表结构构建。"""
+    expression = None
+    for batch in batches:
+        if conditions:
+            if expression is None:
+                expression = _arrow_filter(conditions, batch.schema)
+            try:
+                batch = batch.filter(expression)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+                raise ValueError(f"无法按筛选条件比较: {e}") from e
+        if columns is not None:
+            _check_columns(batch.schema.names, columns)
+            batch = batch.select(columns)
+        yield batch
+
+
+def _scan_parquet(path, chunk_rows: int, columns, conditions):
+    """
+    通过 Arrow 数据集扫描 Parquet：只读取选中的列，筛选条件下推到扫描器，
+    按行组统计信息（最小/最大值）跳过不可能满足条件的行组。
+    """
+    dataset = pa_ds.dataset(path, format="parquet")
+    _check_columns(dataset.schema.names, columns or [])
+    expression = _arrow_filter(conditions, dataset.schema) if conditions else None
+    try:
+        yield from dataset.to_batches(columns=columns, filter=expression, batch_size=chunk_rows)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+        raise ValueError(f"无法按筛选条件比较: {e}") from e
+
+
+def iter_chunks(path, fmt: str, chunk_rows: int = DEFAULT_CHUNK_ROWS, encoding: str = CSV_ENCODING, source=None,
+                sheet=None, columns=None, conditions=None):
+    """
+    按块产出输入文件的 DataFrame。
+    source 为已打开的二进制文件对象时，CSV / JSON 从中读取（调用方可通过 tell() 获知读取进度）。
+    sheet 为 Excel 输入的工作表名称或序号。
+    columns 为要保留的列名列表（None 表示全部列），conditions 为 parse_row_filter 返回的筛选条件；
+    CSV、Parquet 和 Excel 只解析需要的列，筛选后可能产出空块。
+    """
+    source = path if source is None else source
+    conditions = conditions or []
+    needed = _needed_columns(columns, conditions)
+    if fmt == "CSV":
+        _check_csv_columns(path, encoding, needed)
+        with pd.read_csv(source, encoding=encoding, chunksize=chunk_rows, usecols=needed) as reader:
+            for chunk in reader:
+                yield _select_frame(chunk, columns, conditions)
+    elif fmt == "JSONL" or fmt == "JSON" and _is_json_lines(path):
+        with pd.read_json(source, lines=True, chunksize=chunk_rows) as reader:
+            for chunk in reader:
+                yield _select_frame(chunk, columns, conditions)
+    elif fmt == "JSON":
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                for chunk in _iter_json_array(f, chunk_rows):
+                    yield _select_frame(chunk, columns, conditions)
+        else:
+            for chunk in _iter_json_array(source, chunk_rows):
+                yield _select_frame(chunk, columns, conditions)
+    elif fmt == "Parquet" and HAS_PARQUET:
+        if columns is None and not conditions:
+            batches = pq.ParquetFile(path).iter_batches(batch_size=chunk_rows)
+        else:
+            batches = _scan_parquet(path, chunk_rows, columns, conditions)
+        for batch in batches:
+            yield batch.to_pandas()
+    elif fmt == "Excel":
+        for chunk in _iter_excel(path, sheet, chunk_rows, usecols=needed):
+            yield _select_frame(chunk, columns, conditions)
+    else:
+        read_func = getattr(pd, pandas_func_name(fmt, 'read'), None)
+        if not read_func:
+            raise AttributeError(f"Pandas 不支持读取格式 '{fmt}'。找不到函数 'pd.{pandas_func_name(fmt, 'read')}'。")
+        yield _select_frame(read_func(path), columns, conditions)
+
+
+def _use_arrow(engine: str, input_path, input_fmt: str) -> bool:
+    if engine == ENGINE_PANDAS or not HAS_PARQUET or input_fmt not in _ARROW_READ_FORMATS:
+        return False
+    # pyarrow.json 只能读取 JSON Lines
+    return not (input_fmt == "JSON" and not _is_json_lines(input_path))
+
+
+def iter_arrow_batches(path, fmt: str, chunk_rows: int = DEFAULT_CHUNK_ROWS, encoding: str = CSV_ENCODING,
+                       source=None, sheet=None, columns=None, conditions=None):
+    """
+    Arrow 引擎：按块产出 pyarrow.RecordBatch，不创建 DataFrame。
+    source、columns 和 conditions 的含义同 iter_chunks。
+    """
+    source = path if source is None else source
+    conditions = conditions or []
+    if fmt == "CSV":
+        # Arrow 自行跳过 UTF-8 BOM
+        arrow_encoding = "utf8" if encoding in ("utf-8", "utf-8-sig") else encoding
+        read_options = pa_csv.ReadOptions(block_size=ARROW_BLOCK_SIZE, encoding=arrow_encoding)
+        needed = _needed_columns(columns, conditions)
+        _check_csv_columns(path, encoding, needed)
+        convert_options = pa_csv.ConvertOptions(include_columns=needed)
+        with pa_csv.open_csv(source, read_options=read_options, convert_options=convert_options) as reader:
+            # 无法按指定编码解码的文本列会被推断为 binary，与 pandas 一样报告为解码错误
+            if any(pa.types.is_binary(field.type) for field in reader.schema):
+                raise UnicodeDecodeError(encoding, b"", 0, 1, "CSV 中存在无法按该编码解码的文本列")
+            yield from _select_batches(reader, columns, conditions)
+    elif fmt in ("JSON", "JSONL"):
+        read_options = pa_json.ReadOptions(block_size=ARROW_BLOCK_SIZE)
+        if hasattr(pa_json, "open_json"):
+            with pa_json.open_json(source, read_options=read_options) as reader:
+                yield from _select_batches(reader, columns, conditions)
+        else:
+            batches = pa_json.read_json(source, read_options=read_options).to_batches()
+            yield from _select_batches(batches, columns, conditions)
+    elif fmt == "Parquet":
+        if columns is None and not conditions:
+            yield from pq.ParquetFile(path).iter_batches(batch_size=chunk_rows)
+        else:
+            yield from _scan_parquet(path, chunk_rows, columns, conditions)
+    else:
+        raise ValueError(f"Arrow 引擎不支持读取格式 '{fmt}'")
+
+
+def _as_pandas(chunk):
+    return chunk.to_pandas() if HAS_PARQUET and isinstance(chunk, pa.RecordBatch) else chunk
+
+
+def _as_arrow_table(chunk, schema=None):
+    if isinstance(chunk, pa.RecordBatch):
+        return pa.Table.from_batches([chunk])
+    return pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+
+
+def _estimate_line_count(path) -> int:
+    """按文件头部的平均行长估算文本文件的行数。"""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        sample = f.read(PREVIEW_SAMPLE_BYTES)
+    lines = sample.count(b"\n") + (0 if sample.endswith(b"\n") or not sample else 1)
+    if len(sample) >= size or not lines:
+        return lines
+    return round(size * lines / len(sample))
+
+
+def _excel_row_count(path, sheet=None):
+    """从工作表的尺寸信息读取行数（只读模式，不加载单元格）；无法获取时返回 None。"""
+    if openpyxl is None:
+        return None
+    try:
+        workbook = openpyxl.load_workbook(path, read_only=True)
+    except Exception:
+        return None
+    try:
+        worksheet = workbook[sheet] if isinstance(sheet, str) else workbook.worksheets[sheet or 0]
+        max_row = worksheet.max_row
+        return max_row - 1 if max_row else None
+    finally:
+        workbook.close()
+
+
+def preview(path, fmt: str, rows: int = PREVIEW_ROWS, encoding: str = None, sheet=None) -> PreviewResult:
+    """
+    读取输入文件的前 rows 行和表结构，不做完整加载。
+    CSV 按 nrows 读取并按平均行长估算总行数；Parquet 的总行数和表结构来自元数据，
+    样本只读取第一个行组；Excel 以只读模式流式读取前 rows 行，行数来自工作表的尺寸信息；
+    JSON 记录数组只增量解析前 rows 条，记录更多时总行数未知。
+    """
+    total = None
+    estimated = False
+    if fmt == "CSV":
+        encoding = encoding or detect_encoding(path)
+        df = pd.read_csv(path, encoding=encoding, nrows=rows)
+        total = max(0, _estimate_line_count(path) - 1)
+        estimated = True
+    elif fmt == "Parquet" and HAS_PARQUET:
+        parquet_file = pq.ParquetFile(path)
+        total = parquet_file.metadata.num_rows
+        if parquet_file.num_row_groups:
+            batch = next(parquet_file.iter_batches(batch_size=rows, row_groups=[0]), None)
+            df = batch.to_pandas() if batch is not None else parquet_file.schema_arrow.empty_table().to_pandas()
+        else:
+            df = parquet_file.schema_arrow.empty_table().to_pandas()
+    elif fmt == "JSONL" or fmt == "JSON" and _is_json_lines(path):
+        df = pd.read_json(path, lines=True, nrows=rows)
+        total = _estimate_line_count(path)
+        estimated = True
+    elif fmt == "JSON":
+        with open(path, "rb") as f:
+            df = next(_iter_json_array(f, rows), None)
+        if df is None:
+            df = pd.DataFrame()
+        if len(df) < rows:
+            total = len(df)
+    elif fmt == "Excel":
+        df = next(_iter_excel(path, sheet, rows, streaming=True))
+        total = _excel_row_count(path, sheet)
+        estimated = total is not None
+    else:
+        read_func = getattr(pd, pandas_func_name(fmt, 'read'), None)
+        if not read_func:
+            raise AttributeError(f"Pandas 不支持读取格式 '{fmt}'。找不到函数 'pd.{pandas_func_name(fmt, 'read')}'。")
+        df = read_func(path)
+        total = len(df)
+
+    df = df.head(rows)
+    if total is not None and total < len(df):
+        total = len(df)
+    sample = [tuple("" if pd.isna(v) else str(v) for v in record)
+              for record in df.itertuples(index=False, name=None)]
+    return PreviewResult([str(c) for c in df.columns], [str(t) for t in df.dtypes], sample,
+                         total, estimated, encoding if fmt == "CSV" else None)
+
+
+# ----------------------------------------------------------------------
+# 5. 分块写入
+# ----------------------------------------------------------------------
+
+def compression_codecs(fmt: str) -> list:
+    """返回输出格式可用的压缩方式，第一个为默认值；不支持压缩的格式只有 none。"""
+    if fmt in _TEXT_OUTPUT_FORMATS:
+        available = [COMPRESSION_NONE, "gzip", "bz2", "xz"]
+        if zstandard is not None or (HAS_PARQUET and pa.Codec.is_available("zstd")):
+            available.append("zstd")
+        return available
+    if fmt == "Parquet" and HAS_PARQUET:
+        return [c for c in PARQUET_CODECS if pa.Codec.is_available(c)] + [COMPRESSION_NONE]
+    return [COMPRESSION_NONE]
+
+
+def check_compression(fmt: str, compression=None, level=None) -> tuple:
+    """
+    检查输出格式的压缩方式和级别，返回 (压缩方式, 级别)。
+    compression 为空时使用格式的默认值；level 为空时使用压缩方式的默认级别。
+    """
+    available = compression_codecs(fmt)
+    compression = compression or available[0]
+    if compression not in available:
+        raise ValueError(f"{fmt} 输出不支持压缩方式 '{compression}'，可选: {', '.join(available)}")
+    if level is None or compression == COMPRESSION_NONE:
+        return compression, None
+    if fmt == "Parquet":
+        if not pa.Codec.supports_compression_level(compression):
+            raise ValueError(f"压缩方式 {compression} 不支持设置级别")
+        low = pa.Codec.minimum_compression_level(compression)
+        high = pa.Codec.maximum_compression_level(compression)
+    else:
+        low, high, _ = TEXT_COMPRESSION_LEVELS[compression]
+    if not low <= level <= high:
+        raise ValueError(f"{compression} 的压缩级别应在 {low} 到 {high} 之间")
+    return compression, level
+
+
+def _compress_gzip(data, level):
+    # mtime=0：相同内容的输出逐字节相同
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _compress_bz2(data, level):
+    return bz2.compress(data, level)
+
+
+def _compress_xz(data, level):
+    return lzma.compress(data, format=lzma.FORMAT_XZ, preset=level)
+
+
+def _compress_zstd(data, level):
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return pa.Codec("zstd", compression_level=level).compress(data, asbytes=True)
+
+
+_COMPRESSORS = {"gzip": _compress_gzip, "bz2": _compress_bz2, "xz": _compress_xz, "zstd": _compress_zstd}
+
+
+class _ParallelCompressor(io.RawIOBase):
+    """
+    并行压缩的只写二进制文件。
+    写入的数据每满 COMPRESSION_BLOCK 字节交给线程池压缩成一个独立的 gzip 成员 / bz2 流 /
+    xz 流 / zstd 帧，结果按顺序追加到文件。这些格式都允许多段首尾相接，对应的命令行工具和
+    Python 的 gzip / bz2 / lzma 模块都能直接解压。压缩库在压缩时释放 GIL，因此压缩与主线程的
+    解析和编码同时进行；等待压缩的块数有上限，内存占用与文件大小无关。
+    """
+
+    def __init__(self, path, compression: str, level=None, workers: int = COMPRESSION_WORKERS):
+        super().__init__()
+        self._file = open(path, "wb")
+        self._compress = _COMPRESSORS[compression]
+        self._level = TEXT_COMPRESSION_LEVELS[compression][2] if level is None else level
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="compress")
+        self._pending = deque()
+        self._max_pending = workers * 2
+        self._buffer = bytearray()
+        self._blocks = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        if len(self._buffer) >= COMPRESSION_BLOCK:
+            self._submit()
+        return len(data)
+
+    def _submit(self):
+        if len(self._pending) >= self._max_pending:
+            self._file.write(self._pending.popleft().result())
+        self._pending.append(self._pool.submit(self._compress, bytes(self._buffer), self._level))
+        self._buffer.clear()
+        self._blocks += 1
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            # 空输出也写出一个（空的）压缩段，保证文件是合法的压缩文件
+            if self._buffer or not self._blocks:
+                self._submit()
+            while self._pending:
+                self._file.write(self._pending.popleft().result())
+        finally:
+            self._pool.shutdown(cancel_futures=True)
+            self._file.close()
+            super().close()
+
+
+def _open_output(path, compression=None, level=None):
+    """打开文本输出的二进制文件；启用压缩时返回 _ParallelCompressor。"""
+    if compression in (None, COMPRESSION_NONE):
+        return open(path, "wb")
+    return _ParallelCompressor(path, compression, level)
+
+
+# 写入器的 write() 既接受 DataFrame，也接受 Arrow 引擎产出的 RecordBatch
+
+class _CsvWriter:
+    """
+    逐块追加 CSV，只有第一块写表头。RecordBatch 先转换为 DataFrame 再写出：pyarrow.csv 的
+    引号、布尔值和浮点数格式与 pandas 不同，两种引擎必须写出相同的字节。
+    """
+
+    def __init__(self, path, compression=None, compression_level=None):
+        self._file = io.TextIOWrapper(_open_output(path, compression, compression_level), encoding="utf-8",
+                                      newline="", write_through=True)
+        self._header = True
+
+    def write(self, chunk):
+        _as_pandas(chunk).to_csv(self._file, index=False, header=self._header)
+        self._header = False
+
+    def close(self):
+        self._file.close()
+
+
+def _encode_json_lines(chunk) -> bytes:
+    """
+    把一个数据块编码为 UTF-8 的 JSON Lines（不含末尾换行），日期时间为 ISO 格式。
+    pandas 的 to_json 按列向量化编码，比逐条记录调用 orjson 更快（后者需要先把每个
+    单元格转为 Python 对象）；浮点数使用它支持的最高精度。
+    """
+    df = _as_pandas(chunk)
+    if df.empty:
+        return b""
+    text = df.to_json(orient='records', lines=True, date_format='iso', force_ascii=False, double_precision=15)
+    return text.rstrip("\n").encode("utf-8")
+
+
+class _JsonWriter:
+    """以记录数组格式逐块写出 JSON（与 to_json(orient='records', date_format='iso') 的结果等价）。"""
+
+    def __init__(self, path, compression=None, compression_level=None):
+        self._file = _open_output(path, compression, compression_level)
+        self._file.write(b"[")
+        self._first = True
+
+    def write(self, chunk):
+        lines = _encode_json_lines(chunk)
+        if not lines:
+            return
+        # 每条记录占一行，记录内部的换行已被转义
+        records = lines.replace(b"\n", b",")
+        self._file.write(records if self._first else b"," + records)
+        self._first = False
+
+    def close(self):
+        self._file.write(b"]")
+        self._file.close()
+
+
+class _JsonLinesWriter:
+    """逐块追加 JSON Lines，每条记录一行。"""
+
+    def __init__(self, path, compression=None, compression_level=None):
+        self._file = _open_output(path, compression, compression_level)
+
+    def write(self, chunk):
+        lines = _encode_json_lines(chunk)
+        if lines:
+            self._file.write(lines + b"\n")
+
+    def close(self):
+        self._file.close()
+
+
+def _promote_type(old, new):
+    """两个块中同一列的类型不兼容时，返回能同时容纳两者的类型：数值放宽为 int64 / float64，其余改为字符串。"""
+    if pa.types.is_null(new):
+        return old
+    if pa.types.is_dictionary(old):
+        old = old.value_type
+    if pa.types.is_dictionary(new):
+        new = new.value_type
+    numeric = (pa.types.is_integer, pa.types.is_floating)
+    if any(f(old) for f in numeric) and any(f(new) for f in numeric):
+        if pa.types.is_integer(old) and pa.types.is_integer(new) and pa.uint64() not in (old, new):
+            return pa.int64()
+        return pa.float64()
+    return pa.string()
+
+
+class _ParquetWriter:
+    """
+    通过 ParquetWriter 逐块写入行组；表结构由第一块确定，后续块按其转换。
+    后续块中出现无法转换的值（如数值列在后面出现文本）时，用 _promote_type 放宽该列的类型，
+    并把已写出的行组按新的表结构重写一遍（每列最多放宽两次：数值 -> float64 -> 字符串）。
+    widen_numbers 为真时（类型优化的输出）整数和浮点列在文件中放宽为 64 位，
+    因为后续块可能超出第一块推断的范围；Parquet 的整数本就以 INT32/INT64 存储，
+    放宽对文件大小影响很小。
+    compression 和 compression_level 为 Parquet 的编码方式和级别（为空时使用 pyarrow 的默认值）。
+    """
+
+    def __init__(self, path, widen_numbers: bool = False, compression=None, compression_level=None):
+        self._path = path
+        self._writer = None
+        self._schema = None
+        self._widen_numbers = widen_numbers
+        compression = compression or "snappy"
+        if compression_level is None:
+            compression_level = PARQUET_DEFAULT_LEVELS.get(compression)
+        self._options = {"compression": compression, "compression_level": compression_level}
+
+    def write(self, chunk):
+        if self._writer is None:
+            table = _as_arrow_table(chunk)
+            self._schema = pa.schema([self._stable_field(f, self._widen_numbers) for f in table.schema],
+                                     metadata=table.schema.metadata)
+            table = table.cast(self._schema)
+            self._writer = pq.ParquetWriter(self._path, self._schema, **self._options)
+        else:
+            table = self._conform(chunk)
+        self._writer.write_table(table)
+
+    def _conform(self, chunk):
+        try:
+            table = _as_arrow_table(chunk, self._schema)
+            if not table.schema.equals(self._schema, check_metadata=False):
+                table = table.cast(self._schema)
+            return table
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            pass
+        table = _as_arrow_table(chunk)
+        fields = []
+        for field in self._schema:
+            column = table.column(field.name)
+            try:
+                column.cast(field.type)
+                fields.append(field)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                fields.append(pa.field(field.name, _promote_type(field.type, column.type)))
+        self._rewrite(pa.schema(fields, metadata=self._schema.metadata))
+        return table.cast(self._schema)
+
+    def _rewrite(self, schema):
+        """用放宽后的表结构重新打开写入器，并把已写出的行组转换后复制过去。"""
+        changed = [f"{new.name}: {old.type} -> {new.type}" for old, new in zip(self._schema, schema)
+                   if old.type != new.type]
+        log(f"后续数据块的列类型与第一块不一致，放宽列类型并重写已写出的数据 ({', '.join(changed)})")
+        self._writer.close()
+        written_path = f"{self._path}.promote-tmp"
+        os.replace(self._path, written_path)
+        try:
+            self._schema = schema
+            self._writer = pq.ParquetWriter(self._path, schema, **self._options)
+            with pq.ParquetFile(written_path) as written:
+                for i in range(written.num_row_groups):
+                    self._writer.write_table(written.read_row_group(i).cast(schema))
+        finally:
+            os.remove(written_path)
+
+    @staticmethod
+    def _stable_field(field, widen_numbers):
+        # 第一块中全为空值的列无法确定类型，按字符串处理
+        if pa.types.is_null(field.type):
+            return pa.field(field.name, pa.string())
+        if widen_numbers:
+            if pa.types.is_integer(field.type) and field.type != pa.uint64():
+                return pa.field(field.name, pa.int64())
+            if pa.types.is_floating(field.type):
+                return pa.field(field.name, pa.float64())
+        # 分类列在后续块中可能有更多取值，字典索引固定为 int32
+        if pa.types.is_dictionary(field.type):
+            return pa.field(field.name, pa.dictionary(pa.int32(), field.type.value_type))
+        return field
+
+    def close(self):
+        if self._writer is None:
+            # 没有任何数据块时也生成一个有效（空）的 Parquet 文件
+            pq.write_table(pa.table({}), self._path, **self._options)
+        else:
+            self._writer.close()
+
+
+def _python_columns(chunk) -> tuple:
+    """返回 (列名, 各列的 Python 值列表)，空值为 None。"""
+    if HAS_PARQUET and isinstance(chunk, pa.RecordBatch):
+        return chunk.schema.names, [col.to_pylist() for col in chunk.columns]
+    columns = []
+    for name in chunk.columns:
+        col = chunk[name]
+        values = col.tolist()
+        missing = col.isna()
+        if missing.any():
+            values = [None if m else v for v, m in zip(values, missing.tolist())]
+        columns.append(values)
+    return [str(name) for name in chunk.columns], columns
+
+
+class _ExcelWriter:
+    """
+    逐行写入 .xlsx，内存占用与行数无关：优先使用 xlsxwriter 的 constant_memory 模式
+    （每写完一行即刷新到临时文件），否则使用 openpyxl 的 write_only 工作簿。
+    一个工作表写满 max_rows 行后续写到下一个工作表（Sheet1、Sheet2 ...），每个工作表都带表头。
+    """
+
+    def __init__(self, path, max_rows: int = EXCEL_MAX_ROWS):
+        if xlsxwriter is not None:
+            self._book = xlsxwriter.Workbook(path, {
+                'constant_memory': True,
+                'remove_timezone': True,
+                'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+            })
+        elif openpyxl is not None:
+            self._book = openpyxl.Workbook(write_only=True)
+        else:
+            raise ImportError("写入 Excel 需要安装 xlsxwriter 或 openpyxl")
+        self._path = path
+        self._max_rows = max_rows
+        self._columns = None
+        self._sheet = None
+        self._sheets = 0
+        self._row = 0
+
+    def _new_sheet(self):
+        self._sheets += 1
+        name = f"Sheet{self._sheets}"
+        if xlsxwriter is not None:
+            self._sheet = self._book.add_worksheet(name)
+        else:
+            self._sheet = self._book.create_sheet(name)
+        self._row = 0
+        self._append(self._columns)
+
+    def _append(self, values):
+        if xlsxwriter is not None:
+            self._sheet.write_row(self._row, 0, values)
+        else:
+            self._sheet.append(values)
+        self._row += 1
+
+    def write(self, chunk):
+        names, columns = _python_columns(chunk)
+        if self._sheet is None:
+            self._columns = names
+            self._new_sheet()
+        for values in zip(*columns):
+            if self._row >= self._max_rows:
+                self._new_sheet()
+            self._append(values)
+
+    def close(self):
+        if self._sheet is None:
+            self._columns = []
+            self._new_sheet()
+        if xlsxwriter is not None:
+            self._book.close()
+        else:
+            self._book.save(self._path)
+
+
+class _PandasWriter:
+    """不支持追加的格式：收集全部数据块，关闭时调用 df.to_<fmt> 一次写出。"""
+
+    def __init__(self, path, fmt):
+        self._path = path
+        self._func_name = pandas_func_name(fmt, 'to')
+        self._fmt = fmt
+        self._chunks = []
+
+    def write(self, chunk):
+        self._chunks.append(_as_pandas(chunk))
+
+    def close(self):
+        df = pd.concat(self._chunks, ignore_index=True) if self._chunks else pd.DataFrame()
+        write_func = getattr(df, self._func_name, None)
+        if not write_func:
+            raise AttributeError(f"Pandas 不支持写入格式 '{self._fmt}'。找不到函数 'df.{self._func_name}'。")
+        write_func(self._path)
+
+
+class _ThreadedWriter:
+    """
+    在后台线程中执行另一个写入器的 write()，使其编码和压缩与下一块的读取同时进行。
+    队列中最多等待 depth 块，内存占用仍由块大小决定。后台线程中的异常在下一次 write() 或 close() 时抛出。
+    """
+
+    def __init__(self, writer, depth: int = 2):
+        self._writer = writer
+        self._queue = queue.Queue(maxsize=depth)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="chunk-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            if self._error is None:
+                try:
+                    self._writer.write(chunk)
+                except BaseException as e:
+                    self._error = e
+
+    def write(self, chunk):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(chunk)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        try:
+            if self._error is not None:
+                raise self._error
+        finally:
+            self._writer.close()
+
+
+def open_writer(path, fmt: str, widen_numbers: bool = False, compression=None, compression_level=None):
+    """
+    返回具有 write(df) / close() 的分块写入器。widen_numbers 见 _ParquetWriter。
+    compression / compression_level 为输出的压缩方式和级别（见 check_compression），Excel 和其他格式忽略。
+    """
+    if compression == COMPRESSION_NONE and fmt in _TEXT_OUTPUT_FORMATS:
+        compression = None
+    if fmt == "CSV":
+        return _CsvWriter(path, compression, compression_level)
+    if fmt == "JSON":
+        return _JsonWriter(path, compression, compression_level)
+    if fmt == "JSONL":
+        return _JsonLinesWriter(path, compression, compression_level)
+    if fmt == "Parquet" and HAS_PARQUET:
+        return _ThreadedWriter(_ParquetWriter(path, widen_numbers, compression, compression_level))
+    if fmt == "Excel":
+        return _ExcelWriter(path)
+    return _PandasWriter(path, fmt)
+
+
+# ----------------------------------------------------------------------
+# 6. 转换
+# ----------------------------------------------------------------------
+
+class ConversionCancelled(Exception):
+    """转换被用户取消。"""
+
+
+# 某一时刻的转换进度
+ProgressSnapshot = namedtuple("ProgressSnapshot", ["rows", "bytes_read", "bytes_total", "elapsed", "rows_per_sec"])
+
+
+class ConversionProgress:
+    """
+    转换线程与 GUI 线程之间的进度通道（线程安全）。
+    转换线程每处理完一块调用 update()，GUI 线程定期调用 snapshot() 读取；
+    cancel() 设置取消标志，转换在下一个块边界处停止。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._rows = 0
+        self._bytes_read = 0
+        self._bytes_total = 0
+        self._started = time.time()
+
+    def start(self, bytes_total: int):
+        with self._lock:
+            self._rows = 0
+            self._bytes_read = 0
+            self._bytes_total = bytes_total
+            self._started = time.time()
+
+    def update(self, rows: int, bytes_read: int):
+        with self._lock:
+            self._rows = rows
+            self._bytes_read = bytes_read
+
+    def snapshot(self) -> ProgressSnapshot:
+        with self._lock:
+            elapsed = time.time() - self._started
+            rate = self._rows / elapsed if elapsed > 0 else 0.0
+            return ProgressSnapshot(self._rows, self._bytes_read, self._bytes_total, elapsed, rate)
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+
+def _remove_partial(path):
+    try:
+        os.remove(path)
+        log(f"已删除未完成的输出文件: {path}")
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        log(f"[WARNING] 无法删除未完成的输出文件 {path}: {e}", level="WARNING")
+
+
+def _convert_chunks(input_path, output_path, input_fmt, output_fmt, chunk_rows, encoding, use_arrow, progress,
+                    optimize_dtypes, sheet, columns, conditions, compression, compression_level):
+    rows = chunks = batches = 0
+    plan = memory = empty = None
+    if optimize_dtypes:
+        # 类型计划只对推断时读到的列和行有效，选择的列或筛选条件不同时分别缓存
+        plan_key = _dtype_plans.key(input_path, input_fmt, sheet, tuple(columns or ()), repr(conditions))
+    else:
+        plan_key = None
+    reader = iter_arrow_batches if use_arrow else iter_chunks
+    bytes_total = os.path.getsize(input_path)
+    # Parquet 和 Excel 的总行数可以从元数据得知，用于按行数估算读取进度（筛选后的行数不能用于估算）
+    if conditions:
+        total_rows = None
+    elif input_fmt == "Parquet" and HAS_PARQUET:
+        total_rows = pq.ParquetFile(input_path).metadata.num_rows
+    elif input_fmt == "Excel":
+        total_rows = _excel_row_count(input_path, sheet)
+    else:
+        total_rows = None
+    progress.start(bytes_total)
+
+    writer = open_writer(output_path, output_fmt, optimize_dtypes, compression, compression_level)
+    try:
+        with open(input_path, "rb") as source:
+            for chunk in reader(input_path, input_fmt, chunk_rows, encoding, source=source, sheet=sheet,
+                                columns=columns, conditions=conditions):
+                if progress.cancelled:
+                    raise ConversionCancelled("转换已取消")
+                batches += 1
+                if len(chunk):
+                    if optimize_dtypes:
+                        if plan is None:
+                            plan = _dtype_plans.get(plan_key) or infer_dtype_plan(_as_pandas(chunk))
+                            before = _memory_bytes(chunk)
+                        chunk = _apply_dtype_plan_arrow(chunk, plan) if use_arrow else apply_dtype_plan(chunk, plan)
+                        if memory is None:
+                            memory = (before, _memory_bytes(chunk))
+                    writer.write(chunk)
+                    rows += len(chunk)
+                    chunks += 1
+                elif empty is None:
+                    # 空块（如整块都被筛掉）不写出，全部为空时才用它写出表头
+                    empty = chunk
+                if total_rows:
+                    bytes_read = bytes_total * min(rows, total_rows) // total_rows
+                elif use_arrow:
+                    # Arrow 会预读整个文件，tell() 无意义；每个批次对应一个 ARROW_BLOCK_SIZE 的块
+                    bytes_read = min(bytes_total, batches * ARROW_BLOCK_SIZE)
+                elif input_fmt in ("CSV", "JSON", "JSONL"):
+                    bytes_read = source.tell()
+                else:
+                    bytes_read = bytes_total
+                progress.update(rows, bytes_read)
+        if not chunks and empty is not None:
+            writer.write(empty)
+            chunks = 1
+        writer.close()
+    except BaseException:
+        # 取消或失败时不留下不完整的输出文件
+        try:
+            writer.close()
+        except Exception:
+            pass
+        _remove_partial(output_path)
+        raise
+    progress.update(rows, bytes_total)
+    if plan is not None:
+        # 缓存的是处理完所有块（可能已放宽）之后的计划
+        _dtype_plans.put(plan_key, plan)
+    return rows, chunks, memory
+
+
+def convert(input_path, output_path, input_fmt: str, output_fmt: str,
+            chunk_rows: int = DEFAULT_CHUNK_ROWS, engine: str = ENGINE_AUTO,
+            progress: ConversionProgress = None, encoding: str = None,
+            optimize_dtypes: bool = False, sheet=None, columns=None, row_filter: str = None,
+            compression: str = None, compression_level: int = None,
+            cache: conversion_cache.ConversionCache = None) -> ConversionResult:
+    """
+    把 input_path 从 input_fmt 流式转换为 output_fmt 写入 output_path。
+    engine 为 arrow 但输入格式不受支持（Excel、JSON 数组等）时回退到 pandas。
+    progress 用于报告进度和请求取消；取消时抛出 ConversionCancelled。
+    encoding 为空时 CSV 输入的编码由 detect_encoding 探测。
+    optimize_dtypes 启用类型优化（见 infer_dtype_plan）。
+    sheet 为 Excel 输入的工作表名称或序号，默认第一个工作表。
+    columns 为要输出的列名列表（按给定顺序，None 表示全部列）；row_filter 为行筛选表达式
+    （语法见 parse_row_filter），两者都会下推到读取端。
+    compression / compression_level 为输出的压缩方式和级别（见 compression_codecs），为空时使用格式的默认值。
+    cache 不为空时先查找缓存，命中则不再转换；转换完成后输出存入缓存。缓存出错只记录警告。
+    """
+    if pd is None:
+        raise ImportError("数据转换需要 pandas")
+    progress = progress or ConversionProgress()
+    started = time.time()
+    conditions = parse_row_filter(row_filter)
+    columns = list(columns) if columns else None
+    compression, compression_level = check_compression(output_fmt, compression, compression_level)
+    use_arrow = _use_arrow(engine, input_path, input_fmt)
+    if engine == ENGINE_ARROW and not use_arrow:
+        log(f"[WARNING] Arrow 引擎不支持该输入 ({input_fmt})，改用 pandas", level="WARNING")
+    engine_used = ENGINE_ARROW if use_arrow else ENGINE_PANDAS
+    if input_fmt == "CSV":
+        encoding = encoding or detect_encoding(input_path)
+
+    cache_key = None
+    if cache is not None:
+        options = {"input_format": input_fmt, "output_format": output_fmt, "engine": engine_used,
+                   "encoding": encoding, "chunk_rows": chunk_rows, "optimize_dtypes": optimize_dtypes, "sheet": sheet,
+                   "columns": columns, "conditions": conditions, "compression": compression,
+                   "compression_level": compression_level}
+        try:
+            cache_key = cache.key(input_path, options)
+            hit = cache.restore(cache_key, output_path)
+        except Exception as e:
+            log(f"[WARNING] 读取转换缓存失败: {e}", level="WARNING")
+            hit = None
+        if hit is not None:
+            log(f"转换缓存命中 ({hit.how}): {output_path}")
+            bytes_total = os.path.getsize(input_path)
+            progress.start(bytes_total)
+            progress.update(hit.rows, bytes_total)
+            return ConversionResult(output_path, hit.rows, hit.chunks, time.time() - started, engine_used, encoding,
+                                    None, hit.how)
+
+    log(f"开始转换: {input_fmt} -> {output_fmt} ({engine_used} 引擎"
+        + (f", 编码 {encoding}" if encoding else "")
+        + (f", {compression} 压缩)" if compression != COMPRESSION_NONE else ")"))
+    if columns or conditions:
+        log(f"列投影: {', '.join(columns) if columns else '全部列'}；行筛选: {row_filter or '无'}")
+    try:
+        rows, chunks, memory = _convert_chunks(input_path, output_path, input_fmt, output_fmt, chunk_rows,
+                                               encoding or CSV_ENCODING, use_arrow, progress, optimize_dtypes, sheet,
+                                               columns, conditions, compression, compression_level)
+    except Exception as e:
+        # Arrow 按第一个块推断列类型，后面的块出现不兼容的值时报 ArrowInvalid；pandas 按块分别推断
+        if not (use_arrow and isinstance(e, pa.ArrowInvalid)):
+            raise
+        log(f"[WARNING] Arrow 引擎读取失败，改用 pandas 重新转换: {e}", level="WARNING")
+        engine_used = ENGINE_PANDAS
+        rows, chunks, memory = _convert_chunks(input_path, output_path, input_fmt, output_fmt, chunk_rows,
+                                               encoding or CSV_ENCODING, False, progress, optimize_dtypes, sheet,
+                                               columns, conditions, compression, compression_level)
+    if memory:
+        log(f"类型优化: 第一块内存 {memory[0] / 2**20:.1f} MB -> {memory[1] / 2**20:.1f} MB")
+    if cache_key is not None:
+        try:
+            cache.store(cache_key, output_path, rows, chunks)
+        except Exception as e:
+            log(f"[WARNING] 写入转换缓存失败: {e}", level="WARNING")
+    return ConversionResult(output_path, rows, chunks, time.time() - started, engine_used, encoding, memory, None)
+
+
+# ----------------------------------------------------------------------
+# 7. 批量转换
+# ----------------------------------------------------------------------
+
+# 批量任务中单个文件的状态
+BATCH_PENDING = "pending"
+BATCH_SKIPPED = "skipped"
+BATCH_DONE = "done"
+BATCH_FAILED = "failed"
+BATCH_CANCELLED = "cancelled"
+
+BatchItem = namedtuple("BatchItem", ["input_path", "output_path"])
+BatchSummary = namedtuple("BatchSummary", ["done", "skipped", "failed", "cancelled", "rows", "elapsed"])
+
+DEFAULT_BATCH_WORKERS = max(1, min(4, os.cpu_count() or 1))
+# 等待批量结果时检查取消标志的间隔（秒）
+BATCH_CANCEL_POLL = 0.2
+
+
+def plan_batch(source: str, input_fmt: str, output_fmt: str, output_dir=None, compression=None) -> list:
+    """
+    根据目录或 glob 模式构建批量任务列表。
+    source 为目录时匹配其中扩展名符合输入格式的文件；否则作为 glob 模式（支持 **）。
+    compression 用于确定压缩输出的扩展名（见 default_output_path）。
+    本批次自身的输出文件不会再被当作输入。
+    """
+    if os.path.isdir(source):
+        pattern = os.path.join(glob.escape(source), f"*{format_ext(input_fmt)}")
+    else:
+        pattern = source
+    inputs = sorted(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+    items = [BatchItem(p, default_output_path(p, input_fmt, output_fmt, output_dir, compression)) for p in inputs]
+    outputs = {os.path.abspath(item.output_path) for item in items}
+    return [item for item in items if os.path.abspath(item.input_path) not in outputs]
+
+
+def is_up_to_date(input_path, output_path) -> bool:
+    """输出文件存在且不早于输入文件时视为已转换。"""
+    try:
+        return os.path.getmtime(output_path) >= os.path.getmtime(input_path)
+    except OSError:
+        return False
+
+
+def _convert_batch_item(input_path, output_path, input_fmt, output_fmt, chunk_rows, engine, optimize_dtypes,
+                        use_cache, cache_by_content, columns, row_filter, compression, compression_level):
+    """进程池中执行的函数（必须位于模块顶层以便序列化）。"""
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    return convert(input_path, output_path, input_fmt, output_fmt, chunk_rows, engine,
+                   optimize_dtypes=optimize_dtypes, columns=columns, row_filter=row_filter,
+                   compression=compression, compression_level=compression_level,
+                   cache=conversion_cache.get_cache(cache_by_content) if use_cache else None)
+
+
+def run_batch(items, input_fmt: str, output_fmt: str, workers: int = DEFAULT_BATCH_WORKERS,
+              skip_existing: bool = True, on_update=None, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+              engine: str = ENGINE_AUTO, progress: ConversionProgress = None,
+              optimize_dtypes: bool = False, use_cache: bool = False, cache_by_content: bool = False, columns=None,
+              row_filter: str = None, compression: str = None, compression_level: int = None) -> BatchSummary:
+    """
+    在进程池中并行执行批量转换，阻塞直到全部完成。
+    columns、row_filter 和压缩选项应用于每个文件（见 convert），在提交前检查一次。
+    use_cache 启用转换缓存；cache_by_content 为真时缓存键使用输入文件的内容哈希（见 ConversionCache）。
+    on_update(index, status, detail) 在调用线程中被调用：
+    完成时 detail 为 ConversionResult，失败时为异常，其余情况为 None。
+    progress 被取消后，尚未开始的文件立即以 BATCH_CANCELLED 报告且不再转换
+    （已交给子进程的文件会完成并照常报告）。
+    """
+    on_update = on_update or (lambda index, status, detail: None)
+    parse_row_filter(row_filter)
+    check_compression(output_fmt, compression, compression_level)
+    started = time.time()
+    done = skipped = failed = cancelled = rows = 0
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {}
+        for index, item in enumerate(items):
+            if skip_existing and is_up_to_date(item.input_path, item.output_path):
+                skipped += 1
+                on_update(index, BATCH_SKIPPED, None)
+                continue
+            future = pool.submit(_convert_batch_item, item.input_path, item.output_path,
+                                 input_fmt, output_fmt, chunk_rows, engine, optimize_dtypes, use_cache,
+                                 cache_by_content, columns, row_filter, compression, compression_level)
+            futures[future] = index
+            on_update(index, BATCH_PENDING, None)
+
+        pending = set(futures)
+        while pending:
+            # 带超时等待，即使没有文件完成也能及时响应取消
+            finished, pending = wait(pending, timeout=BATCH_CANCEL_POLL, return_when=FIRST_COMPLETED)
+            for future in finished:
+                index = futures[future]
+                exc = future.exception()
+                if exc is not None:
+                    failed += 1
+                    log(f"[ERROR] 批量转换失败 {items[index].input_path}: {exc}", level="ERROR")
+                    on_update(index, BATCH_FAILED, exc)
+                else:
+                    result = future.result()
+                    done += 1
+                    rows += result.rows
+                    on_update(index, BATCH_DONE, result)
+            if progress is not None and progress.cancelled:
+                for future in sorted(pending, key=futures.get):
+                    if future.cancel():
+                        cancelled += 1
+                        on_update(futures[future], BATCH_CANCELLED, None)
+                pending = {future for future in pending if not future.cancelled()}
+    return BatchSummary(done, skipped, failed, cancelled, rows, time.time() - started)
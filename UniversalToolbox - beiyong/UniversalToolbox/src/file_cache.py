@@ -0,0 +1,214 @@
+# file_cache.py
+
+"""
+进程内共享的文件元数据缓存。
+
+文件浏览器、全局搜索和脚本运行器都通过它获取目录列表和文件信息，
+而不是各自重复地 listdir / stat：
+
+- 目录列表: 缓存每个目录的条目（名称、类型、大小、mtime）。
+  若该目录确实被文件监视器监视，直接信任缓存（由监视器事件失效）；
+  否则每次只 stat 一次目录本身，目录 mtime 不变即视为有效。
+- 内容信息: 惰性检测文件的文本编码和是否为二进制，以 (size, mtime) 为键缓存。
+"""
+
+import os
+import codecs
+import threading
+from collections import namedtuple
+from typing import Callable, Optional
+
+try:
+    import fs_watcher
+except ImportError:
+    fs_watcher = None
+
+
+# ----------------------------------------------------------------------
+# 1. 数据结构
+# ----------------------------------------------------------------------
+
+# 单个条目的元数据。is_dir 即条目类型（目录/文件）。
+FileMeta = namedtuple("FileMeta", ["path", "name", "is_dir", "size", "mtime_ns"])
+
+# 文件内容信息：encoding 为 None 表示二进制文件
+ContentInfo = namedtuple("ContentInfo", ["encoding", "is_binary"])
+
+# 编码探测读取的头部字节数
+SNIFF_BYTES = 8192
+
+# 依次尝试的文本编码（latin-1 可解码任意字节，作为最后的回退）
+_CANDIDATE_ENCODINGS = ("utf-8", "gbk")
+
+
+def detect_content(head: bytes) -> ContentInfo:
+    """根据文件头部字节判断编码或二进制。"""
+    if head.startswith(codecs.BOM_UTF8):
+        return ContentInfo("utf-8-sig", False)
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return ContentInfo("utf-16", False)
+    if b"\0" in head:
+        return ContentInfo(None, True)
+    for enc in _CANDIDATE_ENCODINGS:
+        try:
+            # 头部可能在多字节字符中间被截断，只要求截断处之前的内容可解码
+            codecs.getincrementaldecoder(enc)().decode(head, final=False)
+            return ContentInfo(enc, False)
+        except UnicodeDecodeError:
+            continue
+    return ContentInfo("latin-1", False)
+
+
+# 编码时会写出 BOM 的编码 -> 文件正文（BOM 之后）的编码。
+# utf-16 / utf-32 的字节序由文件的 BOM 决定，仅凭编码名无法确定，映射为 None
+_BODY_ENCODINGS = {"utf-8-sig": "utf-8", "utf-16": None, "utf-32": None}
+
+
+def body_encoding(encoding: str) -> Optional[str]:
+    """
+    返回把搜索词等文本编码为与文件正文相同字节时应使用的编码（不写 BOM）；
+    正文的字节形式无法确定时返回 None。未知编码抛出 LookupError。
+    """
+    return _BODY_ENCODINGS.get(codecs.lookup(encoding).name, encoding)
+
+
+# ----------------------------------------------------------------------
+# 2. 缓存
+# ----------------------------------------------------------------------
+
+class MetadataCache:
+    """线程安全的目录列表与文件内容信息缓存。"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # dir_path -> (dir_mtime_ns, [FileMeta, ...])
+        self._dirs = {}
+        # file_path -> (size, mtime_ns, ContentInfo)
+        self._content = {}
+        # 由文件监视器覆盖的根目录，其下被监视的目录列表无需再 stat 校验
+        self._watched_root = None
+        self._covers = None
+        self.hits = 0
+        self.misses = 0
+
+    # --- 监视器集成 ---
+
+    def set_watched_root(self, root: Optional[str], covers: Optional[Callable] = None):
+        """
+        声明 root 下的变化都会通过 apply_events 上报；传入 None 取消。
+        covers(dir_path) 不为空时只信任它返回 True 的目录（监视器未能监视的目录仍按 mtime 校验），
+        通常传入 WorkspaceWatcher.covers。
+        """
+        with self._lock:
+            self._watched_root = os.path.abspath(str(root)) if root else None
+            self._covers = covers if root else None
+
+    def _is_watched(self, dir_path: str) -> bool:
+        root, covers = self._watched_root, self._covers
+        if not root or not (dir_path == root or dir_path.startswith(root + os.sep)):
+            return False
+        return covers is None or covers(dir_path)
+
+    def apply_events(self, events):
+        """根据监视器事件使相关缓存失效。可以在监视线程中直接调用。"""
+        with self._lock:
+            for event in events:
+                if fs_watcher and event.kind == fs_watcher.RESCAN:
+                    self._dirs.clear()
+                    continue
+                path = os.path.abspath(event.path)
+                # 条目增删或大小/mtime 变化都会使父目录的列表过期
+                self._dirs.pop(os.path.dirname(path), None)
+                if event.is_dir:
+                    self._invalidate_tree(path)
+                else:
+                    self._content.pop(path, None)
+
+    def _invalidate_tree(self, dir_path):
+        prefix = dir_path + os.sep
+        for d in [d for d in self._dirs if d == dir_path or d.startswith(prefix)]:
+            del self._dirs[d]
+
+    def invalidate(self, path=None):
+        """使指定路径（或全部）的缓存失效。"""
+        with self._lock:
+            if path is None:
+                self._dirs.clear()
+                self._content.clear()
+                return
+            path = os.path.abspath(str(path))
+            self._dirs.pop(os.path.dirname(path), None)
+            self._invalidate_tree(path)
+            self._content.pop(path, None)
+
+    # --- 目录列表 ---
+
+    def list_dir(self, dir_path) -> list:
+        """返回目录下全部条目的 FileMeta 列表（按名称排序）。目录不可读时抛出 OSError。"""
+        dir_path = os.path.abspath(str(dir_path))
+        with self._lock:
+            cached = self._dirs.get(dir_path)
+            if cached is not None and self._is_watched(dir_path):
+                self.hits += 1
+                return cached[1]
+
+        dir_mtime = os.stat(dir_path).st_mtime_ns
+        if cached is not None and cached[0] == dir_mtime:
+            with self._lock:
+                self.hits += 1
+            return cached[1]
+
+        entries = []
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append(FileMeta(entry.path, entry.name, is_dir,
+                                        0 if is_dir else st.st_size, st.st_mtime_ns))
+        entries.sort(key=lambda m: m.name)
+
+        with self._lock:
+            self.misses += 1
+            self._dirs[dir_path] = (dir_mtime, entries)
+        return entries
+
+    def get(self, path) -> Optional[FileMeta]:
+        """通过父目录的缓存列表获取单个条目的元数据；不存在时返回 None。"""
+        path = os.path.abspath(str(path))
+        try:
+            entries = self.list_dir(os.path.dirname(path))
+        except OSError:
+            return None
+        name = os.path.basename(path)
+        return next((m for m in entries if m.name == name), None)
+
+    # --- 内容信息 ---
+
+    def content_info(self, meta: FileMeta) -> ContentInfo:
+        """返回文件的编码/二进制信息；仅在文件变化后才重新读取头部。"""
+        with self._lock:
+            cached = self._content.get(meta.path)
+            if cached is not None and cached[:2] == (meta.size, meta.mtime_ns):
+                return cached[2]
+        try:
+            with open(meta.path, "rb") as f:
+                info = detect_content(f.read(SNIFF_BYTES))
+        except OSError:
+            info = ContentInfo(None, True)
+        with self._lock:
+            self._content[meta.path] = (meta.size, meta.mtime_ns, info)
+        return info
+
+
+# ----------------------------------------------------------------------
+# 3. 进程内共享实例
+# ----------------------------------------------------------------------
+
+_cache = MetadataCache()
+
+
+def get_cache() -> MetadataCache:
+    return _cache
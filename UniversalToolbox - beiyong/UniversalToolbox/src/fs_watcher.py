@@ -0,0 +1,421 @@
+# fs_watcher.py
+
+"""
+工作区文件系统监视器。
+
+在后台线程中监视工作区目录，产生 added / removed / modified 事件，
+文件浏览器据此对 Treeview 做增量的 insert / delete，而不必整棵树重建。
+
+- Linux: 通过 ctypes 直接调用 libc 的 inotify 接口（无需第三方依赖）。
+- 其他平台或 inotify 不可用时: 回退为轮询目录 mtime。
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+from collections import namedtuple
+from typing import Callable, Optional
+
+try:
+    import config
+    log = config.log
+except ImportError:
+    def log(*args, level="INFO"):
+        print(f"[{time.strftime('%H:%M:%S')}] [{level}] [WATCHER] {' '.join(str(a) for a in args)}")
+
+
+# ----------------------------------------------------------------------
+# 1. 事件定义
+# ----------------------------------------------------------------------
+
+ADDED = "added"
+REMOVED = "removed"
+MODIFIED = "modified"
+# 事件丢失（例如 inotify 队列溢出）时发出，消费者应执行一次完整刷新
+RESCAN = "rescan"
+
+FsEvent = namedtuple("FsEvent", ["kind", "path", "is_dir"])
+
+
+def default_ignore(path: str, is_dir: bool = False) -> bool:
+    """与文件浏览器一致的默认忽略规则：隐藏文件和 __pycache__。"""
+    return os.path.basename(path).startswith(('.', '__pycache__'))
+
+
+def _depth_of(root: str, path: str) -> int:
+    """返回 path 相对 root 的层级（root 的直接子项为第 1 层）。"""
+    rel = os.path.relpath(path, root)
+    return 0 if rel == os.curdir else rel.count(os.sep) + 1
+
+
+# ----------------------------------------------------------------------
+# 2. 轮询后端 (通用回退方案)
+# ----------------------------------------------------------------------
+
+class _PollingBackend:
+    """
+    保存每个目录的 mtime 和条目快照。
+    目录 mtime 变化时重新列出该目录并做差异比较（新增/删除），
+    其余情况下只 stat 已知文件，检测内容修改。
+    """
+    name = "polling"
+
+    def __init__(self, root, ignore, max_depth):
+        self.root = root
+        self.ignore = ignore
+        self.max_depth = max_depth
+        # dir_path -> [dir_mtime_ns, {name: (is_dir, mtime_ns, size)}]
+        self._dirs = {}
+        self._track_dir(root)
+
+    def _should_track(self, dir_path):
+        return self.max_depth is None or _depth_of(self.root, dir_path) < self.max_depth
+
+    def _list_dir(self, dir_path):
+        entries = {}
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                    if self.ignore(entry.path, is_dir):
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries[entry.name] = (is_dir, st.st_mtime_ns, st.st_size)
+        return entries
+
+    def _track_dir(self, dir_path):
+        """记录目录及其（深度范围内的）子目录快照，不产生事件。"""
+        try:
+            mtime = os.stat(dir_path).st_mtime_ns
+            entries = self._list_dir(dir_path)
+        except OSError:
+            return
+        self._dirs[dir_path] = [mtime, entries]
+        for name, (is_dir, _, _) in entries.items():
+            child = os.path.join(dir_path, name)
+            if is_dir and self._should_track(child):
+                self._track_dir(child)
+
+    def _untrack_dir(self, dir_path):
+        prefix = dir_path + os.sep
+        for d in [d for d in self._dirs if d == dir_path or d.startswith(prefix)]:
+            del self._dirs[d]
+
+    def covers(self, dir_path) -> bool:
+        return dir_path in self._dirs
+
+    def poll(self, timeout, stop_event):
+        if stop_event.wait(timeout):
+            return []
+
+        events = []
+        for dir_path in list(self._dirs):
+            state = self._dirs.get(dir_path)
+            if state is None:
+                continue  # 已随父目录一起被移除
+            old_mtime, old_entries = state
+            try:
+                mtime = os.stat(dir_path).st_mtime_ns
+            except OSError:
+                # 目录本身消失: 由其父目录的差异比较报告 removed
+                self._untrack_dir(dir_path)
+                continue
+
+            if mtime == old_mtime:
+                # 目录结构未变化，只检查文件内容是否被修改
+                for name, (is_dir, f_mtime, f_size) in old_entries.items():
+                    if is_dir:
+                        continue
+                    child = os.path.join(dir_path, name)
+                    try:
+                        st = os.stat(child)
+                    except OSError:
+                        continue
+                    if (st.st_mtime_ns, st.st_size) != (f_mtime, f_size):
+                        old_entries[name] = (False, st.st_mtime_ns, st.st_size)
+                        events.append(FsEvent(MODIFIED, child, False))
+                continue
+
+            try:
+                new_entries = self._list_dir(dir_path)
+            except OSError:
+                continue
+            state[0], state[1] = mtime, new_entries
+
+            for name in old_entries.keys() - new_entries.keys():
+                child = os.path.join(dir_path, name)
+                was_dir = old_entries[name][0]
+                if was_dir:
+                    self._untrack_dir(child)
+                events.append(FsEvent(REMOVED, child, was_dir))
+
+            for name, (is_dir, f_mtime, f_size) in new_entries.items():
+                child = os.path.join(dir_path, name)
+                old = old_entries.get(name)
+                if old is None:
+                    if is_dir and self._should_track(child):
+                        self._track_dir(child)
+                    events.append(FsEvent(ADDED, child, is_dir))
+                elif old[0] != is_dir:
+                    # 同名条目类型改变（文件 <-> 目录），按删除后新增处理
+                    if old[0]:
+                        self._untrack_dir(child)
+                    elif self._should_track(child):
+                        self._track_dir(child)
+                    events.append(FsEvent(REMOVED, child, old[0]))
+                    events.append(FsEvent(ADDED, child, is_dir))
+                elif not is_dir and (f_mtime, f_size) != old[1:]:
+                    events.append(FsEvent(MODIFIED, child, False))
+        return events
+
+    def close(self):
+        self._dirs.clear()
+
+
+# ----------------------------------------------------------------------
+# 3. inotify 后端 (Linux)
+# ----------------------------------------------------------------------
+
+class _InotifyBackend:
+    """基于 inotify 的事件后端，目录新建时自动追加监视。"""
+    name = "inotify"
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+                  IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+    _EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, root, ignore, max_depth):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            raise OSError("libc not found")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("libc has no inotify support")
+
+        self.root = root
+        self.ignore = ignore
+        self.max_depth = max_depth
+        self._wd_to_path = {}
+        self._path_to_wd = {}
+        self._exhausted = False
+
+        fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._fd = fd
+        self._watch_tree(root)
+
+    def _should_track(self, dir_path):
+        return self.max_depth is None or _depth_of(self.root, dir_path) < self.max_depth
+
+    def _watch_tree(self, dir_path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dir_path), self.WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC and not self._exhausted:
+                self._exhausted = True
+                log("[WARNING] inotify 监视数量已达系统上限，部分子目录不会被监视。", level="WARNING")
+            return
+        self._wd_to_path[wd] = dir_path
+        self._path_to_wd[dir_path] = wd
+        try:
+            with os.scandir(dir_path) as it:
+                children = [e.path for e in it if e.is_dir(follow_symlinks=False) and not self.ignore(e.path, True)]
+        except OSError:
+            return
+        for child in children:
+            if self._should_track(child):
+                self._watch_tree(child)
+
+    def covers(self, dir_path) -> bool:
+        # 未能添加监视（ENOSPC）、超出层级或被忽略的目录都不在映射中
+        return dir_path in self._path_to_wd
+
+    def _forget_tree(self, dir_path):
+        prefix = dir_path + os.sep
+        for path in [p for p in self._path_to_wd if p == dir_path or p.startswith(prefix)]:
+            wd = self._path_to_wd.pop(path)
+            self._wd_to_path.pop(wd, None)
+
+    def poll(self, timeout, stop_event):
+        try:
+            readable, _, _ = select.select([self._fd], [], [], timeout)
+        except (OSError, ValueError):
+            return []
+        if not readable:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        # 同一轮中重复的 (kind, path) 只保留一个，避免写入大文件时产生事件风暴
+        events = {}
+        offset = 0
+        header_size = self._EVENT_HEADER.size
+        while offset + header_size <= len(data):
+            wd, mask, _cookie, name_len = self._EVENT_HEADER.unpack_from(data, offset)
+            raw_name = data[offset + header_size: offset + header_size + name_len]
+            offset += header_size + name_len
+
+            if mask & self.IN_Q_OVERFLOW:
+                return [FsEvent(RESCAN, self.root, True)]
+            if mask & self.IN_IGNORED:
+                path = self._wd_to_path.pop(wd, None)
+                if path is not None:
+                    self._path_to_wd.pop(path, None)
+                continue
+
+            dir_path = self._wd_to_path.get(wd)
+            if dir_path is None:
+                continue
+            name = os.fsdecode(raw_name.rstrip(b"\0"))
+            if not name:
+                continue  # 针对被监视目录自身的事件，由父目录报告
+            path = os.path.join(dir_path, name)
+            is_dir = bool(mask & self.IN_ISDIR)
+            if self.ignore(path, is_dir):
+                continue
+
+            if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                if is_dir and self._should_track(path):
+                    self._watch_tree(path)
+                events.pop((REMOVED, path), None)
+                events[(ADDED, path)] = FsEvent(ADDED, path, is_dir)
+            elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                if is_dir:
+                    self._forget_tree(path)
+                events.pop((ADDED, path), None)
+                events.pop((MODIFIED, path), None)
+                events[(REMOVED, path)] = FsEvent(REMOVED, path, is_dir)
+            elif mask & (self.IN_MODIFY | self.IN_CLOSE_WRITE) and not is_dir:
+                if (ADDED, path) not in events:
+                    events[(MODIFIED, path)] = FsEvent(MODIFIED, path, False)
+        return list(events.values())
+
+    def close(self):
+        try:
+            os.close(self._fd)
+        except OSError:
+            pass
+        self._wd_to_path.clear()
+        self._path_to_wd.clear()
+
+
+# ----------------------------------------------------------------------
+# 4. 监视器 (对外接口)
+# ----------------------------------------------------------------------
+
+class WorkspaceWatcher:
+    """
+    在后台守护线程中监视 root 目录。
+
+    on_events: 接收 FsEvent 列表的回调。它在监视线程中被调用，
+               GUI 消费者应把事件放入队列，再由 Tk 主线程取出应用。
+    ignore:    (path, is_dir) -> bool，返回 True 的条目及其子树不被监视。
+    max_depth: 最多报告到第几层的条目（root 的直接子项为第 1 层），None 表示不限。
+    poll_max_depth: 回退到轮询时使用的层级上限。轮询每个周期都要 stat 范围内的每个文件，
+               不能像 inotify 一样覆盖整个大工作区。
+    实际被监视的目录可能少于请求的范围（层级上限、inotify 监视数量上限），见 covers()。
+    """
+
+    def __init__(self, root, on_events: Callable, interval: float = 1.0,
+                 ignore: Optional[Callable] = None, max_depth: Optional[int] = None,
+                 use_inotify: bool = True, poll_max_depth: Optional[int] = None):
+        self.root = os.path.abspath(str(root))
+        self.on_events = on_events
+        self.interval = interval
+        self.ignore = ignore or default_ignore
+        self.max_depth = max_depth
+        self.poll_max_depth = poll_max_depth
+        self.use_inotify = use_inotify
+        self.backend_name = None
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._backend = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="WorkspaceWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        请求监视线程退出。timeout 不为空时等待线程结束（最多 timeout 秒），
+        返回后不会再有 on_events 回调；超时返回 False。
+        """
+        self._stop.set()
+        thread = self._thread
+        if timeout is None or thread is None or thread is threading.current_thread():
+            return True
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def is_running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def covers(self, dir_path) -> bool:
+        """监视器正在运行且 dir_path（绝对路径）中的变化会被报告时返回 True。可在任意线程调用。"""
+        backend = self._backend
+        return backend is not None and not self._stop.is_set() and backend.covers(dir_path)
+
+    def _create_backend(self):
+        if self.use_inotify:
+            try:
+                return _InotifyBackend(self.root, self.ignore, self.max_depth)
+            except (OSError, AttributeError) as e:
+                log(f"inotify 不可用 ({e})，改用轮询模式。")
+        depths = [d for d in (self.max_depth, self.poll_max_depth) if d is not None]
+        return _PollingBackend(self.root, self.ignore, min(depths) if depths else None)
+
+    def _run(self):
+        try:
+            backend = self._create_backend()
+        except Exception as e:
+            log(f"[ERROR] 文件监视器启动失败: {type(e).__name__}: {e}", level="ERROR")
+            return
+        self.backend_name = backend.name
+        self._backend = backend
+        log(f"Workspace watcher started ({backend.name}): {self.root}")
+
+        try:
+            while not self._stop.is_set():
+                try:
+                    events = backend.poll(self.interval, self._stop)
+                except Exception as e:
+                    log(f"[ERROR] 文件监视出错: {type(e).__name__}: {e}", level="ERROR")
+                    events = [FsEvent(RESCAN, self.root, True)]
+                    self._stop.wait(self.interval)
+                if events and not self._stop.is_set():
+                    self.on_events(events)
+        finally:
+            self._backend = None
+            backend.close()
@@ -0,0 +1,372 @@
+# hex_viewer.py
+
+"""
+大型二进制文件的十六进制查看器。
+
+HexDocument 以只读 mmap 映射文件，按行号切出该行的字节，从不把文件整体读入内存；
+HexView 基于 VirtualTable，只为可见行格式化偏移量、HEX 和 ASCII 三列。
+因此打开 GB 级的固件镜像几乎是瞬时的，内存占用与文件大小无关（页面由操作系统按需换入）。
+
+书签按文件的绝对路径持久化在 CONFIG_DIR/hex_bookmarks.json。
+"""
+
+import os
+import json
+import mmap
+import time
+import pathlib
+import tkinter as tk
+from tkinter import messagebox, simpledialog
+import ttkbootstrap as ttk
+from typing import Callable, Optional
+
+from virtual_table import VirtualTable
+
+try:
+    import config
+    log = config.log
+except ImportError:
+    config = None
+    def log(*args, level="INFO"):
+        print(f"[{time.strftime('%H:%M:%S')}] [{level}] [HEXVIEW] {' '.join(str(a) for a in args)}")
+
+
+_APP_DIR = pathlib.Path(config.APP_DIR) if config else pathlib.Path(__file__).resolve().parent
+BOOKMARKS_FILE = pathlib.Path(getattr(config, "CONFIG_DIR", _APP_DIR / "config")) / "hex_bookmarks.json"
+
+# 每行显示的字节数
+BYTES_PER_ROW = 16
+# 一次最多发送到 HEX Converter 的字节数（其输入框是单行 Entry）
+SEND_LIMIT = 64 * 1024
+
+# ASCII 列：可打印字符原样显示，其余字节显示为 '.'
+_ASCII_TABLE = bytes(b if 32 <= b < 127 else ord(".") for b in range(256))
+
+_RANGE_TAG = "in_range"
+
+
+def parse_offset(text: str) -> int:
+    """解析偏移量：支持 0x 前缀的十六进制、0o/0b 前缀以及十进制，也接受 h 后缀的十六进制（如 1F00h）。"""
+    text = text.strip().replace("_", "")
+    if not text:
+        raise ValueError("偏移量为空")
+    if text[-1] in "hH":
+        return int(text[:-1], 16)
+    return int(text, 0)
+
+
+# ----------------------------------------------------------------------
+# 1. 文档
+# ----------------------------------------------------------------------
+
+class HexDocument:
+    """只读映射的二进制文件；row(index) 返回该行的 (偏移量, HEX, ASCII) 文本。"""
+
+    def __init__(self, path, bytes_per_row: int = BYTES_PER_ROW):
+        self.path = os.path.abspath(path)
+        self.bytes_per_row = bytes_per_row
+        self._file = open(self.path, "rb")
+        try:
+            self.size = os.fstat(self._file.fileno()).st_size
+            # 空文件无法映射
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        except Exception:
+            self._file.close()
+            raise
+        # 超过 4 GB 的文件需要更多位数显示偏移量
+        self.offset_digits = max(8, len(f"{max(0, self.size - 1):X}"))
+
+    @property
+    def row_count(self) -> int:
+        return -(-self.size // self.bytes_per_row)
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def read(self, offset: int, length: int) -> bytes:
+        """读取 [offset, offset + length) 范围内的字节，超出文件末尾的部分被截断。"""
+        if self._map is None or length <= 0:
+            return b""
+        offset = max(0, min(offset, self.size))
+        return self._map[offset:offset + length]
+
+    def format_offset(self, offset: int) -> str:
+        return f"{offset:0{self.offset_digits}X}"
+
+    def row(self, index: int) -> tuple:
+        offset = index * self.bytes_per_row
+        data = self.read(offset, self.bytes_per_row)
+        half = self.bytes_per_row // 2
+        # 每行中间多留一个空格，便于按 8 字节计数
+        hex_text = f"{data[:half].hex(' ')}  {data[half:].hex(' ')}".upper().rstrip()
+        return self.format_offset(offset), hex_text, data.translate(_ASCII_TABLE).decode("ascii")
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ----------------------------------------------------------------------
+# 2. 书签
+# ----------------------------------------------------------------------
+
+def _load_all_bookmarks() -> dict:
+    try:
+        with open(BOOKMARKS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        log(f"[WARNING] 书签读取失败: {e}", level="WARNING")
+        return {}
+
+
+def load_bookmarks(path) -> list:
+    """返回文件的书签 [(偏移量, 名称), ...]，按偏移量排序。"""
+    entries = _load_all_bookmarks().get(os.path.abspath(path), [])
+    return sorted((int(offset), str(label)) for offset, label in entries)
+
+
+def save_bookmarks(path, bookmarks: list):
+    all_bookmarks = _load_all_bookmarks()
+    key = os.path.abspath(path)
+    if bookmarks:
+        all_bookmarks[key] = [[offset, label] for offset, label in sorted(bookmarks)]
+    else:
+        all_bookmarks.pop(key, None)
+    try:
+        BOOKMARKS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(BOOKMARKS_FILE, "w", encoding="utf-8") as f:
+            json.dump(all_bookmarks, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        log(f"[ERROR] 书签保存失败: {e}", level="ERROR")
+
+
+# ----------------------------------------------------------------------
+# 3. 界面
+# ----------------------------------------------------------------------
+
+class HexView(ttk.Frame):
+    """
+    十六进制查看器标签页。
+
+    单击一行选中该行，Shift+单击把选区扩展到该行；选区也可以在 Start / Length 中按字节精确编辑。
+    on_send(data, source) 可选，用于把选区内容发送到 HEX Converter。
+    销毁时关闭映射，文件不再被占用。
+    """
+
+    def __init__(self, parent, path, on_send: Optional[Callable[[bytes, str], None]] = None,
+                 font_size: int = 10, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.doc = HexDocument(path)
+        self.on_send = on_send
+        self.bookmarks = load_bookmarks(self.doc.path)
+        self._anchor = None     # Shift+单击扩展选区时的起始行
+
+        self.goto_var = tk.StringVar()
+        self.start_var = tk.StringVar(value="0x0")
+        self.length_var = tk.StringVar(value=str(min(BYTES_PER_ROW, self.doc.size)))
+
+        toolbar = ttk.Frame(self)
+        toolbar.pack(fill="x", pady=(0, 5))
+        ttk.Label(toolbar, text="Go to offset:").pack(side="left")
+        self.goto_entry = ttk.Entry(toolbar, textvariable=self.goto_var, width=14, bootstyle="info")
+        self.goto_entry.pack(side="left", padx=5)
+        self.goto_entry.bind("<Return>", lambda e: self.goto())
+        ttk.Button(toolbar, text="Go", bootstyle="primary", command=self.goto).pack(side="left")
+
+        ttk.Separator(toolbar, orient=tk.VERTICAL).pack(side="left", padx=10, fill="y")
+        ttk.Label(toolbar, text="Start:").pack(side="left")
+        start_entry = ttk.Entry(toolbar, textvariable=self.start_var, width=14)
+        start_entry.pack(side="left", padx=5)
+        ttk.Label(toolbar, text="Length:").pack(side="left")
+        length_entry = ttk.Entry(toolbar, textvariable=self.length_var, width=8)
+        length_entry.pack(side="left", padx=5)
+        for entry in (start_entry, length_entry):
+            entry.bind("<Return>", lambda e: self._on_range_edited())
+            entry.bind("<FocusOut>", lambda e: self._on_range_edited())
+        ttk.Button(toolbar, text="Send to HEX Converter", bootstyle="success-outline",
+                   command=self.send_selection, state=tk.NORMAL if on_send else tk.DISABLED).pack(side="left", padx=5)
+
+        self.status = ttk.Label(toolbar, text="", bootstyle="info")
+        self.status.pack(side="right")
+
+        body = ttk.Panedwindow(self, orient="horizontal")
+        body.pack(fill="both", expand=True)
+
+        digits = self.doc.offset_digits
+        self.table = VirtualTable(body, columns=[("Offset", 20 + digits * 9), ("HEX", 440), ("ASCII", 170)],
+                                  row_count=self.doc.row_count, get_row=self.doc.row, row_tags=self._row_tags,
+                                  height=20)
+        style = ttk.Style()
+        style.configure("HexView.Treeview", font=("Consolas", font_size))
+        self.table.tree.configure(style="HexView.Treeview")
+        self.table.tree.tag_configure(_RANGE_TAG, background="#005691", foreground="white")
+        self.table.tree.bind("<ButtonRelease-1>", self._on_row_click, add="+")
+        body.add(self.table, weight=1)
+
+        # --- 书签 ---
+        side = ttk.Frame(body, padding=(5, 0, 0, 0))
+        body.add(side, weight=0)
+        ttk.Label(side, text="🔖 Bookmarks", font=("Segoe UI", 10, "bold")).pack(anchor="w")
+        self.bookmark_tree = ttk.Treeview(side, columns=("Offset", "Label"), show="headings",
+                                          selectmode="browse", height=10)
+        self.bookmark_tree.heading("Offset", text="Offset", anchor=tk.W)
+        self.bookmark_tree.column("Offset", width=20 + digits * 9, stretch=tk.NO, anchor=tk.W)
+        self.bookmark_tree.heading("Label", text="Label", anchor=tk.W)
+        self.bookmark_tree.column("Label", width=140, stretch=tk.YES, anchor=tk.W)
+        self.bookmark_tree.pack(fill="both", expand=True, pady=5)
+        self.bookmark_tree.bind("<Double-1>", lambda e: self._goto_bookmark())
+        self.bookmark_tree.bind("<Return>", lambda e: self._goto_bookmark())
+        buttons = ttk.Frame(side)
+        buttons.pack(fill="x")
+        ttk.Button(buttons, text="Add", bootstyle="info-outline",
+                   command=self.add_bookmark).pack(side="left", expand=True, fill="x", padx=(0, 2))
+        ttk.Button(buttons, text="Remove", bootstyle="danger-outline",
+                   command=self.remove_bookmark).pack(side="left", expand=True, fill="x", padx=(2, 0))
+
+        for widget in (self, self.table.tree, self.goto_entry):
+            widget.bind("<Control-g>", lambda e: self.goto_entry.focus_set() or "break")
+        self.bind("<Destroy>", self._on_destroy)
+
+        self._refresh_bookmarks()
+        self._update_status()
+
+    # --- 选区 ---
+
+    def selection_range(self) -> tuple:
+        """解析 Start / Length，返回限制在文件范围内的 (起始偏移量, 长度)。"""
+        start = parse_offset(self.start_var.get())
+        length = parse_offset(self.length_var.get())
+        if start < 0 or length < 0:
+            raise ValueError("偏移量和长度不能为负数")
+        if start >= self.doc.size:
+            raise ValueError(f"偏移量 0x{start:X} 超出文件大小 (0x{self.doc.size:X})")
+        return start, min(length, self.doc.size - start)
+
+    def set_selection(self, start: int, length: int):
+        self.start_var.set(f"0x{start:X}")
+        self.length_var.set(str(length))
+        self.table.refresh()
+        self._update_status()
+
+    def _row_tags(self, row: int) -> tuple:
+        try:
+            start, length = self.selection_range()
+        except ValueError:
+            return ()
+        if length <= 0:
+            return ()
+        first, last = start // BYTES_PER_ROW, (start + length - 1) // BYTES_PER_ROW
+        return (_RANGE_TAG,) if first <= row <= last else ()
+
+    def _on_row_click(self, event):
+        row = self.table.selected
+        if row is None:
+            return
+        # Shift 键：从上次单击的行扩展到本行
+        if event.state & 0x0001 and self._anchor is not None:
+            first, last = sorted((self._anchor, row))
+        else:
+            self._anchor = first = last = row
+        start = first * BYTES_PER_ROW
+        self.set_selection(start, min((last + 1) * BYTES_PER_ROW, self.doc.size) - start)
+
+    def _on_range_edited(self):
+        self.table.refresh()
+        self._update_status()
+
+    # --- 跳转 ---
+
+    def goto(self, offset: Optional[int] = None):
+        """跳转到偏移量（默认取 Go to 输入框），并把选区起点移到该处。"""
+        if offset is None:
+            try:
+                offset = parse_offset(self.goto_var.get())
+            except ValueError as e:
+                messagebox.showwarning("Go to offset", f"无效的偏移量: {e}", parent=self)
+                return
+        if not 0 <= offset < self.doc.size:
+            messagebox.showwarning("Go to offset", f"偏移量 0x{offset:X} 超出文件大小 (0x{self.doc.size:X})",
+                                   parent=self)
+            return
+        self._anchor = offset // BYTES_PER_ROW
+        self.start_var.set(f"0x{offset:X}")
+        self.table.see(self._anchor)
+        self._update_status()
+        self.table.tree.focus_set()
+
+    # --- 书签 ---
+
+    def _refresh_bookmarks(self):
+        self.bookmark_tree.delete(*self.bookmark_tree.get_children())
+        for i, (offset, label) in enumerate(self.bookmarks):
+            self.bookmark_tree.insert("", "end", iid=str(i), values=(self.doc.format_offset(offset), label))
+
+    def add_bookmark(self):
+        """在选区起点添加书签。"""
+        try:
+            offset, _ = self.selection_range()
+        except ValueError as e:
+            messagebox.showwarning("Bookmark", str(e), parent=self)
+            return
+        label = simpledialog.askstring("Add Bookmark", f"0x{offset:X} 的书签名称:", parent=self)
+        if label is None:
+            return
+        self.bookmarks = sorted(self.bookmarks + [(offset, label.strip() or f"0x{offset:X}")])
+        save_bookmarks(self.doc.path, self.bookmarks)
+        self._refresh_bookmarks()
+
+    def remove_bookmark(self):
+        selected = self.bookmark_tree.focus()
+        if not selected:
+            return
+        del self.bookmarks[int(selected)]
+        save_bookmarks(self.doc.path, self.bookmarks)
+        self._refresh_bookmarks()
+
+    def _goto_bookmark(self):
+        selected = self.bookmark_tree.focus()
+        if selected:
+            self.goto(self.bookmarks[int(selected)][0])
+
+    # --- 发送 ---
+
+    def send_selection(self):
+        if self.on_send is None:
+            return
+        try:
+            start, length = self.selection_range()
+        except ValueError as e:
+            messagebox.showwarning("Send to HEX Converter", str(e), parent=self)
+            return
+        if length > SEND_LIMIT:
+            messagebox.showwarning("Send to HEX Converter",
+                                   f"选区过大 ({length:,} 字节)，一次最多发送 {SEND_LIMIT:,} 字节。\n"
+                                   f"整个文件请使用 HEX Converter 的 File Mode。", parent=self)
+            return
+        source = f"{os.path.basename(self.doc.path)} @ 0x{start:X} (+{length})"
+        self.on_send(self.doc.read(start, length), source)
+
+    # --- 其他 ---
+
+    def _update_status(self):
+        try:
+            start, length = self.selection_range()
+            selection = f"selection 0x{start:X}-0x{start + max(0, length - 1):X} ({length:,} bytes)"
+        except ValueError:
+            selection = "no selection"
+        self.status.config(text=f"{self.doc.size:,} bytes | {self.doc.row_count:,} rows | {selection}")
+
+    def _on_destroy(self, event):
+        if event.widget is self and not self.doc.closed:
+            self.doc.close()
@@ -11,6 +11,7 @@ import importlib
 import time 
 import re 
 import importlib.util
+import queue
 from typing import Optional, Any
 
 # --- 导入配置和安全函数 ---
@@ -86,6 +87,28 @@ except ImportError:
     config = ConfigPlaceholder()
     log("Warning: config.py not found. Using internal fallback.")
 
+import fs_watcher
+import workspace
+import file_cache
+import search_index
+import search_engine
+import search_results
+import hex_viewer
+
+# 文件浏览器最多显示的目录层级（根目录的直接子项为第 1 层）
+EXPLORER_MAX_DEPTH = 4
+# 切换工作区时等待旧监视器线程退出的最长时间（秒）
+WATCHER_STOP_TIMEOUT = 3.0
+
+# 全局内容搜索的文件类型
+SEARCH_TEXT_SUFFIXES = ['.txt', '.py', '.json', '.log', '.md', '.ini', '.csv']
+# 按字节搜索的二进制/转储文件类型（不进入搜索索引）
+SEARCH_BINARY_SUFFIXES = ['.bin', '.hex']
+# 搜索结果每次刷新最多取出的条数（结果列表是虚拟化的，取出的代价很小）
+SEARCH_RESULTS_BATCH = 5000
+# 接收十六进制查看器选区的插件
+HEX_CONVERTER_PLUGIN = "hex_converter"
+
 
 # --- 辅助类：语法高亮 ---
 class SyntaxHighlighter:
@@ -179,8 +202,12 @@ class ToolboxApp:
         self.font_size = tk.IntVar(value=11) 
         self.style = tb.Style(self.style_name.get()) 
         
+        # 当前工作区（根目录 + 排除规则），由浏览器、搜索和插件共享
+        self.workspace = workspace.get_workspace()
+        
         # --- UI 初始化 ---
         self._create_topbar()
+        self._create_search_options_bar()
         self._create_statusbar() 
         self._create_main_panes()
         self._create_context_menu()
@@ -198,6 +225,11 @@ class ToolboxApp:
         
         self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
 
+        # 启动工作区监视器，外部文件变化将增量地反映到文件浏览器
+        self._start_workspace_watcher()
+        # 在后台构建/更新内容搜索索引
+        self._start_search_index()
+
     # ----------------------------
     # Core Utility & Setup
     # ----------------------------
@@ -303,6 +335,8 @@ class ToolboxApp:
                              command=self.create_empty_tab).pack(side="left", padx=4)
         ttk.Button(file_group, text="Open File (O)", bootstyle="secondary-outline",
                              command=self.open_file_dialog).pack(side="left", padx=4)
+        ttk.Button(file_group, text="Hex View", bootstyle="secondary-outline",
+                             command=self.open_hex_view_dialog).pack(side="left", padx=4)
         ttk.Button(file_group, text="Save (S)", bootstyle="success", 
                              command=self.save_active_file).pack(side="left", padx=4)
         ttk.Button(file_group, text="Close (W)", bootstyle="danger-outline",
@@ -319,6 +353,10 @@ class ToolboxApp:
         
         ttk.Button(system_group, text="Refresh Explorer", bootstyle="secondary-outline",
                              command=self._refresh_workspace_tree).pack(side="left", padx=4)
+        ttk.Button(system_group, text="Open Workspace", bootstyle="secondary-outline",
+                             command=self._choose_workspace_root).pack(side="left", padx=4)
+        ttk.Button(system_group, text="Excludes", bootstyle="secondary-outline",
+                             command=self._edit_workspace_excludes).pack(side="left", padx=4)
 
         ttk.Separator(top, orient=tk.VERTICAL).pack(side="left", padx=15, fill="y")
 
@@ -338,6 +376,7 @@ class ToolboxApp:
         ttk.Label(center_group, text="Search Content:").pack(side="left", padx=(4,2))
         self.search_entry = ttk.Entry(center_group, width=20, bootstyle="info")
         self.search_entry.pack(side="left", padx=4)
+        self.search_entry.bind("<Return>", lambda e: self._start_global_search())
         ttk.Button(center_group, text="Find", bootstyle="primary", command=self._start_global_search).pack(side="left", padx=4)
 
         # --- Theme Group ---
@@ -354,6 +393,59 @@ class ToolboxApp:
         ttk.Button(theme_group, text="A-", bootstyle="secondary-outline", command=lambda: self._adjust_font(-1)).pack(side="right", padx=4)
         ttk.Button(theme_group, text="A+", bootstyle="secondary-outline", command=lambda: self._adjust_font(+1)).pack(side="right", padx=4)
         
+    def _create_search_options_bar(self):
+        """搜索选项栏：匹配方式、文件过滤和结果上限。"""
+        self.search_regex = tk.BooleanVar(value=False)
+        self.search_case = tk.BooleanVar(value=False)
+        self.search_whole_word = tk.BooleanVar(value=False)
+        self.search_all_matches = tk.BooleanVar(value=False)
+        self.search_hex = tk.BooleanVar(value=False)
+        self.search_file_filter = tk.StringVar(value="")
+        self.search_max_hits = tk.StringVar(value="10000")
+
+        bar = ttk.Frame(self.root, padding=(5, 0, 5, 5))
+        bar.pack(side="top", fill="x")
+
+        ttk.Label(bar, text="Search Options:").pack(side="left", padx=(4, 6))
+        ttk.Checkbutton(bar, text="Match Case", variable=self.search_case,
+                        bootstyle="round-toggle").pack(side="left", padx=4)
+        ttk.Checkbutton(bar, text="Whole Word", variable=self.search_whole_word,
+                        bootstyle="round-toggle").pack(side="left", padx=4)
+        ttk.Checkbutton(bar, text="Regex", variable=self.search_regex,
+                        bootstyle="round-toggle").pack(side="left", padx=4)
+        ttk.Checkbutton(bar, text="All Matches", variable=self.search_all_matches,
+                        bootstyle="round-toggle").pack(side="left", padx=4)
+        # 按十六进制字节模式搜索任意文件，如 "62 F1 90 ?? ??"
+        ttk.Checkbutton(bar, text="HEX Bytes", variable=self.search_hex,
+                        bootstyle="round-toggle").pack(side="left", padx=4)
+
+        ttk.Separator(bar, orient=tk.VERTICAL).pack(side="left", padx=10, fill="y")
+        ttk.Label(bar, text="Files (e.g. *.py, !tests/*):").pack(side="left", padx=(4, 2))
+        ttk.Entry(bar, textvariable=self.search_file_filter, width=28).pack(side="left", padx=4)
+
+        ttk.Label(bar, text="Max Hits:").pack(side="left", padx=(10, 2))
+        ttk.Combobox(bar, textvariable=self.search_max_hits, values=["1000", "10000", "100000"],
+                     width=8).pack(side="left", padx=4)
+
+    def _build_search_options(self):
+        """根据选项栏的当前状态构建 SearchOptions。"""
+        include, exclude = search_engine.SearchOptions.parse_file_filter(self.search_file_filter.get())
+        try:
+            max_hits = max(1, int(self.search_max_hits.get()))
+        except ValueError:
+            max_hits = 10000
+            self.search_max_hits.set(str(max_hits))
+        return search_engine.SearchOptions(
+            regex=self.search_regex.get(),
+            case_sensitive=self.search_case.get(),
+            whole_word=self.search_whole_word.get(),
+            all_matches=self.search_all_matches.get(),
+            max_hits=max_hits,
+            include=include,
+            exclude=exclude,
+            hex_pattern=self.search_hex.get(),
+        )
+
     def _create_statusbar(self):
         self.status = ttk.Label(self.root, text="Initializing...", anchor="w", bootstyle="secondary")
         self.status.pack(side="bottom", fill="x")
@@ -416,6 +508,7 @@ class ToolboxApp:
     def _create_context_menu(self):
         self.tree_menu = Menu(self.root, tearoff=0)
         self.tree_menu.add_command(label="Open (Double Click)", command=self._open_tree_selection)
+        self.tree_menu.add_command(label="Open in Hex Viewer", command=lambda: self._open_tree_selection(hex_view=True))
         self.tree_menu.add_separator()
         self.tree_menu.add_command(label="New File in Folder", command=lambda: self._create_new_item(is_file=True))
         self.tree_menu.add_command(label="New Folder in Folder", command=lambda: self._create_new_item(is_file=False))
@@ -428,7 +521,7 @@ class ToolboxApp:
             if item_id:
                 self.tree.selection_set(item_id)
                 path = self._get_path_from_tree_item(item_id)
-                is_root = (path == str(config.APP_DIR))
+                is_root = (path == str(self.workspace.root))
                 self.tree_menu.entryconfig("Delete", state="disabled" if is_root else "normal")
                 self.tree_menu.post(event.x_root, event.y_root)
         except Exception as e:
@@ -439,7 +532,7 @@ class ToolboxApp:
         if not selected_item: return
         
         path = self._get_path_from_tree_item(selected_item)
-        if not path or path == str(config.APP_DIR): return # 保护根目录
+        if not path or path == str(self.workspace.root): return # 保护根目录
         
         name = os.path.basename(path)
         p = pathlib.Path(path)
@@ -449,6 +542,7 @@ class ToolboxApp:
                 try:
                     os.rmdir(p) 
                     self.log_to_console(f"Folder deleted: {path}")
+                    self._apply_fs_event(fs_watcher.FsEvent(fs_watcher.REMOVED, path, True))
                 except OSError as e:
                     messagebox.showerror("Deletion Error", f"Could not delete '{name}'. Is it empty? Error: {e}")
                     self.log_to_console(f"[ERROR] Deletion failed: {e}")
@@ -457,15 +551,14 @@ class ToolboxApp:
                 try:
                     os.remove(p)
                     self.log_to_console(f"File deleted: {path}")
+                    self._apply_fs_event(fs_watcher.FsEvent(fs_watcher.REMOVED, path, False))
                 except Exception as e:
                     messagebox.showerror("Deletion Error", f"Could not delete {name}: {e}")
                     self.log_to_console(f"[ERROR] Deletion failed: {e}")
-        
-        self._refresh_workspace_tree()
 
     def _create_new_item(self, is_file=True):
         selected_item = self.tree.focus()
-        base_path = config.APP_DIR
+        base_path = self.workspace.root
         
         # 确定新项目创建的父目录
         if selected_item:
@@ -491,7 +584,7 @@ class ToolboxApp:
                     full_path.mkdir(exist_ok=True)
                 
                 self.log_to_console(f"Created new {'file' if is_file else 'folder'}: {full_path}")
-                self._refresh_workspace_tree()
+                self._apply_fs_event(fs_watcher.FsEvent(fs_watcher.ADDED, str(full_path), not is_file))
                 
                 # 展开父节点
                 if selected_item and full_path.parent == base_path:
@@ -516,18 +609,18 @@ class ToolboxApp:
             parent_id = self.tree.parent(current_id)
 
             if not parent_id:
-                # 已经是根节点 (APP_DIR 名称)
+                # 已经是根节点 (工作区根目录名称)
                 break
                 
             parts.insert(0, text)
             current_id = parent_id
         
-        if not parts and self.tree.item(item_id, 'text') == str(config.APP_DIR.name):
-            return str(config.APP_DIR)
+        if not parts and self.tree.item(item_id, 'text') == str(self.workspace.root.name):
+            return str(self.workspace.root)
         
         if not parts: return None 
         
-        full_path = config.APP_DIR
+        full_path = self.workspace.root
         for part in parts:
              full_path /= part
              
@@ -542,51 +635,166 @@ class ToolboxApp:
             is_open = self.tree.item(item_id, 'open')
             self.tree.item(item_id, open=not is_open)
 
-    def _open_tree_selection(self):
+    def _open_tree_selection(self, hex_view=False):
         item_id = self.tree.focus()
         path = self._get_path_from_tree_item(item_id)
         if path and pathlib.Path(path).is_file():
-            self.open_file(path)
+            if hex_view:
+                self.open_hex_view(path)
+            else:
+                self.open_file(path)
 
     def _refresh_workspace_tree(self):
-        """刷新文件浏览器 Treeview"""
+        """刷新文件浏览器 Treeview（完整重建，仅用于手动刷新和事件丢失时）"""
         self.tree.delete(*self.tree.get_children())
-        if not hasattr(config, 'APP_DIR'): return
         
-        root_path = config.APP_DIR
+        root_path = self.workspace.root
         root_node = self.tree.insert("", "end", text=str(root_path.name), iid=str(root_path), open=True, tags=('dir',))
         
-        def insert_node(parent_id, current_path, depth):
-            if depth > 4: return 
-            
-            try:
-                items = sorted(list(current_path.iterdir()))
-                
-                # 先添加文件夹
-                for p in items:
-                    if p.name.startswith(('.', '__pycache__')): continue
-                    is_dir = p.is_dir()
-                    
-                    if is_dir:
-                        tag = "dir"
-                        new_id = self.tree.insert(parent_id, "end", text=p.name, iid=str(p), tags=(tag,))
-                        insert_node(new_id, p, depth + 1)
-                
-                # 后添加文件
-                for p in items:
-                    if p.name.startswith(('.', '__pycache__')): continue
-                    if p.is_file():
-                        tag = "file"
-                        self.tree.insert(parent_id, "end", text=p.name, iid=str(p), tags=(tag,))
-                        
-            except Exception as e:
-                self.log_to_console(f"无法读取目录 {current_path}: {e}")
-
-        insert_node(root_node, root_path, 1)
+        self._populate_tree_dir(root_node, root_path, 1)
         
         self.tree.tag_configure('dir', font=('Segoe UI', 10, 'bold'), foreground="#87CEEB")
         self.tree.tag_configure('file', font=('Segoe UI', 10))
 
+    def _populate_tree_dir(self, parent_id, current_path, depth):
+        """递归地将目录内容插入到 parent_id 节点下（先文件夹，后文件）。"""
+        if depth > EXPLORER_MAX_DEPTH: return 
+        
+        try:
+            # 被排除规则命中的条目（venv、node_modules 等）不会出现，也不会被遍历
+            dirs, files = self.workspace.list_dir(current_path)
+            
+            # 先添加文件夹
+            for meta in dirs:
+                new_id = self.tree.insert(parent_id, "end", text=meta.name, iid=meta.path, tags=("dir",))
+                self._populate_tree_dir(new_id, pathlib.Path(meta.path), depth + 1)
+            
+            # 后添加文件
+            for meta in files:
+                self.tree.insert(parent_id, "end", text=meta.name, iid=meta.path, tags=("file",))
+                    
+        except Exception as e:
+            self.log_to_console(f"无法读取目录 {current_path}: {e}")
+
+    # ----------------------------
+    # Explorer Incremental Updates
+    # ----------------------------
+
+    def _start_workspace_watcher(self):
+        """启动后台文件监视器，事件经队列交给 Tk 主线程处理。"""
+        if not hasattr(self, '_fs_event_queue'):
+            self._fs_event_queue = queue.Queue()
+            self.root.after(300, self._drain_fs_events)
+
+        cache = file_cache.get_cache()
+
+        def on_events(events):
+            if self.fs_watcher is not watcher:
+                return  # 已被替换的旧监视器（切换工作区时未能及时停止）
+            # 在监视线程中立即使共享缓存失效并通知索引，Treeview 更新则交给主线程
+            cache.apply_events(events)
+            if getattr(self, 'search_index', None):
+                self.search_index.notify(events)
+            self._fs_event_queue.put(events)
+
+        # inotify 监视整个工作区（排除的目录除外），以便元数据缓存可以信任被监视目录的列表；
+        # 轮询的代价与文件数成正比，只覆盖浏览器显示的层级
+        watcher = self.fs_watcher = fs_watcher.WorkspaceWatcher(
+            self.workspace.root, on_events, ignore=self.workspace.is_excluded,
+            poll_max_depth=EXPLORER_MAX_DEPTH
+        )
+        self.fs_watcher.start()
+        cache.set_watched_root(self.workspace.root, self.fs_watcher.covers)
+
+    def _switch_workspace(self, root=None, excludes=None):
+        """切换工作区根目录或排除规则，并重建浏览器和监视器。"""
+        # 等待旧监视器退出，否则它可能在新的缓存和索引就绪后仍上报旧工作区的事件
+        if not self.fs_watcher.stop(timeout=WATCHER_STOP_TIMEOUT):
+            self.log_to_console("[WARNING] 文件监视器未能及时停止，旧工作区的事件将被忽略。")
+        file_cache.get_cache().set_watched_root(None)
+        self.workspace = workspace.set_workspace(root, excludes)
+        # 丢弃旧工作区尚未处理的事件
+        while not self._fs_event_queue.empty():
+            self._fs_event_queue.get_nowait()
+        self._refresh_workspace_tree()
+        self._start_workspace_watcher()
+        self._start_search_index()
+        self.update_status(f"Workspace: {self.workspace.root}")
+
+    def _start_search_index(self):
+        """为当前工作区启动（或重启）后台搜索索引。"""
+        if getattr(self, 'search_index', None):
+            self.search_index.stop()
+        self.search_index = search_index.SearchIndex(self.workspace, SEARCH_TEXT_SUFFIXES)
+        self.search_index.start()
+
+    def _choose_workspace_root(self):
+        path = filedialog.askdirectory(title="Select workspace folder", initialdir=str(self.workspace.root))
+        if path:
+            self._switch_workspace(root=path)
+
+    def _edit_workspace_excludes(self):
+        """编辑额外的排除规则（gitignore 语法，逗号分隔）。根目录的 .gitignore 会自动生效。"""
+        current = ", ".join(self.workspace.excludes)
+        value = simpledialog.askstring(
+            "Workspace Excludes",
+            "Exclude patterns (gitignore syntax, comma separated).\n"
+            "Rules from the workspace .gitignore are always applied.",
+            initialvalue=current, parent=self.root
+        )
+        if value is None:
+            return
+        patterns = [p.strip() for p in value.split(",") if p.strip()]
+        self._switch_workspace(excludes=patterns)
+
+    def _drain_fs_events(self):
+        """在主线程中取出监视器事件并应用到 Treeview。"""
+        try:
+            while True:
+                for event in self._fs_event_queue.get_nowait():
+                    safe_call(self._apply_fs_event, event)
+        except queue.Empty:
+            pass
+        self.root.after(300, self._drain_fs_events)
+
+    def _apply_fs_event(self, event):
+        """将单个 FsEvent 作为定向的 insert / delete 应用到文件浏览器。"""
+        # 本地操作（新建/删除/保存）直接调用此方法，需同步使共享缓存失效
+        file_cache.get_cache().apply_events([event])
+        if event.kind == fs_watcher.RESCAN:
+            self._refresh_workspace_tree()
+        elif event.kind == fs_watcher.REMOVED:
+            if self.tree.exists(str(event.path)):
+                self.tree.delete(str(event.path))
+        elif event.kind == fs_watcher.ADDED:
+            self._insert_tree_path(pathlib.Path(event.path), event.is_dir)
+        # MODIFIED: 内容变化不影响树结构
+
+    def _insert_tree_path(self, path, is_dir):
+        """在已显示的父节点下按排序位置插入单个条目，目录会连同子项一起插入。"""
+        parent_id = str(path.parent)
+        if not self.tree.exists(parent_id) or self.tree.exists(str(path)):
+            return
+        if self.workspace.is_excluded(path, is_dir):
+            return
+        depth = len(path.relative_to(self.workspace.root).parts)
+        if depth > EXPLORER_MAX_DEPTH:
+            return
+
+        # 与完整刷新保持相同顺序：文件夹在前，同类按名称排序
+        key = (not is_dir, path.name)
+        index = "end"
+        for i, child in enumerate(self.tree.get_children(parent_id)):
+            child_key = ('file' in self.tree.item(child, 'tags'), self.tree.item(child, 'text'))
+            if key < child_key:
+                index = i
+                break
+
+        tag = "dir" if is_dir else "file"
+        new_id = self.tree.insert(parent_id, index, text=path.name, iid=str(path), tags=(tag,))
+        if is_dir:
+            self._populate_tree_dir(new_id, path, depth + 1)
+
     def create_empty_tab(self, title="Untitled"):
         """
         创建一个新的空文本编辑标签页。
@@ -614,7 +822,7 @@ class ToolboxApp:
         filetypes = [("All files", "*.*"), ("Text files", "*.txt"), ("Python", "*.py")]
         path = filedialog.askopenfilename(
             title="Open a file", 
-            initialdir=str(config.APP_DIR),
+            initialdir=str(self.workspace.root),
             filetypes=filetypes
         )
         if path:
@@ -649,16 +857,20 @@ class ToolboxApp:
                      text_widget.see(f"{line_num}.0")
                      
                 return
+
+        # 二进制文件不解码为文本，改用十六进制查看器打开
+        try:
+            with open(path, "rb") as f:
+                is_binary = file_cache.detect_content(f.read(file_cache.SNIFF_BYTES)).is_binary
+        except OSError:
+            is_binary = False
+        if is_binary:
+            self.open_hex_view(path)
+            return
         
         # --- 创建新的标签页并加载内容 ---
         
-        # 更新最近文件列表
-        if path in self.recent_files:
-            self.recent_files.remove(path)
-        self.recent_files.appendleft(path)
-        
-        self.file_combo['values'] = [os.path.basename(p) for p in self.recent_files]
-        self.file_combo.set(os.path.basename(path)) 
+        self._add_recent_file(path)
         self.log_to_console(f"Opening file: {path}")
 
         try:
@@ -695,6 +907,57 @@ class ToolboxApp:
              
         self.update_status(f"Opened file: {os.path.basename(path)}")
         
+    def _add_recent_file(self, path):
+        """更新最近文件列表"""
+        if path in self.recent_files:
+            self.recent_files.remove(path)
+        self.recent_files.appendleft(path)
+        
+        self.file_combo['values'] = [os.path.basename(p) for p in self.recent_files]
+        self.file_combo.set(os.path.basename(path)) 
+
+    def open_hex_view_dialog(self):
+        path = filedialog.askopenfilename(title="Open in Hex Viewer", initialdir=str(self.workspace.root))
+        if path:
+            self.open_hex_view(path)
+
+    def open_hex_view(self, path):
+        """
+        在十六进制查看器标签页中打开文件。文件以只读方式映射，只渲染可见行，
+        打开大文件也不会读取其内容。
+        """
+        path = os.path.abspath(str(path))
+        for frame, (existing_path, _) in self.open_tabs_map.items():
+            if existing_path == path and isinstance(frame, hex_viewer.HexView):
+                self.notebook.select(frame)
+                return
+
+        try:
+            frame = hex_viewer.HexView(self.notebook, path, on_send=self.send_to_hex_converter,
+                                       font_size=self.font_size.get(), padding=5)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Hex Viewer", f"无法打开 {path}: {e}")
+            return
+
+        self._add_recent_file(path)
+        self.notebook.add(frame, text=f"HEX: {os.path.basename(path)}")
+        self.notebook.select(frame)
+        self.open_tabs_map[frame] = (path, False)
+        self.log_to_console(f"Opening file in hex viewer: {path} ({frame.doc.size:,} bytes)")
+        self.update_status(f"Opened file: {os.path.basename(path)} (hex)")
+
+    def send_to_hex_converter(self, data, source):
+        """把字节送入 HEX Converter 插件；插件尚未打开时先启动它。"""
+        frame = next((self.root.nametowidget(tab_id) for tab_id in self.notebook.tabs()
+                      if hasattr(self.root.nametowidget(tab_id), 'load_bytes')), None)
+        if frame is None:
+            frame = self._launch_plugin(HEX_CONVERTER_PLUGIN)
+            if frame is None:
+                return
+        self.notebook.select(frame)
+        frame.load_bytes(data, source)
+        self.update_status(f"Sent {len(data):,} bytes to HEX Converter: {source}")
+
     def close_active_tab(self):
         current_tab_id = self.notebook.select()
         if not current_tab_id: return
@@ -718,6 +981,9 @@ class ToolboxApp:
             del self.open_tabs_map[frame]
             
         self.notebook.forget(current_tab_id)
+        if isinstance(frame, hex_viewer.HexView):
+            # 销毁时释放文件映射
+            frame.destroy()
         self.update_status(f"Closed tab: {tab_title}")
 
 
@@ -740,7 +1006,7 @@ class ToolboxApp:
             filetypes = [("All files", "*.*"), ("Text files", "*.txt"), ("Python", "*.py")]
             path = filedialog.asksaveasfilename(
                 title="Save file as", 
-                initialdir=str(config.APP_DIR), 
+                initialdir=str(self.workspace.root), 
                 filetypes=filetypes, 
                 defaultextension=".txt"
             )
@@ -756,7 +1022,7 @@ class ToolboxApp:
             self.notebook.tab(current_tab_id, text=os.path.basename(path))
                 
             self.update_status(f"文件已保存: {os.path.basename(path)}")
-            self._refresh_workspace_tree()
+            self._apply_fs_event(fs_watcher.FsEvent(fs_watcher.ADDED, str(pathlib.Path(path).resolve()), False))
             self.log_to_console(f"File saved: {path}")
             return True
 
@@ -772,56 +1038,32 @@ class ToolboxApp:
             messagebox.showinfo("Search", "Please enter a search term.")
             return
 
-        self.log_to_console(f"Starting global search for: '{search_term}'")
-        self.update_status(f"Searching for '{search_term}'...")
-        
-        # 在单独的线程中执行搜索以避免 UI 阻塞
-        self.root.after(10, lambda: self._execute_search_and_display(search_term))
-        
-    def _execute_search_and_display(self, search_term):
-        results = self._perform_content_search(search_term)
-        
-        if not results:
-            self.update_status(f"Search complete. No matches found for '{search_term}'.")
-            messagebox.showinfo("Search Result", f"No file content found matching '{search_term}' in the workspace.")
+        # 搜索在后台线程池中执行，命中结果经队列流式返回，UI 不会被阻塞
+        try:
+            job = search_engine.SearchJob(self.workspace, search_term,
+                                          SEARCH_TEXT_SUFFIXES + SEARCH_BINARY_SUFFIXES,
+                                          index=getattr(self, 'search_index', None),
+                                          options=self._build_search_options())
+        except re.error as e:
+            messagebox.showerror("Search", f"Invalid regular expression: {e}")
+            return
+        except ValueError as e:
+            messagebox.showerror("Search", f"Invalid HEX pattern: {e}")
             return
 
-        self._display_search_results(search_term, results)
-        self.update_status(f"Search complete. Found {len(results)} matches.")
-        
-    def _perform_content_search(self, term):
-        results = []
-        term_lower = term.lower()
-        
-        def search_dir(directory):
-            try:
-                for item in directory.iterdir():
-                    if item.name.startswith(('.', '__pycache__')): continue
-                    
-                    if item.is_dir():
-                        search_dir(item)
-                    elif item.is_file():
-                        # 只搜索常见的文本文件类型
-                        if item.suffix.lower() in ['.txt', '.py', '.json', '.log', '.md', '.ini', '.csv']:
-                            try:
-                                with open(item, 'r', encoding='utf-8', errors='ignore') as f:
-                                    for line_num, line in enumerate(f, 1):
-                                        if term_lower in line.lower():
-                                            results.append({
-                                                'path': str(item),
-                                                'line': line_num,
-                                                'content': line.strip()
-                                            })
-                                            break # 只记录每文件第一次匹配
-                            except Exception as e:
-                                self.log_to_console(f"[WARNING] Could not read file {item.name}: {e}")
-            except Exception as e:
-                self.log_to_console(f"[ERROR] Error traversing directory {directory}: {e}")
+        # 同一时间只运行一个搜索
+        if getattr(self, 'search_job', None) and not self.search_job.finished.is_set():
+            self.search_job.cancel()
 
-        search_dir(config.APP_DIR)
-        return results
+        self.log_to_console(f"Starting global search for: '{search_term}'")
+        self.update_status(f"Searching for '{search_term}'...")
+        self.search_job = job
+        view = self._create_search_results_tab(search_term, job)
+        job.start()
+        self.root.after(50, lambda: self._poll_search_job(job, view))
 
-    def _display_search_results(self, term, results):
+    def _create_search_results_tab(self, term, job):
+        """创建搜索结果标签页（计数、进度条、取消按钮和结果列表），返回其控件字典。"""
         title = f"Search Results for '{term}'"
         
         # 移除已有的搜索结果 Tab
@@ -834,46 +1076,86 @@ class ToolboxApp:
         self.notebook.select(frame)
         self.open_tabs_map[frame] = (None, False)
 
-        ttk.Label(frame, text=f"🔍 {title}", font=("Segoe UI", 12, "bold")).pack(anchor="w", pady=(0, 10))
-
-        tree = ttk.Treeview(frame, columns=('Line', 'Preview'), show="headings", bootstyle="primary")
-        tree.heading('Line', text='Line', anchor=tk.CENTER)
-        tree.column('Line', width=50, stretch=tk.NO, anchor=tk.CENTER)
-        tree.heading('Preview', text='Content Preview', anchor=tk.W)
-        tree.column('Preview', width=500, stretch=tk.YES, anchor=tk.W)
-        
-        vsb = ttk.Scrollbar(frame, orient="vertical", command=tree.yview, bootstyle="round")
-        tree.configure(yscrollcommand=vsb.set)
-        
-        tree.pack(side="left", fill="both", expand=True)
-        vsb.pack(side="right", fill="y")
-
-        # 插入结果
-        file_items = {}
-        for result in results:
-            path = result['path']
-            
-            if path not in file_items:
-                file_items[path] = tree.insert('', 'end', iid=path, text=os.path.basename(path), tags=('file_path',))
-            
-            tree.insert(file_items[path], 'end', values=(result['line'], result['content']), tags=('match',))
-        
-        tree.tag_configure('file_path', font=('Segoe UI', 10, 'bold'), foreground='#90EE90')
-        tree.tag_configure('match', font=('Consolas', 9))
+        header = ttk.Frame(frame)
+        header.pack(fill="x", pady=(0, 5))
+        ttk.Label(header, text=f"🔍 {title}", font=("Segoe UI", 12, "bold")).pack(side="left")
+        cancel_btn = ttk.Button(header, text="Cancel", bootstyle="danger-outline", command=job.cancel)
+        cancel_btn.pack(side="right")
+        count_label = ttk.Label(header, text="Searching...", bootstyle="info")
+        count_label.pack(side="right", padx=10)
+
+        # 文件总数确定之前使用不确定模式
+        progress = ttk.Progressbar(frame, mode="indeterminate", bootstyle="info-striped")
+        progress.pack(fill="x", pady=(0, 10))
+        progress.start(10)
+
+        # 结果保存在紧凑的存储中，列表只渲染可见行
+        store = search_results.ResultStore()
+        results = search_results.VirtualResultList(
+            frame, store, on_open=lambda path, line: self.open_file(path, line_num=line),
+            path_label=lambda path: self.workspace.relpath(path) or os.path.basename(path))
+        results.pack(fill="both", expand=True)
+
+        return {'frame': frame, 'results': results, 'store': store, 'count_label': count_label,
+                'progress': progress, 'cancel_btn': cancel_btn}
+
+    def _append_search_hits(self, view, hits):
+        """将一批命中结果加入结果存储，并刷新可见行。"""
+        view['store'].extend(hits)
+        view['results'].refresh()
+
+    def _poll_search_job(self, job, view):
+        """在主线程中定期取出搜索结果，逐步填充结果标签页。"""
+        if str(view['frame']) not in self.notebook.tabs():
+            # 结果标签页已被关闭或被新的搜索替换
+            job.cancel()
+            return
 
-        def on_result_double_click(event):
-            selected_item = tree.focus()
-            if not selected_item: return
-            
-            parent_id = tree.parent(selected_item)
-            if not parent_id: return 
-            
-            path = parent_id # 父 ID 就是路径
-            line_num = tree.item(selected_item, 'values')[0]
-            
-            self.open_file(path, line_num=int(line_num))
-            
-        tree.bind('<Double-1>', on_result_double_click)
+        # 每次最多取出一批，避免大量命中时阻塞界面
+        batch = []
+        try:
+            while len(batch) < SEARCH_RESULTS_BATCH:
+                batch.append(job.hits.get_nowait())
+        except queue.Empty:
+            pass
+        if batch:
+            self._append_search_hits(view, batch)
+
+        progress = view['progress']
+        if job.files_total is not None:
+            if str(progress.cget('mode')) == 'indeterminate':
+                progress.stop()
+                progress.configure(mode='determinate', maximum=max(1, job.files_total))
+            progress.configure(value=job.files_done)
+            view['count_label'].config(
+                text=f"{job.hit_count} matches | {job.files_done}/{job.files_total} files scanned")
+
+        if job.finished.is_set() and job.hits.empty():
+            self._finish_search(job, view)
+        else:
+            self.root.after(50, lambda: self._poll_search_job(job, view))
+
+    def _finish_search(self, job, view):
+        progress = view['progress']
+        progress.stop()
+        progress.configure(mode='determinate', maximum=1, value=1)
+        view['cancel_btn'].configure(state=tk.DISABLED)
+
+        file_count = view['store'].file_count
+        summary = f"{job.hit_count} matches in {file_count} files ({job.elapsed:.2f}s)"
+        if job.cancelled:
+            summary += " - cancelled"
+        elif job.truncated:
+            summary += f" - limit of {job.options.max_hits} reached"
+        view['count_label'].config(text=summary)
+
+        if job.error is not None:
+            self.update_status(f"Search failed: {job.error}")
+        elif job.hit_count == 0 and not job.cancelled:
+            self.update_status(f"Search complete. No matches found for '{job.term}'.")
+        else:
+            self.update_status(f"Search {'cancelled' if job.cancelled else 'complete'}. Found {job.hit_count} matches.")
+        self.log_to_console(f"Search for '{job.term}': {summary}")
 
 
     # ----------------------------
@@ -1072,16 +1354,21 @@ class ToolboxApp:
         """
         selected_id = self.plugin_list_tree.focus()
         if not selected_id: return
-        
+        self._launch_plugin(selected_id)
+
+    def _launch_plugin(self, selected_id):
+        """
+        在新标签页中启动插件，成功时返回插件的 Frame，否则返回 None。
+        """
         module = self.plugin_modules.get(selected_id) 
 
         if not module:
             self.log_to_console(f"[ERROR] Plugin module not found for: {selected_id}", tag='error')
             messagebox.showerror("Run Error", f"Plugin module '{selected_id}' not found in cache.")
-            return
+            return None
 
         register_func = getattr(module, 'register', None)
-        plugin_name = module.PLUGIN_META.get('name', selected_id)
+        plugin_name = getattr(module, 'PLUGIN_META', {}).get('name', selected_id)
         
         if register_func and callable(register_func):
             plugin_frame = ttk.Frame(self.notebook, padding=5)
@@ -1099,12 +1386,13 @@ class ToolboxApp:
                 self.notebook.forget(plugin_frame)
                 if plugin_frame in self.open_tabs_map:
                     del self.open_tabs_map[plugin_frame]
-            else:
-                self.log_to_console(f"Plugin '{plugin_name}' launched successfully.", tag='info')
+                return None
+            self.log_to_console(f"Plugin '{plugin_name}' launched successfully.", tag='info')
+            return plugin_frame
 
-        else:
-            self.log_to_console(f"[ERROR] Plugin '{plugin_name}' does not have a valid 'register' function.", tag='error')
-            messagebox.showerror("Run Error", f"Plugin '{plugin_name}' is missing the required 'register' function.")
+        self.log_to_console(f"[ERROR] Plugin '{plugin_name}' does not have a valid 'register' function.", tag='error')
+        messagebox.showerror("Run Error", f"Plugin '{plugin_name}' is missing the required 'register' function.")
+        return None
 
 # ----------------------------
 # Application Entry Point
@@ -4,6 +4,7 @@ from tkinter import ttk, filedialog, messagebox
 from ttkbootstrap.constants import *
 import traceback
 import sys
+import time
 
 # 尝试导入核心库
 try:
@@ -21,9 +22,9 @@ except ImportError:
     pd = None
     HAS_PARQUET = False
 
-# 核心修正: 使用相对导入来访问 src/config.py
+# 与其他插件一致，直接导入同级的 src/config.py
 try:
-    from .. import config
+    import config
     run_background = config.run_background
     safe_call = config.safe_call
     log = config.log
@@ -42,34 +43,11 @@ except ImportError:
 name = "Data_Converter"
 
 # --- 核心格式映射定义 ---
-# 映射格式名到其扩展名、pandas读取和写入函数
-FORMAT_MAP = {
-    "CSV": {
-        "ext": ".csv",
-        "read": "read_csv",
-        "write": "to_csv"
-    },
-    "Excel": {
-        "ext": ".xlsx",
-        "read": "read_excel",
-        "write": "to_excel"
-    },
-    "JSON": {
-        "ext": ".json",
-        "read": "read_json",
-        "write": "to_json"
-    },
-}
-
-# 动态添加 Parquet (如果依赖存在)
-if HAS_PARQUET:
-    FORMAT_MAP["Parquet"] = {
-        "ext": ".parquet",
-        "read": "read_parquet",
-        "write": "to_parquet"
-    }
-
-SUPPORTED_FORMATS = list(FORMAT_MAP.keys()) # ["CSV", "Excel", "JSON", "Parquet"]
+# 格式映射和流式读写逻辑位于无界面的转换引擎中
+import conversion_engine
+import conversion_cache
+from conversion_engine import FORMAT_MAP, SUPPORTED_FORMATS # ["CSV", "Excel", "JSON", "JSONL", "Parquet"]
+from virtual_table import VirtualTable
 
 
 class DataConverterUI:
@@ -84,6 +62,33 @@ class DataConverterUI:
         # 核心修正：使用独立的输入和输出格式变量
         self.input_format = tk.StringVar(value="CSV")
         self.output_format = tk.StringVar(value="Excel")
+        # 读取引擎：auto 在安装了 pyarrow 时对 CSV/JSON Lines/Parquet 使用 Arrow 原生解析
+        self.engine = tk.StringVar(value=conversion_engine.ENGINE_AUTO)
+        # 类型优化：整数/浮点降级、低基数文本转分类、日期时间解析
+        self.optimize_dtypes = tk.BooleanVar(value=False)
+        # 转换缓存：输入和选项未变化的重复转换直接恢复上次的输出
+        self.use_cache = tk.BooleanVar(value=True)
+        # 按内容识别输入：复制、重命名或 touch 过的相同文件也能命中，但每次都要完整读取输入计算哈希
+        self.cache_by_content = tk.BooleanVar(value=False)
+        # Excel 输入的工作表（空表示第一个工作表）
+        self.sheet = tk.StringVar(value="")
+        # 列投影（逗号分隔的列名，空表示全部列）和行筛选表达式，下推到读取端
+        self.columns = tk.StringVar(value="")
+        self.row_filter = tk.StringVar(value="")
+        # 输出压缩方式和级别（级别为空时使用默认值），可选项随输出格式变化
+        self.compression = tk.StringVar(value=conversion_engine.compression_codecs(self.output_format.get())[0])
+        self.compression_level = tk.StringVar(value="")
+
+        # 批量转换状态
+        self.batch_source = tk.StringVar(value="")
+        self.batch_output_dir = tk.StringVar(value="")
+        self.batch_workers = tk.StringVar(value=str(conversion_engine.DEFAULT_BATCH_WORKERS))
+        self.batch_skip_existing = tk.BooleanVar(value=True)
+        self.batch_items = []
+
+        # 预览：只读取输入文件头部的样本行和元数据
+        self.preview_result = None
+        self.preview_request = None
         
         self.disabled = (pd is None) # 依赖检查在 register 函数中已完成
         
@@ -102,7 +107,7 @@ class DataConverterUI:
         # 核心修改 1: 移除 state="readonly" 以允许手动输入
         input_combo = ttk.Combobox(mode_frame, values=SUPPORTED_FORMATS, textvariable=self.input_format, width=12)
         input_combo.pack(side="left", padx=(0, 10))
-        input_combo.bind("<<ComboboxSelected>>", self._update_output_path)
+        input_combo.bind("<<ComboboxSelected>>", self._on_input_changed)
         
         # Separator Label
         ttk.Label(mode_frame, text="->", font=("Segoe UI", 10, "bold")).pack(side="left", padx=5)
@@ -114,6 +119,17 @@ class DataConverterUI:
         output_combo.pack(side="left")
         output_combo.bind("<<ComboboxSelected>>", self._update_output_path)
 
+        # Engine
+        ttk.Label(mode_frame, text="引擎:").pack(side="left", padx=(20, 5))
+        engines = conversion_engine.ENGINES if HAS_PARQUET else [conversion_engine.ENGINE_PANDAS]
+        ttk.Combobox(mode_frame, values=engines, textvariable=self.engine, state="readonly", width=8).pack(side="left")
+        ttk.Checkbutton(mode_frame, text="类型优化", variable=self.optimize_dtypes,
+                        bootstyle="round-toggle").pack(side="left", padx=(20, 0))
+        ttk.Checkbutton(mode_frame, text="使用缓存", variable=self.use_cache,
+                        bootstyle="round-toggle").pack(side="left", padx=(10, 0))
+        ttk.Checkbutton(mode_frame, text="按内容识别", variable=self.cache_by_content,
+                        bootstyle="round-toggle").pack(side="left", padx=(10, 0))
+
 
         # --- 输入文件选择 ---
         input_frame = ttk.Frame(self.parent)
@@ -121,6 +137,15 @@ class DataConverterUI:
         ttk.Label(input_frame, text="输入文件:", width=10).pack(side="left")
         ttk.Entry(input_frame, textvariable=self.input_path, width=60).pack(side="left", fill="x", expand=True, padx=4)
         ttk.Button(input_frame, text="选择文件", command=self._select_input_file, bootstyle="info-outline").pack(side="left")
+        # CSV 输入的探测编码（对文件头、中、尾采样，一次确定）
+        self.encoding_label = ttk.Label(input_frame, text="", width=16, bootstyle="info")
+        self.encoding_label.pack(side="left", padx=(6, 0))
+        # Excel 输入的工作表选择
+        self.sheet_combo = ttk.Combobox(input_frame, textvariable=self.sheet, state="disabled", width=14)
+        self.sheet_combo.pack(side="left", padx=(6, 0))
+        self.sheet_combo.bind("<<ComboboxSelected>>", lambda e: self._start_preview())
+        ttk.Button(input_frame, text="预览", command=lambda: safe_call(self._start_preview),
+                   bootstyle="secondary-outline").pack(side="left", padx=(6, 0))
 
         # --- 输出文件路径 ---
         output_frame = ttk.Frame(self.parent)
@@ -129,6 +154,23 @@ class DataConverterUI:
         ttk.Entry(output_frame, textvariable=self.output_path, width=60).pack(side="left", fill="x", expand=True, padx=4)
         self.save_button = ttk.Button(output_frame, text="选择保存", command=self._select_output_file, bootstyle="info-outline")
         self.save_button.pack(side="left")
+        ttk.Label(output_frame, text="压缩:").pack(side="left", padx=(10, 4))
+        self.compression_combo = ttk.Combobox(output_frame, textvariable=self.compression, state="readonly", width=8,
+                                              values=conversion_engine.compression_codecs(self.output_format.get()))
+        self.compression_combo.pack(side="left")
+        self.compression_combo.bind("<<ComboboxSelected>>", self._update_output_path)
+        ttk.Label(output_frame, text="级别:").pack(side="left", padx=(6, 4))
+        ttk.Entry(output_frame, textvariable=self.compression_level, width=4).pack(side="left")
+
+        # --- 列投影与行筛选 ---
+        subset_frame = ttk.Frame(self.parent)
+        subset_frame.pack(fill="x", padx=8, pady=4)
+        ttk.Label(subset_frame, text="选择列:", width=10).pack(side="left")
+        ttk.Entry(subset_frame, textvariable=self.columns, width=30).pack(side="left", fill="x", expand=True, padx=4)
+        ttk.Label(subset_frame, text="行筛选:").pack(side="left", padx=(10, 0))
+        ttk.Entry(subset_frame, textvariable=self.row_filter, width=40).pack(side="left", fill="x", expand=True, padx=4)
+        ttk.Label(subset_frame, text="如 date >= '2024-01-01' and status in ('ok', 'retry')",
+                  bootstyle="secondary").pack(side="left")
 
         # --- 执行按钮 ---
         exec_frame = ttk.Frame(self.parent)
@@ -137,15 +179,88 @@ class DataConverterUI:
                                          command=lambda: safe_call(self._start_conversion), 
                                          bootstyle="success")
         self.convert_button.pack(side="right")
-        
+        self.cancel_button = ttk.Button(exec_frame, text="取消", command=self._cancel_conversion,
+                                        bootstyle="danger-outline", state="disabled")
+        self.cancel_button.pack(side="right", padx=4)
+        self.progress_label = ttk.Label(exec_frame, text="", bootstyle="info")
+        self.progress_label.pack(side="right", padx=10)
+        self.progress_bar = ttk.Progressbar(exec_frame, mode="determinate", maximum=1000, bootstyle="success-striped")
+        self.progress_bar.pack(side="left", fill="x", expand=True)
+        self.progress = None
+
+        self._create_preview_ui()
+        self._create_batch_ui()
+
         if self.disabled:
             self.convert_button.configure(state="disabled", text="依赖缺失")
+            self.batch_button.configure(state="disabled", text="依赖缺失")
 
         log(f"插件 {name} UI 初始化完成。")
         self.app.update_status(f"Data Converter 已加载。")
 
 
+    def _create_preview_ui(self):
+        """数据预览：表结构、行数估算和样本行（虚拟化表格，只渲染可见行）。"""
+        preview_frame = ttk.Labelframe(self.parent, text=f"数据预览 (前 {conversion_engine.PREVIEW_ROWS} 行)", padding=8)
+        preview_frame.pack(fill="both", expand=True, padx=8, pady=4)
+        self.preview_label = ttk.Label(preview_frame, text="选择输入文件后自动预览。", bootstyle="info")
+        self.preview_label.pack(anchor="w", pady=(0, 4))
+        self.preview_table = VirtualTable(preview_frame, height=8)
+        self.preview_table.pack(fill="both", expand=True)
+
+    def _create_batch_ui(self):
+        """批量转换：目录或 glob → 进程池并行转换，逐文件显示状态。"""
+        batch_frame = ttk.Labelframe(self.parent, text="批量转换 (目录或通配符, 如 D:/exports/**/*.csv)", padding=8)
+        batch_frame.pack(fill="both", expand=True, padx=8, pady=(4, 8))
+
+        source_frame = ttk.Frame(batch_frame)
+        source_frame.pack(fill="x", pady=2)
+        ttk.Label(source_frame, text="输入来源:", width=10).pack(side="left")
+        ttk.Entry(source_frame, textvariable=self.batch_source, width=60).pack(side="left", fill="x", expand=True, padx=4)
+        ttk.Button(source_frame, text="选择目录", command=lambda: self._select_directory(self.batch_source),
+                   bootstyle="info-outline").pack(side="left")
+
+        out_frame = ttk.Frame(batch_frame)
+        out_frame.pack(fill="x", pady=2)
+        ttk.Label(out_frame, text="输出目录:", width=10).pack(side="left")
+        ttk.Entry(out_frame, textvariable=self.batch_output_dir, width=60).pack(side="left", fill="x", expand=True, padx=4)
+        ttk.Button(out_frame, text="选择目录", command=lambda: self._select_directory(self.batch_output_dir),
+                   bootstyle="info-outline").pack(side="left")
+
+        option_frame = ttk.Frame(batch_frame)
+        option_frame.pack(fill="x", pady=4)
+        ttk.Label(option_frame, text="并行进程数:").pack(side="left")
+        ttk.Spinbox(option_frame, from_=1, to=max(1, os.cpu_count() or 1), textvariable=self.batch_workers,
+                    width=5).pack(side="left", padx=4)
+        ttk.Checkbutton(option_frame, text="跳过已转换的文件", variable=self.batch_skip_existing,
+                        bootstyle="round-toggle").pack(side="left", padx=10)
+        self.batch_button = ttk.Button(option_frame, text="开始批量转换",
+                                       command=lambda: safe_call(self._start_batch), bootstyle="success")
+        self.batch_button.pack(side="right")
+        self.batch_cancel_button = ttk.Button(option_frame, text="取消", command=self._cancel_batch,
+                                              bootstyle="danger-outline", state="disabled")
+        self.batch_cancel_button.pack(side="right", padx=4)
+        self.batch_total_label = ttk.Label(option_frame, text="", bootstyle="info")
+        self.batch_total_label.pack(side="right", padx=10)
+
+        columns = ("file", "status", "rows", "rate", "time")
+        self.batch_tree = ttk.Treeview(batch_frame, columns=columns, show="headings", height=8)
+        for col, text, width, stretch in (("file", "文件", 320, True), ("status", "状态", 80, False),
+                                          ("rows", "行数", 90, False), ("rate", "行/秒", 90, False),
+                                          ("time", "耗时", 70, False)):
+            self.batch_tree.heading(col, text=text, anchor="w")
+            self.batch_tree.column(col, width=width, stretch=stretch, anchor="w")
+        vsb = ttk.Scrollbar(batch_frame, orient="vertical", command=self.batch_tree.yview)
+        self.batch_tree.configure(yscrollcommand=vsb.set)
+        self.batch_tree.pack(side="left", fill="both", expand=True)
+        vsb.pack(side="right", fill="y")
+
     # --- 文件选择逻辑 ---
+
+    def _select_directory(self, variable):
+        path = filedialog.askdirectory(title="选择目录")
+        if path:
+            variable.set(path)
     
     def _get_filetypes_and_ext(self, format_name):
         """根据格式名获取文件类型列表和默认扩展名"""
@@ -168,39 +283,97 @@ class DataConverterUI:
         path = filedialog.askopenfilename(title=f"选择 {current_format} 输入文件", filetypes=filetypes)
         if path:
             self.input_path.set(path)
-            self._update_output_path(None)
+            self._on_input_changed(None)
+
+    def _on_input_changed(self, event):
+        """输入文件或输入格式变化：更新默认输出路径、工作表列表并重新预览"""
+        self._update_output_path(event)
+        self._update_sheet_list()
+        self._start_preview()
 
     def _update_output_path(self, event):
-        """根据输入文件和输出格式，生成默认输出路径"""
+        """根据输入文件、输出格式和压缩方式，生成默认输出路径"""
         input_path = self.input_path.get()
+        self._update_encoding_label()
+        self._update_compression_list()
         if not input_path:
             self.output_path.set("")
             return
 
-        base_name = os.path.splitext(input_path)[0]
+        # 命名规则与批量转换共用（同格式时添加 '_converted'，自定义格式按名称推断扩展名）
+        self.output_path.set(conversion_engine.default_output_path(
+            input_path, self.input_format.get(), self.output_format.get(), compression=self.compression.get()))
+
+    def _update_compression_list(self):
+        """输出格式变化时更新可选的压缩方式，当前选择不可用时回到该格式的默认值"""
+        codecs = conversion_engine.compression_codecs(self.output_format.get())
+        self.compression_combo.configure(values=codecs)
+        if self.compression.get() not in codecs:
+            self.compression.set(codecs[0])
+            self.compression_level.set("")
+
+    def _update_encoding_label(self):
+        """CSV 输入时显示探测到的编码（结果按文件指纹缓存，转换时不会重复探测）"""
+        input_path = self.input_path.get()
+        if self.input_format.get() != "CSV" or not os.path.isfile(input_path):
+            self.encoding_label.config(text="")
+            return
+        encoding = safe_call(conversion_engine.detect_encoding, input_path)
+        self.encoding_label.config(text=f"编码: {encoding}" if encoding else "编码: 未知")
+
+    def _update_sheet_list(self):
+        """Excel 输入时列出工作表（只读取工作簿目录，不加载单元格）"""
+        input_path = self.input_path.get()
+        sheets = None
+        if self.input_format.get() == "Excel" and os.path.isfile(input_path):
+            sheets = safe_call(conversion_engine.list_excel_sheets, input_path)
+        if sheets:
+            self.sheet_combo.configure(values=sheets, state="readonly")
+            if self.sheet.get() not in sheets:
+                self.sheet.set(sheets[0])
+        else:
+            self.sheet_combo.configure(values=[], state="disabled")
+            self.sheet.set("")
+
+    # --- 数据预览 ---
+
+    def _start_preview(self):
+        """在后台读取输入文件的头部样本；较早发起的预览结果到达时直接丢弃"""
+        input_path = self.input_path.get()
         input_fmt = self.input_format.get()
-        output_fmt = self.output_format.get()
-        
-        if output_fmt in FORMAT_MAP:
-            new_ext = FORMAT_MAP[output_fmt]['ext']
-            
-            # 移除输入文件原有的扩展名，避免出现 file.csv.xlsx 的情况
-            parts = base_name.rsplit('.', 1)
-            # 检查 parts[-1] 是否是任何已知格式的扩展名（不包括点）
-            known_extensions = [v['ext'].strip('.') for v in FORMAT_MAP.values()]
-            clean_base_name = parts[0] if len(parts) > 1 and parts[-1] in known_extensions else base_name
-            
-            # 如果输入输出格式相同，添加 '_converted'
-            if input_fmt == output_fmt:
-                new_path = f"{clean_base_name}_converted{new_ext}"
-            else:
-                new_path = f"{clean_base_name}{new_ext}"
-            
-            self.output_path.set(new_path)
+        if not os.path.isfile(input_path) or pd is None:
+            return
+        request = (input_path, input_fmt, self.sheet.get())
+        self.preview_request = request
+        self.preview_label.config(text=f"正在读取 {os.path.basename(input_path)} ...")
+        started = time.time()
+
+        def on_done(result, exc):
+            if self.preview_request != request:
+                return
+            if exc:
+                self.preview_label.config(text=f"预览失败: {exc}")
+                self.preview_table.set_columns(())
+                self.preview_table.set_source(0, lambda index: ())
+                return
+            self._show_preview(result, time.time() - started)
+
+        run_background(conversion_engine.preview, on_done, input_path, input_fmt, sheet=self.sheet.get() or None)
+
+    def _show_preview(self, result, elapsed):
+        self.preview_result = result
+        if result.total_rows is None:
+            total = "未知"
         else:
-            # 核心修改 5: 对于自定义输出格式，尝试推断扩展名
-            new_ext = f".{output_fmt.lower()}"
-            self.output_path.set(f"{base_name}{new_ext}")
+            total = f"约 {result.total_rows:,}" if result.estimated else f"{result.total_rows:,}"
+        self.preview_label.config(text=f"{len(result.columns)} 列，总行数 {total}，读取耗时 {elapsed * 1000:.0f} ms")
+        # 表头显示 "列名 (类型)"，列宽按列名和样本值的长度估算
+        columns = []
+        for i, (column, dtype) in enumerate(zip(result.columns, result.dtypes)):
+            longest = max([len(column) + len(dtype) + 3] + [len(row[i]) for row in result.rows[:50]])
+            columns.append((f"{column} ({dtype})", min(320, max(60, longest * 8))))
+        self.preview_table.set_columns(columns)
+        self.preview_table.set_source(len(result.rows), lambda index: result.rows[index])
 
     def _select_output_file(self):
         """打开文件保存对话框选择输出文件"""
@@ -221,59 +394,29 @@ class DataConverterUI:
 
     # --- 转换核心逻辑 ---
 
-    def _conversion_task(self, input_path, output_path, input_fmt, output_fmt):
-        """实际执行转换的后台函数"""
-        log(f"开始转换: {input_fmt} -> {output_fmt}")
-
-        # 核心修改 6: 统一获取 pandas 函数名，支持自定义格式的推断
-        def get_func_name(fmt, prefix):
-            if fmt in FORMAT_MAP:
-                key = 'read' if prefix == 'read' else 'write'
-                return FORMAT_MAP[fmt][key]
-            # 尝试基于约定派生函数名 (e.g., HDF5 -> read_hdf5, to_hdf5)
-            return f"{prefix}_{fmt.lower()}"
-            
-        read_func_name = get_func_name(input_fmt, 'read')
-        write_func_name = get_func_name(output_fmt, 'to')
-        
-        # 1. 动态读取数据 (read)
-        read_func = getattr(pd, read_func_name, None)
-        if not read_func:
-             raise AttributeError(f"Pandas 不支持读取格式 '{input_fmt}'。找不到函数 'pd.{read_func_name}'。")
-
-        # 针对 CSV 做编码处理
-        if input_fmt == "CSV":
-            try:
-                df = read_func(input_path, encoding='utf-8')
-            except UnicodeDecodeError:
-                df = read_func(input_path, encoding='gbk')
-        
-        # 针对 JSON 明确指定 orient='records' 以确保兼容性
-        elif input_fmt == "JSON":
-            df = read_func(input_path, orient='records')
-            
-        else:
-            # 对于其他已知格式或自定义格式，直接调用函数
-            df = read_func(input_path) 
-
-        # 2. 动态写入数据 (write)
-        write_func = getattr(df, write_func_name, None)
-        if not write_func:
-            raise AttributeError(f"Pandas 不支持写入格式 '{output_fmt}'。找不到函数 'df.{write_func_name}'。")
-        
-        # 针对 CSV/Excel 写入时排除 index
-        if output_fmt in ["CSV", "Excel"]:
-             write_func(output_path, index=False)
-        
-        # 针对 JSON 明确指定 orient='records' 以确保兼容性
-        elif output_fmt == "JSON":
-             write_func(output_path, orient='records')
-             
-        else:
-            # For Parquet or custom formats, default write call
-            write_func(output_path)
-            
-        return f"成功将 {input_fmt} 转换为 {output_fmt}: {output_path}"
+    def _conversion_task(self, input_path, output_path, input_fmt, output_fmt, progress=None):
+        """实际执行转换的后台函数：分块流式读写，内存占用与文件大小无关"""
+        result = conversion_engine.convert(input_path, output_path, input_fmt, output_fmt,
+                                           engine=self.engine.get(), progress=progress,
+                                           optimize_dtypes=self.optimize_dtypes.get(), sheet=self.sheet.get() or None,
+                                           columns=conversion_engine.parse_columns(self.columns.get()),
+                                           row_filter=self.row_filter.get(),
+                                           compression=self.compression.get(),
+                                           compression_level=self._compression_level(),
+                                           cache=conversion_cache.get_cache(self.cache_by_content.get())
+                                           if self.use_cache.get() else None)
+        if result.cached:
+            how = {conversion_cache.RESTORE_CURRENT: "输出已是最新，未重新转换",
+                   conversion_cache.RESTORE_CLONED: "已从缓存克隆输出 (reflink)",
+                   conversion_cache.RESTORE_COPIED: "已从缓存复制输出"}[result.cached]
+            return f"{how}: {output_path}\n共 {result.rows} 行，耗时 {result.elapsed:.2f}s"
+        encoding = f"，编码 {result.encoding}" if result.encoding else ""
+        message = (f"成功将 {input_fmt} 转换为 {output_fmt}: {output_path}\n"
+                   f"共 {result.rows} 行，{result.chunks} 块，耗时 {result.elapsed:.2f}s ({result.engine} 引擎{encoding})")
+        if result.memory:
+            before, after = result.memory
+            message += f"\n类型优化: 每块内存 {before / 2**20:.1f} MB -> {after / 2**20:.1f} MB"
+        return message
 
     def _start_conversion(self):
         """启动后台转换任务"""
@@ -289,6 +432,9 @@ class DataConverterUI:
         if not os.path.exists(input_path):
             messagebox.showerror("错误", "输入文件不存在。")
             return
+
+        if not self._check_row_filter() or not self._check_compression():
+            return
             
         # 允许相同的格式，但会依赖用户修改输出路径 (例如: JSON -> JSON_converted)
         # if input_fmt == output_fmt:
@@ -298,7 +444,12 @@ class DataConverterUI:
         # 定义任务完成后的回调
         def on_done(result, exc):
             self.convert_button.configure(state="normal", bootstyle="success")
-            if exc:
+            self.cancel_button.configure(state="disabled")
+            self._refresh_progress(progress)
+            if isinstance(exc, conversion_engine.ConversionCancelled):
+                log("转换已取消，未完成的输出文件已删除。")
+                self.app.update_status("转换已取消。")
+            elif exc:
                 log(f"转换失败: {exc}")
                 # 使用 Tkinter 的 after 方法确保在主线程中显示 messagebox
                 self.app.root.after(0, lambda: messagebox.showerror("转换失败", f"文件转换失败: {exc}"))
@@ -311,10 +462,160 @@ class DataConverterUI:
         
         # 禁用按钮，显示状态
         self.convert_button.configure(state="disabled", bootstyle="secondary")
+        self.cancel_button.configure(state="normal")
         self.app.update_status(f"正在后台执行转换: {input_fmt} -> {output_fmt}...")
         
-        # 启动后台任务
-        run_background(self._conversion_task, on_done, input_path, output_path, input_fmt, output_fmt)
+        # 启动后台任务，进度通过 progress 通道定期读取
+        progress = conversion_engine.ConversionProgress()
+        self.progress = progress
+        run_background(self._conversion_task, on_done, input_path, output_path, input_fmt, output_fmt, progress)
+        self._poll_progress(progress)
+
+    def _check_row_filter(self) -> bool:
+        """在启动转换前检查行筛选表达式的语法"""
+        try:
+            conversion_engine.parse_row_filter(self.row_filter.get())
+        except ValueError as e:
+            messagebox.showerror("错误", f"行筛选表达式无效: {e}")
+            return False
+        return True
+
+    def _compression_level(self):
+        text = self.compression_level.get().strip()
+        return int(text) if text else None
+
+    def _check_compression(self) -> bool:
+        """在启动转换前检查压缩方式和级别"""
+        try:
+            conversion_engine.check_compression(self.output_format.get(), self.compression.get(),
+                                                self._compression_level())
+        except ValueError as e:
+            messagebox.showerror("错误", f"压缩设置无效: {e}")
+            return False
+        return True
+
+    def _cancel_conversion(self):
+        """请求取消：转换在下一个数据块边界处停止"""
+        if self.progress is not None:
+            self.progress.cancel()
+            self.cancel_button.configure(state="disabled")
+            self.app.update_status("正在取消转换...")
+
+    def _refresh_progress(self, progress):
+        snap = progress.snapshot()
+        if snap.bytes_total:
+            self.progress_bar.configure(value=1000 * snap.bytes_read / snap.bytes_total)
+        text = f"{snap.rows:,} 行 | {snap.rows_per_sec:,.0f} 行/秒"
+        if 0 < snap.bytes_read < snap.bytes_total:
+            remaining = snap.elapsed * (snap.bytes_total - snap.bytes_read) / snap.bytes_read
+            text += f" | 剩余约 {remaining:.0f}s"
+        self.progress_label.config(text=text)
+
+    def _poll_progress(self, progress):
+        """在主线程中定期刷新进度条，直到该次转换结束"""
+        if progress is not self.progress:
+            return
+        self._refresh_progress(progress)
+        if self.cancel_button.cget("state") != "disabled":
+            self.app.root.after(200, lambda: self._poll_progress(progress))
+
+
+    # --- 批量转换 ---
+
+    _BATCH_STATUS_TEXT = {
+        conversion_engine.BATCH_PENDING: "排队中",
+        conversion_engine.BATCH_SKIPPED: "已跳过",
+        conversion_engine.BATCH_DONE: "完成",
+        conversion_engine.BATCH_FAILED: "失败",
+        conversion_engine.BATCH_CANCELLED: "已取消",
+    }
+
+    def _start_batch(self):
+        """构建批量任务列表，并在后台线程中驱动进程池执行"""
+        source = self.batch_source.get().strip()
+        input_fmt = self.input_format.get()
+        output_fmt = self.output_format.get()
+        if not source:
+            messagebox.showerror("错误", "请选择输入目录或填写通配符。")
+            return
+        try:
+            workers = max(1, int(self.batch_workers.get()))
+        except ValueError:
+            messagebox.showerror("错误", "并行进程数必须是正整数。")
+            return
+        if not self._check_row_filter() or not self._check_compression():
+            return
+
+        items = conversion_engine.plan_batch(source, input_fmt, output_fmt, self.batch_output_dir.get().strip() or None,
+                                             self.compression.get())
+        if not items:
+            messagebox.showinfo("批量转换", "没有找到匹配的输入文件。")
+            return
+
+        self.batch_items = items
+        self.batch_tree.delete(*self.batch_tree.get_children())
+        for index, item in enumerate(items):
+            self.batch_tree.insert("", "end", iid=str(index), values=(item.input_path, "", "", "", ""))
+        self.batch_done_rows = 0
+        self.batch_finished = 0
+        self.batch_started = time.time()
+        self.batch_total_label.config(text=f"0/{len(items)} 个文件")
+        self.batch_button.configure(state="disabled", bootstyle="secondary")
+        self.batch_cancel_button.configure(state="normal")
+        self.batch_progress = conversion_engine.ConversionProgress()
+        self.app.update_status(f"正在批量转换 {len(items)} 个文件: {input_fmt} -> {output_fmt}...")
+
+        def on_update(index, status, detail):
+            # 在后台线程中被调用，界面更新调度到主线程
+            self.app.root.after(0, lambda: self._on_batch_update(index, status, detail))
+
+        def on_done(summary, exc):
+            self.batch_button.configure(state="normal", bootstyle="success")
+            self.batch_cancel_button.configure(state="disabled")
+            if exc:
+                self.app.update_status("批量转换失败。")
+                messagebox.showerror("批量转换失败", f"批量转换失败: {exc}")
+                return
+            text = (f"完成 {summary.done}，跳过 {summary.skipped}，失败 {summary.failed}，取消 {summary.cancelled}；"
+                    f"共 {summary.rows} 行，耗时 {summary.elapsed:.1f}s")
+            self.batch_total_label.config(text=text)
+            log(f"批量转换结束: {text}")
+            self.app.update_status(f"批量转换结束: {text}")
+
+        run_background(conversion_engine.run_batch, on_done, items, input_fmt, output_fmt, workers,
+                       self.batch_skip_existing.get(), on_update, engine=self.engine.get(),
+                       progress=self.batch_progress, optimize_dtypes=self.optimize_dtypes.get(),
+                       use_cache=self.use_cache.get(), cache_by_content=self.cache_by_content.get(),
+                       columns=conversion_engine.parse_columns(self.columns.get()),
+                       row_filter=self.row_filter.get(), compression=self.compression.get(),
+                       compression_level=self._compression_level())
+
+    def _cancel_batch(self):
+        """取消批量转换：尚未开始的文件不再转换"""
+        self.batch_progress.cancel()
+        self.batch_cancel_button.configure(state="disabled")
+        self.app.update_status("正在取消批量转换，等待进行中的文件完成...")
+
+    def _on_batch_update(self, index, status, detail):
+        """更新单个文件的状态行和总计"""
+        item_id = str(index)
+        if not self.batch_tree.exists(item_id):
+            return
+        values = [self.batch_items[index].input_path, self._BATCH_STATUS_TEXT.get(status, status), "", "", ""]
+        if status == conversion_engine.BATCH_DONE:
+            rate = detail.rows / detail.elapsed if detail.elapsed > 0 else 0
+            values[2:] = [f"{detail.rows:,}", f"{rate:,.0f}", f"{detail.elapsed:.1f}s"]
+            self.batch_done_rows += detail.rows
+        elif status == conversion_engine.BATCH_FAILED:
+            values[2] = str(detail)
+        self.batch_tree.item(item_id, values=values)
+
+        if status != conversion_engine.BATCH_PENDING:
+            self.batch_finished += 1
+        elapsed = max(1e-6, time.time() - self.batch_started)
+        self.batch_total_label.config(
+            text=f"{self.batch_finished}/{len(self.batch_items)} 个文件 | {self.batch_done_rows:,} 行 | "
+                 f"{self.batch_done_rows / elapsed:,.0f} 行/秒")
 
 
 def register(app, parent_frame):
@@ -1,15 +1,32 @@
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
+from tkinter import ttk, scrolledtext, messagebox, filedialog
 from ttkbootstrap.constants import *
 import re
+import io
+import os
+import time
+import struct
+import binascii
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # 必须导入 config，因为它包含 run_background 和 safe_call
 try:
-    from config import safe_call, log
+    from config import safe_call, log, run_background
 except ImportError:
     # 插件在外部运行时的回退机制
     def log(*args): print(f"[PLUGIN] {' '.join(str(a) for a in args)}")
     def safe_call(func, *args, **kwargs): return func(*args, **kwargs)
+    def run_background(func, on_done=None, *args, **kwargs):
+        try: result, exc = func(*args, **kwargs), None
+        except Exception as e: result, exc = None, e
+        if on_done: on_done(result, exc)
+
+from virtual_table import VirtualTable
 
 # 插件元数据（可选）
 name = "HEX_Converter"
@@ -47,6 +64,189 @@ def _ascii_to_hex(ascii_string):
     """Converts an ASCII string to a HEX string (UTF-8 encoding)."""
     return ascii_string.encode('utf-8').hex().upper()
 
+# --- 文件模式：分块流式转换，内存占用与文件大小无关 ---
+
+# 每次从输入文件读取的字节数
+FILE_BLOCK_SIZE = 4 * 1024 * 1024
+# 与 _remove_spaces 相同，HEX 文本中被忽略的空白字符
+_WHITESPACE = b" \t\r\n\v\f"
+_INVALID_HEX = re.compile(rb"[^0-9A-Fa-f \t\r\n\v\f]")
+
+FILE_MODES = ["hex->bin", "bin->hex"]
+
+
+class FileConversionCancelled(Exception):
+    """File conversion was cancelled by the user."""
+
+
+def _hexlify(data, byte_interval=None):
+    """Upper-case HEX of data, grouped by byte_interval bytes like _add_spaces_by_bytes."""
+    if byte_interval:
+        return binascii.hexlify(data, b" ", -byte_interval).upper()
+    return binascii.hexlify(data).upper()
+
+
+def _hex_lines(block, byte_interval, line_bytes):
+    """HEX of block with a line break after every line_bytes bytes (and at the end)."""
+    interval = byte_interval or line_bytes
+    if line_bytes % interval:
+        return b"\n".join(_hexlify(block[i:i + line_bytes], byte_interval)
+                          for i in range(0, len(block), line_bytes)) + b"\n"
+    # 整块一次分组，再把每行末尾的分隔空格替换为换行（切片赋值，不逐行循环）
+    text = bytearray(_hexlify(block, interval) + b" ")
+    width = line_bytes * 2 + line_bytes // interval
+    text[width - 1::width] = b"\n" * len(range(width - 1, len(text), width))
+    text[-1:] = b"\n"
+    return text
+
+
+def _hex_file_to_bin(src, dst, on_progress=None, cancel=None, block_size=FILE_BLOCK_SIZE):
+    """
+    Streams HEX text from the binary file object src into raw bytes written to dst.
+    Whitespace is stripped per block; a digit left over at a block boundary is carried
+    into the next block. Returns (bytes read, bytes written).
+    """
+    read = written = 0
+    carry = b""
+    while True:
+        if cancel is not None and cancel.is_set():
+            raise FileConversionCancelled("File conversion cancelled.")
+        block = src.read(block_size)
+        if not block:
+            break
+        digits = carry + block.translate(None, _WHITESPACE)
+        usable = len(digits) - len(digits) % 2
+        carry = digits[usable:]
+        try:
+            data = binascii.unhexlify(digits[:usable])
+            # 留到下一块的数字也在本块校验，否则错误会报在下一块（或在末尾被当作奇数位）
+            binascii.unhexlify(carry * 2)
+        except binascii.Error:
+            bad = _INVALID_HEX.search(block)
+            where = f"offset {read + bad.start()} ({bad.group()!r})" if bad else f"block at offset {read}"
+            raise ValueError(f"Invalid HEX character at input {where}.") from None
+        dst.write(data)
+        read += len(block)
+        written += len(data)
+        if on_progress:
+            on_progress(read)
+    if carry:
+        raise ValueError("HEX input has an odd number of digits.")
+    return read, written
+
+
+def _bin_file_to_hex(src, dst, byte_interval=None, line_bytes=0, on_progress=None, cancel=None,
+                     block_size=FILE_BLOCK_SIZE):
+    """
+    Streams raw bytes from src into upper-case HEX text written to dst.
+    byte_interval groups the digits with spaces (as _add_spaces_by_bytes does); line_bytes > 0
+    starts a new line every line_bytes bytes. Blocks are aligned to whole lines/groups so the
+    layout is identical to converting the whole file at once. Returns (bytes read, bytes written).
+    """
+    step = line_bytes or byte_interval or 1
+    block_size = max(step, block_size - block_size % step)
+    read = written = 0
+    while True:
+        if cancel is not None and cancel.is_set():
+            raise FileConversionCancelled("File conversion cancelled.")
+        block = src.read(block_size)
+        if not block:
+            break
+        if line_bytes:
+            text = _hex_lines(block, byte_interval, line_bytes)
+        else:
+            text = _hexlify(block, byte_interval)
+            if read and byte_interval:
+                text = b" " + text
+        dst.write(text)
+        read += len(block)
+        written += len(text)
+        if on_progress:
+            on_progress(read)
+    return read, written
+
+
+def convert_file(file_mode, src_path, dst_path, byte_interval=None, line_bytes=0, on_progress=None, cancel=None):
+    """
+    Converts src_path to dst_path in blocks (file_mode is one of FILE_MODES).
+    on_progress(bytes_read) is called after every block; setting the cancel event stops at the
+    next block. A partially written output is removed on failure or cancellation.
+    Returns (bytes read, bytes written, elapsed seconds).
+    """
+    if os.path.abspath(src_path) == os.path.abspath(dst_path):
+        raise ValueError("Input and output must be different files.")
+    started = time.perf_counter()
+    try:
+        with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+            if file_mode == "hex->bin":
+                read, written = _hex_file_to_bin(src, dst, on_progress, cancel)
+            elif file_mode == "bin->hex":
+                read, written = _bin_file_to_hex(src, dst, byte_interval, line_bytes, on_progress, cancel)
+            else:
+                raise ValueError(f"Unsupported file mode: {file_mode}")
+    except BaseException:
+        try:
+            os.remove(dst_path)
+        except OSError:
+            pass
+        raise
+    return read, written, time.perf_counter() - started
+
+
+def _format_rate(done, elapsed):
+    return f"{done / 2**20 / elapsed:.1f} MB/s" if elapsed > 0 else "-"
+
+# --- 定宽数值解码：整个负载一次向量化解码 ---
+
+# 元素类型及其 struct 格式字符（numpy 不可用时使用 struct.iter_unpack）
+TYPED_CODES = {
+    "int8": "b", "uint8": "B", "int16": "h", "uint16": "H", "int32": "i", "uint32": "I",
+    "int64": "q", "uint64": "Q", "float16": "e", "float32": "f", "float64": "d",
+}
+ENDIANNESS = ["little", "big"]
+
+
+def decode_typed(payload, type_name, endian="little", stride=None, offset=0):
+    """
+    Decodes fixed-width values from payload (bytes) starting at offset, one element every
+    stride bytes (default: the element size, i.e. a packed array). A trailing element that
+    does not fit is ignored. With numpy the result is a zero-copy strided view created in one
+    call; otherwise a list built by struct.iter_unpack. Returns (values, itemsize, stride).
+    """
+    code = TYPED_CODES[type_name]
+    order = "<" if endian == "little" else ">"
+    itemsize = struct.calcsize(order + code)
+    stride = stride or itemsize
+    if stride < itemsize:
+        raise ValueError(f"Stride ({stride}) must be at least the element size ({itemsize}).")
+    if not 0 <= offset <= len(payload):
+        raise ValueError(f"Offset must be between 0 and {len(payload)}.")
+    available = len(payload) - offset
+    count = (available - itemsize) // stride + 1 if available >= itemsize else 0
+    if np is not None:
+        values = np.ndarray((count,), dtype=np.dtype(type_name).newbyteorder(order), buffer=payload,
+                            offset=offset, strides=(stride,))
+        return values, itemsize, stride
+    # 步长大于元素大小时用填充字节 'x' 跳过；最后一个元素之后的填充可能不完整，补零对齐
+    fmt = order + code + (f"{stride - itemsize}x" if stride > itemsize else "")
+    records = bytes(payload[offset:offset + count * stride]).ljust(count * stride, b"\0")
+    return [value for (value,) in struct.iter_unpack(fmt, records)], itemsize, stride
+
+
+def _typed_summary(values, type_name):
+    """Count and (with numpy) min / max / mean of the decoded values; floats ignore NaN and inf."""
+    text = f"Count: {len(values):,}"
+    if np is None:
+        return text
+    if type_name.startswith("float"):
+        values = values[np.isfinite(values)]
+        text += f" | Finite: {len(values):,}"
+    if len(values):
+        with np.errstate(over="ignore", invalid="ignore"):
+            mean = values.mean(dtype=np.float64)
+        text += f" | Min: {values.min()} | Max: {values.max()} | Mean: {mean:.6g}"
+    return text
+
 # --- 插件主逻辑 ---
 
 def register(app, parent_frame):
@@ -80,7 +280,8 @@ def register(app, parent_frame):
         "auto", 
         "hex->bin", "bin->hex", 
         "dec->hex", "hex->dec",
-        "hex->ascii", "ascii->hex"
+        "hex->ascii", "ascii->hex",
+        "hex->typed"
     ]
     mode_box = ttk.Combobox(control_frame, values=conversion_modes, textvariable=mode, width=15, state="readonly")
     mode_box.grid(row=0, column=1, padx=(0, 20), pady=5, sticky="w")
@@ -119,6 +320,79 @@ def register(app, parent_frame):
     inp = ttk.Entry(input_frame, width=70, bootstyle="info")
     inp.pack(side="left", fill="x", expand=True, padx=(0, 10))
     
+    # --- File Mode：流式转换整个文件，适用于文本框无法容纳的大文件 ---
+    file_mode = tk.StringVar(value=FILE_MODES[0])
+    file_src = tk.StringVar(value="")
+    file_dst = tk.StringVar(value="")
+    line_bytes = tk.StringVar(value="32")
+    file_job = {"cancel": None}
+
+    file_container = ttk.Labelframe(parent_frame, text="File Mode (streaming, any file size)", padding=10)
+    file_container.pack(fill="x", padx=15, pady=5)
+
+    file_row = ttk.Frame(file_container)
+    file_row.pack(fill="x", pady=2)
+    ttk.Label(file_row, text="Input File:", width=12).pack(side="left")
+    ttk.Entry(file_row, textvariable=file_src, width=60).pack(side="left", fill="x", expand=True, padx=(0, 5))
+    file_src_button = ttk.Button(file_row, text="Browse", bootstyle="info-outline")
+    file_src_button.pack(side="left")
+
+    file_row = ttk.Frame(file_container)
+    file_row.pack(fill="x", pady=2)
+    ttk.Label(file_row, text="Output File:", width=12).pack(side="left")
+    ttk.Entry(file_row, textvariable=file_dst, width=60).pack(side="left", fill="x", expand=True, padx=(0, 5))
+    file_dst_button = ttk.Button(file_row, text="Browse", bootstyle="info-outline")
+    file_dst_button.pack(side="left")
+
+    file_row = ttk.Frame(file_container)
+    file_row.pack(fill="x", pady=(6, 2))
+    ttk.Label(file_row, text="File Mode:", width=12).pack(side="left")
+    file_mode_box = ttk.Combobox(file_row, values=FILE_MODES, textvariable=file_mode, width=10, state="readonly")
+    file_mode_box.pack(side="left", padx=(0, 15))
+    # bin->hex 且空格模式为 add 时按字节间隔分组，并按该行宽换行（0 表示不换行）
+    ttk.Label(file_row, text="Bytes/Line:").pack(side="left")
+    ttk.Combobox(file_row, values=["0", "16", "32", "64"], textvariable=line_bytes, width=5,
+                 state="readonly").pack(side="left", padx=(5, 15))
+    file_cancel_button = ttk.Button(file_row, text="Cancel", bootstyle="danger-outline", state="disabled")
+    file_cancel_button.pack(side="right")
+    file_start_button = ttk.Button(file_row, text="Convert File", bootstyle="success")
+    file_start_button.pack(side="right", padx=5)
+    file_status = ttk.Label(file_row, text="", bootstyle="info")
+    file_status.pack(side="right", padx=10)
+    file_progress = ttk.Progressbar(file_container, mode="determinate", maximum=1000, bootstyle="success-striped")
+    file_progress.pack(fill="x", pady=(6, 0))
+
+    # --- Typed Decode：把 HEX 负载按定宽数值数组解码，结果显示在虚拟化表格中 ---
+    typed_type = tk.StringVar(value="int16")
+    typed_endian = tk.StringVar(value=ENDIANNESS[0])
+    typed_stride = tk.StringVar(value="")
+    typed_offset = tk.StringVar(value="0")
+    typed_state = {"payload": b"", "values": (), "itemsize": 1, "stride": 1, "offset": 0}
+
+    typed_container = ttk.Labelframe(parent_frame, text="Typed Decode (mode hex->typed, or decode the file above)",
+                                     padding=10)
+    typed_container.pack(fill="both", expand=True, padx=15, pady=5)
+    typed_row = ttk.Frame(typed_container)
+    typed_row.pack(fill="x", pady=(0, 5))
+    ttk.Label(typed_row, text="Type:").pack(side="left")
+    ttk.Combobox(typed_row, values=list(TYPED_CODES), textvariable=typed_type, width=8,
+                 state="readonly").pack(side="left", padx=(5, 15))
+    ttk.Label(typed_row, text="Endian:").pack(side="left")
+    ttk.Combobox(typed_row, values=ENDIANNESS, textvariable=typed_endian, width=7,
+                 state="readonly").pack(side="left", padx=(5, 15))
+    # 步长为空表示元素紧密排列；步长大于元素大小时可以取结构体数组中的某个字段（配合偏移）
+    ttk.Label(typed_row, text="Stride (bytes):").pack(side="left")
+    ttk.Entry(typed_row, textvariable=typed_stride, width=6).pack(side="left", padx=(5, 15))
+    ttk.Label(typed_row, text="Offset:").pack(side="left")
+    ttk.Entry(typed_row, textvariable=typed_offset, width=8).pack(side="left", padx=(5, 15))
+    typed_file_button = ttk.Button(typed_row, text="Decode File", bootstyle="info-outline")
+    typed_file_button.pack(side="right")
+    typed_status = ttk.Label(typed_container, text="", bootstyle="info")
+    typed_status.pack(anchor="w")
+    typed_table = VirtualTable(typed_container, columns=[("Index", 90), ("Offset", 110), ("Raw HEX", 220),
+                                                         ("Value", 240)], height=8)
+    typed_table.pack(fill="both", expand=True, pady=(5, 0))
+
     # Output Box
     ttk.Label(parent_frame, text="Output Results:", font=("Segoe UI", 12, "bold"), bootstyle="info").pack(anchor="w", padx=15, pady=(10, 0))
     # Removed bootstyle from scrolledtext.ScrolledText to fix the TclError
@@ -134,6 +408,70 @@ def register(app, parent_frame):
         else:
             byte_interval_box.config(state="disabled")
 
+    def typed_row_values(index):
+        """VirtualTable 的行回调：只为可见行格式化数值"""
+        start = typed_state["offset"] + index * typed_state["stride"]
+        raw = typed_state["payload"][start:start + typed_state["itemsize"]]
+        return (index, f"0x{start:08X}", raw.hex(" ").upper(), str(typed_state["values"][index]))
+
+    def show_typed(payload, source):
+        """按当前选项解码 payload 并刷新表格，返回结果摘要"""
+        stride_text, offset_text = typed_stride.get().strip(), typed_offset.get().strip()
+        stride = int(stride_text, 0) if stride_text else None
+        offset = int(offset_text, 0) if offset_text else 0
+        started = time.perf_counter()
+        values, itemsize, stride = decode_typed(payload, typed_type.get(), typed_endian.get(), stride, offset)
+        elapsed = time.perf_counter() - started
+        typed_state.update(payload=payload, values=values, itemsize=itemsize, stride=stride, offset=offset)
+        typed_table.set_source(len(values), typed_row_values)
+        summary = _typed_summary(values, typed_type.get())
+        typed_status.config(text=f"{source}: {len(payload):,} bytes -> {len(values):,} x {typed_type.get()} "
+                                 f"({typed_endian.get()}-endian, stride {stride}) in {elapsed * 1000:.1f} ms")
+        return (f"Typed decode of {source}: {typed_type.get()}, {typed_endian.get()}-endian, "
+                f"stride {stride}, offset {offset}\n{summary}\n")
+
+    def decode_typed_file():
+        """解码文件模式中选择的输入文件：hex->bin 时文件是 HEX 文本，bin->hex 时是原始二进制"""
+        src_path = file_src.get().strip()
+        if not os.path.isfile(src_path):
+            messagebox.showwarning("Warning", "Please select an input file in File Mode first.")
+            return
+        hex_text = file_mode.get() == "hex->bin"
+
+        def load():
+            with open(src_path, "rb") as src:
+                if not hex_text:
+                    return src.read()
+                payload = io.BytesIO()
+                _hex_file_to_bin(src, payload)
+                return payload.getvalue()
+
+        def on_done(payload, exc):
+            typed_file_button.configure(state="normal")
+            out_box.delete("1.0", "end")
+            if exc:
+                out_box.insert("end", f"--- TYPED DECODE ---\nConversion Failed: {exc}\n")
+                return
+            try:
+                summary = show_typed(payload, os.path.basename(src_path))
+            except ValueError as e:
+                summary = f"Conversion Failed: {e}\n"
+            out_box.insert("end", f"--- TYPED DECODE ---\n{summary}")
+
+        typed_file_button.configure(state="disabled")
+        typed_status.config(text=f"Reading {os.path.basename(src_path)} ...")
+        run_background(load, on_done)
+
+    def load_bytes(data, source):
+        """由其他标签页（如十六进制查看器）送入一段字节：按当前空格策略填入输入框"""
+        interval = int(byte_interval.get()) if space_mode.get() == "add" else None
+        inp.delete(0, "end")
+        inp.insert(0, _hexlify(data, interval))
+        out_box.delete("1.0", "end")
+        out_box.insert("end", f"--- INPUT FROM {source} ---\n{len(data):,} bytes loaded into Input Data. "
+                              f"Choose a mode and press Convert.\n")
+        inp.focus_set()
+
     def do_convert():
         data = inp.get().strip()
         out_box.delete("1.0", "end")
@@ -199,6 +537,12 @@ def register(app, parent_frame):
                 out_box.insert("end", result_text)
                 return
 
+            elif current_mode == "hex->typed":
+                # 无论空格模式如何，HEX 负载中的空白都被忽略
+                result_text += show_typed(bytes.fromhex(_remove_spaces(data)), "input")
+                out_box.insert("end", result_text)
+                return
+
             elif current_mode == "ascii->hex":
                 hex_result = _ascii_to_hex(data)
                 result_text += f"ASCII: {data}\n"
@@ -241,6 +585,95 @@ def register(app, parent_frame):
         out_box.insert("end", result_text)
 
 
+    def suggest_output_path():
+        """根据输入文件和转换方向生成默认输出路径"""
+        src_path = file_src.get()
+        if not src_path:
+            return
+        base, ext = os.path.splitext(src_path)
+        if file_mode.get() == "hex->bin":
+            file_dst.set(f"{base}.bin" if ext.lower() != ".bin" else f"{base}_converted.bin")
+        else:
+            file_dst.set(f"{src_path}.hex.txt")
+
+    def select_source_file():
+        path = filedialog.askopenfilename(title="Select input file")
+        if path:
+            file_src.set(path)
+            suggest_output_path()
+
+    def select_output_file():
+        path = filedialog.asksaveasfilename(title="Select output file", initialfile=os.path.basename(file_dst.get()))
+        if path:
+            file_dst.set(path)
+
+    def start_file_conversion():
+        src_path, dst_path = file_src.get().strip(), file_dst.get().strip()
+        if not os.path.isfile(src_path):
+            messagebox.showwarning("Warning", "Please select an existing input file.")
+            return
+        if not dst_path:
+            messagebox.showwarning("Warning", "Please select an output file.")
+            return
+        spaced = space_mode.get() == "add"
+        try:
+            interval = int(byte_interval.get()) if spaced else None
+            per_line = int(line_bytes.get()) if spaced else 0
+        except ValueError:
+            messagebox.showwarning("Warning", "Invalid byte interval.")
+            return
+
+        total = os.path.getsize(src_path)
+        state = {"read": 0, "started": time.perf_counter(), "done": False}
+        cancel = threading.Event()
+        file_job["cancel"] = cancel
+
+        def on_progress(read):
+            # 在后台线程中调用，只更新计数；界面由 poll() 在主线程中刷新
+            state["read"] = read
+
+        def poll():
+            if state["done"]:
+                return
+            elapsed = time.perf_counter() - state["started"]
+            read = state["read"]
+            file_progress.configure(value=1000 * read / total if total else 0)
+            file_status.config(text=f"{read / 2**20:,.1f} / {total / 2**20:,.1f} MB | {_format_rate(read, elapsed)}")
+            parent_frame.after(200, poll)
+
+        def on_done(result, exc):
+            state["done"] = True
+            file_job["cancel"] = None
+            file_start_button.configure(state="normal")
+            file_cancel_button.configure(state="disabled")
+            if isinstance(exc, FileConversionCancelled):
+                file_status.config(text="Cancelled, partial output removed.")
+                return
+            if exc:
+                file_status.config(text="Failed.")
+                messagebox.showerror("File Conversion Failed", str(exc))
+                return
+            read, written, elapsed = result
+            file_progress.configure(value=1000)
+            summary = (f"{file_mode.get()}: {read:,} bytes -> {written:,} bytes in {elapsed:.2f}s "
+                       f"({_format_rate(read, elapsed)})")
+            file_status.config(text=f"Done | {_format_rate(read, elapsed)}")
+            out_box.delete("1.0", "end")
+            out_box.insert("end", f"--- FILE CONVERSION RESULT ---\n{summary}\nOutput: {dst_path}\n")
+            log(summary)
+
+        file_start_button.configure(state="disabled")
+        file_cancel_button.configure(state="normal")
+        file_progress.configure(value=0)
+        run_background(convert_file, on_done, file_mode.get(), src_path, dst_path, interval, per_line,
+                       on_progress, cancel)
+        poll()
+
+    def cancel_file_conversion():
+        if file_job["cancel"] is not None:
+            file_job["cancel"].set()
+            file_cancel_button.configure(state="disabled")
+
     # --- 4. 应用绑定和回调 ---
     
     # 绑定 Enter 键到转换函数
@@ -252,6 +685,17 @@ def register(app, parent_frame):
     # 绑定空格模式下拉框的回调
     space_mode_box.bind('<<ComboboxSelected>>', update_space_interval_state)
 
+    # 文件模式
+    file_src_button.configure(command=select_source_file)
+    file_dst_button.configure(command=select_output_file)
+    file_start_button.configure(command=lambda: safe_call(start_file_conversion))
+    file_cancel_button.configure(command=cancel_file_conversion)
+    file_mode_box.bind('<<ComboboxSelected>>', lambda e: suggest_output_path())
+    typed_file_button.configure(command=lambda: safe_call(decode_typed_file))
+
     # 确保初始化时更新间隔状态
     update_space_interval_state()
-    log(f"插件 {name} 已加载。")
\ No newline at end of file
+    # 主程序通过该属性把十六进制查看器的选区送入本插件
+    parent_frame.load_bytes = load_bytes
+    log(f"插件 {name} 已加载。")
+    return True
\ No newline at end of file
@@ -23,6 +23,11 @@ except ImportError:
         def safe_call(*args, **kwargs): return None
     config = MockConfig()
 
+try:
+    import workspace
+except ImportError:
+    workspace = None
+
 
 # --- 插件元数据 ---
 PLUGIN_META = {
@@ -38,7 +43,7 @@ class ScriptRunnerPlugin:
     def __init__(self, app, parent_frame):
         self.app = app
         self.parent_frame = parent_frame
-        self.script_dir = config.APP_DIR / "scripts" # 使用 config.APP_DIR
+        self.script_dir = self._resolve_script_dir() # 工作区根目录下的 scripts/
         self.current_script_path = None
         self.is_running = False
         
@@ -95,9 +100,15 @@ class ScriptRunnerPlugin:
         self.preview_text = scrolledtext.ScrolledText(detail_frame, wrap="none", height=15, state=tk.DISABLED, font=('Consolas', 10))
         self.preview_text.pack(fill="both", expand=True)
         
+    def _resolve_script_dir(self):
+        """脚本目录位于当前工作区根目录下（工作区模块不可用时回退到 config.APP_DIR）。"""
+        root = workspace.get_workspace().root if workspace else config.APP_DIR
+        return root / "scripts"
+
     def _refresh_script_list(self):
         """扫描 scripts 目录并更新 Treeview 列表。"""
         self.script_tree.delete(*self.script_tree.get_children())
+        self.script_dir = self._resolve_script_dir()
         self.path_label.config(text=f"Scripts Directory: {self.script_dir}")
         self.current_script_path = None
         self.run_btn.config(state=tk.DISABLED)
@@ -105,7 +116,13 @@ class ScriptRunnerPlugin:
         if not self.script_dir.exists():
             self.script_dir.mkdir(parents=True)
         
-        for p in sorted(self.script_dir.glob("*.py")):
+        if workspace:
+            # 目录列表来自共享元数据缓存，并已应用工作区排除规则
+            _, files = workspace.get_workspace().list_dir(self.script_dir)
+            scripts = [pathlib.Path(m.path) for m in files if m.name.endswith(".py")]
+        else:
+            scripts = sorted(self.script_dir.glob("*.py"))
+        for p in scripts:
             self.script_tree.insert("", "end", text=p.name, iid=str(p.resolve()))
 
         if not self.script_tree.get_children():
@@ -0,0 +1,477 @@
+# search_engine.py
+
+"""
+工作区内容搜索引擎。
+
+一次搜索是一个 SearchJob：协调线程先通过工作区（及搜索索引）确定待搜索文件，
+再把文件分发给线程池并行扫描；命中结果通过线程安全的队列流式返回，
+GUI 在主线程中定期取出并逐步显示。搜索可随时取消。
+
+能在字节层面匹配的查询（字面搜索、ASCII 兼容编码、二进制文件）不逐行解码：
+小文件整体读入，大文件通过 mmap 映射，直接用 bytes.find / 字节正则查找，
+行号只在命中时才计算。其余情况（如 UTF-16 文件上的正则搜索）回退到逐行解码扫描。
+HEX 模式下搜索词是带通配符的字节模式（如 "62 F1 90 ?? ??"），对任意文件按原始字节匹配。
+"""
+
+import os
+import re
+import mmap
+import time
+import queue
+import fnmatch
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Optional
+
+import file_cache
+
+try:
+    import config
+    log = config.log
+except ImportError:
+    def log(*args, level="INFO"):
+        print(f"[{time.strftime('%H:%M:%S')}] [{level}] [SEARCH] {' '.join(str(a) for a in args)}")
+
+
+# 默认并行度：文件读取会释放 GIL，适度超过 CPU 数量有利于 I/O 重叠
+DEFAULT_WORKERS = min(8, (os.cpu_count() or 1) + 4)
+
+# 扫描文件时每处理多少行检查一次取消标志
+_CANCEL_CHECK_LINES = 4096
+
+# 结果预览的最大字符数（超长行只保留命中位置附近的内容）
+PREVIEW_CHARS = 200
+
+# 小于该大小的文件整体读入内存，更大的文件使用 mmap
+MMAP_THRESHOLD = 4 * 1024 * 1024
+
+# 字节扫描每个窗口的大小：窗口之间检查取消标志，单次查找不会长时间不可中断
+SCAN_WINDOW = 64 * 1024 * 1024
+
+# 字节正则在窗口边界处的重叠字节数（字面搜索使用搜索词自身的长度）
+_REGEX_OVERLAP = 4096
+
+# 确认命中和生成预览时，在命中位置两侧最多解码的字节数
+_CONTEXT_BYTES = 1024
+
+# 统计换行数时每次切片的字节数（限制 mmap 切片产生的临时内存）
+_COUNT_CHUNK = 16 * 1024 * 1024
+
+# HEX 命中预览中显示的匹配前后的字节数
+_HEX_CONTEXT = 8
+# HEX 模式中的一个字节：两位 ASCII 十六进制数字或 '?'
+_HEX_PAIR_RE = re.compile(r"[0-9A-Fa-f?]{2}")
+
+# 单字节字符与 ASCII 一致的编码：搜索词编码后的字节可以直接在文件内容中查找
+_ASCII_COMPATIBLE = {"utf-8", "utf-8-sig", "gbk", "latin-1"}
+
+
+# ----------------------------------------------------------------------
+# 1. 搜索选项
+# ----------------------------------------------------------------------
+
+class SearchOptions:
+    """
+    一次搜索的匹配方式、文件过滤和结果上限。
+
+    regex:             将搜索词视为正则表达式（每次查询只编译一次）。
+    case_sensitive:    区分大小写。
+    whole_word:        只匹配完整单词。
+    all_matches:       记录每个文件中所有匹配行；False 时每个文件只记录第一处。
+    max_hits_per_file: 每个文件最多记录的匹配数。
+    max_hits:          全局最多记录的匹配数，达到后提前终止整个搜索。
+    include / exclude: glob 列表，匹配文件名或相对工作区的路径。
+                       给出 include 时替代默认的文件类型过滤。
+    hex_pattern:       搜索词为十六进制字节模式（见 compile_hex_pattern），
+                       忽略 regex / case_sensitive / whole_word，搜索所有文件类型。
+    """
+
+    def __init__(self, regex=False, case_sensitive=False, whole_word=False, all_matches=False,
+                 max_hits_per_file=1000, max_hits=10000, include=None, exclude=None, hex_pattern=False):
+        self.regex = regex
+        self.case_sensitive = case_sensitive
+        self.whole_word = whole_word
+        self.all_matches = all_matches
+        self.max_hits_per_file = max_hits_per_file
+        self.max_hits = max_hits
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.hex_pattern = hex_pattern
+
+    @classmethod
+    def parse_file_filter(cls, text: str):
+        """解析 "*.py, src/**, !tests/*" 形式的过滤串，返回 (include, exclude)。"""
+        include, exclude = [], []
+        for part in text.split(","):
+            part = part.strip()
+            if part.startswith("!"):
+                if part[1:].strip():
+                    exclude.append(part[1:].strip())
+            elif part:
+                include.append(part)
+        return include, exclude
+
+    def compile(self, term: str) -> "re.Pattern":
+        """把搜索词编译为正则表达式；正则语法错误时抛出 re.error，HEX 模式格式错误时抛出 ValueError。"""
+        if self.hex_pattern:
+            return compile_hex_pattern(term)
+        body = term if self.regex else re.escape(term)
+        if self.whole_word:
+            body = rf"\b(?:{body})\b"
+        return re.compile(body, 0 if self.case_sensitive else re.IGNORECASE)
+
+    @property
+    def literal(self) -> bool:
+        """非正则搜索时，搜索词字面出现在匹配中，可以使用索引缩小范围。"""
+        return not (self.regex or self.hex_pattern)
+
+    def accepts(self, rel_path: str, name: str) -> bool:
+        def matches(patterns):
+            return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(rel_path, p) for p in patterns)
+        if self.include and not matches(self.include):
+            return False
+        return not (self.exclude and matches(self.exclude))
+
+
+def compile_hex_pattern(text: str) -> "re.Pattern":
+    """
+    把 "62 F1 90 ?? ??" 形式的十六进制字节模式编译为字节正则。
+    每个字节写两位十六进制数字，'??' 匹配任意字节，'6?' / '?6' 只固定其中一个半字节；
+    空白可以省略（"62F190????"）。格式错误或没有任何确定字节时抛出 ValueError。
+    """
+    digits = re.sub(r"\s+", "", text)
+    if not digits or len(digits) % 2:
+        raise ValueError("HEX pattern must consist of whole bytes (two hex digits or '?' each)")
+    parts = []
+    for i in range(0, len(digits), 2):
+        hi, lo = digits[i], digits[i + 1]
+        # int(x, 16) 也接受 '+'、'_' 和全角数字，必须先限定为 ASCII 十六进制数字
+        if not _HEX_PAIR_RE.fullmatch(hi + lo):
+            raise ValueError(f"Invalid byte in HEX pattern: {hi}{lo}")
+        if hi == "?" and lo == "?":
+            parts.append(b".")
+            continue
+        if hi == "?":
+            values = [(n << 4) | int(lo, 16) for n in range(16)]
+        elif lo == "?":
+            values = [(int(hi, 16) << 4) | n for n in range(16)]
+        else:
+            parts.append(re.escape(bytes([int(hi + lo, 16)])))
+            continue
+        parts.append(b"[" + b"".join(re.escape(bytes([v])) for v in values) + b"]")
+    if all(part == b"." for part in parts):
+        raise ValueError("HEX pattern needs at least one fixed byte")
+    return re.compile(b"".join(parts), re.DOTALL)
+
+
+def _preview(line: str, start: int) -> str:
+    """生成结果预览：超长行截取命中位置附近的片段。"""
+    line = line.rstrip("\r\n")
+    if len(line) <= PREVIEW_CHARS:
+        return line.strip()
+    begin = max(0, start - PREVIEW_CHARS // 4)
+    snippet = line[begin:begin + PREVIEW_CHARS].strip()
+    return ("…" if begin else "") + snippet + "…"
+
+
+def _count_newlines(buf, start: int, end: int) -> int:
+    """统计 buf[start:end] 中的换行数；分块切片以免一次复制大段 mmap 内容。"""
+    count = 0
+    while start < end:
+        stop = min(end, start + _COUNT_CHUNK)
+        count += buf[start:stop].count(b"\n")
+        start = stop
+    return count
+
+
+def _binary_preview(data: bytes, offset: int) -> str:
+    """二进制命中的预览：偏移量加上可打印字符（其余字节显示为 '.'）。"""
+    text = "".join(chr(b) if 32 <= b < 127 else "." for b in data)
+    return f"@0x{offset:08X}  {text}"
+
+
+def _hex_preview(buf, begin: int, end: int) -> str:
+    """HEX 命中的预览：偏移量、匹配字节（方括号内）及其前后各 _HEX_CONTEXT 个字节。"""
+    before = buf[max(0, begin - _HEX_CONTEXT):begin].hex(" ").upper()
+    match = buf[begin:end].hex(" ").upper()
+    after = buf[end:end + _HEX_CONTEXT].hex(" ").upper()
+    return " ".join(part for part in (f"@0x{begin:08X} ", before, f"[{match}]", after) if part)
+
+
+# ----------------------------------------------------------------------
+# 2. 搜索任务
+# ----------------------------------------------------------------------
+
+
+class SearchJob:
+    """
+    一次后台内容搜索。
+
+    hits:        命中结果队列，元素为 {'path', 'line', 'content'} 字典。
+    files_total: 待搜索的文件数（枚举完成前为 None）。
+    files_done:  已完成扫描的文件数。
+    hit_count:   已产生的命中数。
+    truncated:   因达到 max_hits 上限而提前终止。
+    finished:    搜索结束（完成、取消或出错）后被设置。
+
+    构造时编译搜索词，正则语法错误会直接抛出 re.error。
+    """
+
+    def __init__(self, ws, term: str, suffixes: Iterable[str], index=None,
+                 options: Optional[SearchOptions] = None, max_workers: Optional[int] = None):
+        self.workspace = ws
+        self.term = term
+        self.suffixes = list(suffixes)
+        self.index = index
+        self.options = options or SearchOptions()
+        self.pattern = self.options.compile(term)
+        # 编码 -> (find, overlap) 或 None，每种编码只构造一次
+        self._byte_finders = {}
+        self.max_workers = max_workers or DEFAULT_WORKERS
+
+        self.hits = queue.Queue()
+        self.files_total = None
+        self.files_done = 0
+        self.hit_count = 0
+        self.truncated = False
+        self.error = None
+        self.started_at = None
+        self.elapsed = 0.0
+
+        self.finished = threading.Event()
+        self._cancelled = threading.Event()
+        # 用户取消或达到全局上限时设置，工作线程据此停止
+        self._stop = threading.Event()
+        self._count_lock = threading.Lock()
+
+    # --- 控制 ---
+
+    def start(self):
+        self.started_at = time.time()
+        threading.Thread(target=self._run, name="SearchJob", daemon=True).start()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._stop.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    # --- 执行 ---
+
+    def _collect_files(self) -> list:
+        """枚举需要扫描的文件，利用索引跳过不可能匹配的已索引文件。"""
+        opts = self.options
+        candidates = None
+        if self.index and opts.literal:
+            candidates = self.index.candidates(self.term)
+        # 给出 include 过滤或按 HEX 字节搜索时不再限制文件类型
+        suffixes = None if opts.include or opts.hex_pattern else self.suffixes
+        filtered = bool(opts.include or opts.exclude)
+
+        files = []
+        for meta in self.workspace.iter_files(suffixes):
+            if self._stop.is_set():
+                break
+            if filtered and not opts.accepts(self.workspace.relpath(meta.path) or meta.name, meta.name):
+                continue
+            # 已索引且未修改、但不在候选集合中的文件不可能匹配
+            if candidates is not None and meta.path not in candidates and self.index.is_current(meta):
+                continue
+            files.append(meta)
+        return files
+
+    def _run(self):
+        try:
+            files = self._collect_files()
+            self.files_total = len(files)
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="SearchWorker") as pool:
+                futures = [pool.submit(self._search_file, meta) for meta in files]
+                for future in as_completed(futures):
+                    if self._stop.is_set():
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        break
+                    exc = future.exception()
+                    if exc is not None:
+                        log(f"[WARNING] Search worker error: {exc}", level="WARNING")
+                    self.files_done += 1
+        except Exception as e:
+            self.error = e
+            log(f"[ERROR] Search failed: {type(e).__name__}: {e}", level="ERROR")
+        finally:
+            self.elapsed = time.time() - self.started_at
+            self.finished.set()
+
+    def _emit(self, hit) -> bool:
+        """放入一条命中；达到全局上限时返回 False 并通知所有工作线程停止。"""
+        with self._count_lock:
+            if self.hit_count >= self.options.max_hits:
+                self.truncated = True
+                self._stop.set()
+                return False
+            self.hit_count += 1
+        self.hits.put(hit)
+        return True
+
+    def _byte_finder(self, encoding):
+        """
+        返回在字节内容中查找搜索词的 (find, overlap)；无法在字节层面匹配时返回 None。
+        find(buf, start, end) 返回第一处可能命中的 (begin, end)，没有则返回 None。
+        encoding 为 None 表示二进制文件。
+        """
+        with self._count_lock:
+            if encoding in self._byte_finders:
+                return self._byte_finders[encoding]
+        finder = self._make_byte_finder(encoding)
+        with self._count_lock:
+            self._byte_finders[encoding] = finder
+        return finder
+
+    def _make_byte_finder(self, encoding):
+        opts = self.options
+        flags = 0 if opts.case_sensitive else re.IGNORECASE
+        if opts.hex_pattern:
+            # 字节模式与文件编码无关，所有文件都按原始字节匹配
+            pattern = self.pattern
+            overlap = _REGEX_OVERLAP
+        elif encoding is None:
+            # 二进制文件：字面搜索按 UTF-8 字节查找，正则按字节正则编译（支持 \xNN 转义）
+            body = self.term.encode("utf-8") if opts.regex else re.escape(self.term.encode("utf-8"))
+            if opts.whole_word:
+                body = rb"\b(?:" + body + rb")\b"
+            try:
+                pattern = re.compile(body, flags)
+            except re.error:
+                return None
+            overlap = _REGEX_OVERLAP if opts.regex else len(self.term.encode("utf-8"))
+        else:
+            # 文本文件上的正则中 '.'、字符类等按字符而非字节匹配，必须解码后再搜索
+            if opts.regex or encoding not in _ASCII_COMPATIBLE:
+                return None
+            # 字节正则的 \b 只识别 ASCII 单词字符，非 ASCII 搜索词的整词匹配必须解码后按行进行
+            if opts.whole_word and not self.term.isascii():
+                return None
+            # 字节层面的忽略大小写只对 ASCII 有效
+            if not opts.case_sensitive and any(ord(c) > 127 and c.lower() != c.upper() for c in self.term):
+                return None
+            # utf-8-sig 等编码会在开头写出 BOM，搜索词必须按正文的编码转换
+            body_encoding = file_cache.body_encoding(encoding)
+            if body_encoding is None:
+                return None
+            try:
+                needle = self.term.encode(body_encoding)
+            except UnicodeEncodeError:
+                return (lambda buf, start, end: None), 0  # 该编码的文件不可能包含搜索词
+            overlap = len(needle)
+            if opts.case_sensitive and not opts.whole_word:
+                def find(buf, start, end):
+                    pos = buf.find(needle, start, end)
+                    return None if pos < 0 else (pos, pos + len(needle))
+                return find, overlap
+            body = re.escape(needle)
+            if opts.whole_word:
+                body = rb"\b" + body + rb"\b"
+            pattern = re.compile(body, flags)
+
+        def find(buf, start, end):
+            m = pattern.search(buf, start, end)
+            return None if m is None else m.span()
+        return find, overlap
+
+    def _search_file(self, meta):
+        """在线程池中运行：扫描单个文件，命中即放入队列。"""
+        if self._stop.is_set():
+            return
+        info = file_cache.get_cache().content_info(meta)
+        finder = self._byte_finder(info.encoding)
+        try:
+            if finder is not None:
+                self._search_bytes(meta, info.encoding, *finder)
+            elif not info.is_binary:
+                self._search_lines(meta, info.encoding)
+        except (OSError, ValueError) as e:
+            log(f"[WARNING] Could not read file {meta.name}: {e}", level="WARNING")
+
+    def _search_bytes(self, meta, encoding, find, overlap):
+        """
+        字节层面扫描：小文件整体读入，大文件 mmap。
+        字节命中只是候选（如 GBK 双字节字符的尾字节可能与 ASCII 相同），
+        文本文件会解码命中所在的行再用搜索正则确认。
+        """
+        opts = self.options
+        per_file_limit = opts.max_hits_per_file if opts.all_matches else 1
+        with open(meta.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return
+            if size < MMAP_THRESHOLD:
+                buf = f.read()
+            else:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                size = len(buf)
+                pos = 0
+                line_num, counted_to = 1, 0
+                file_hits = 0
+                while pos < size:
+                    if self._stop.is_set():
+                        return
+                    window_end = min(size, pos + SCAN_WINDOW)
+                    span = find(buf, pos, min(size, window_end + overlap))
+                    if span is None:
+                        pos = window_end
+                        continue
+                    begin, end = span
+                    # 只向前/向后查找有限的范围，超长行（或无换行的二进制内容）只取命中附近
+                    line_start = buf.rfind(b"\n", max(0, begin - _CONTEXT_BYTES), begin) + 1 \
+                        or max(0, begin - _CONTEXT_BYTES)
+                    line_end = buf.find(b"\n", end, min(size, end + _CONTEXT_BYTES))
+                    if line_end < 0:
+                        line_end = min(size, end + _CONTEXT_BYTES)
+                    if opts.hex_pattern:
+                        content = _hex_preview(buf, begin, end)
+                        pos = max(end, begin + 1)
+                    elif encoding is None:
+                        preview_start = max(0, begin - 16)
+                        content = _binary_preview(buf[preview_start:end + 48], begin)
+                        pos = max(end, begin + 1)
+                    else:
+                        text = buf[line_start:line_end].decode(encoding, errors="replace")
+                        m = self.pattern.search(text)
+                        # 一行只记录一次：无论是否确认命中，都从下一行继续
+                        pos = line_end + 1
+                        if m is None:
+                            continue
+                        content = _preview(text, m.start())
+                    # 行号惰性计算：只统计上一个命中到本次命中之间的换行
+                    line_num += _count_newlines(buf, counted_to, begin)
+                    counted_to = begin
+                    if not self._emit({'path': meta.path, 'line': line_num, 'content': content}):
+                        return
+                    file_hits += 1
+                    if file_hits >= per_file_limit:
+                        return
+            finally:
+                if isinstance(buf, mmap.mmap):
+                    buf.close()
+
+    def _search_lines(self, meta, encoding):
+        """逐行解码扫描，用于无法在字节层面匹配的查询。"""
+        search = self.pattern.search
+        opts = self.options
+        per_file_limit = opts.max_hits_per_file if opts.all_matches else 1
+        file_hits = 0
+        with open(meta.path, 'r', encoding=encoding, errors='ignore') as f:
+            for line_num, line in enumerate(f, 1):
+                if line_num % _CANCEL_CHECK_LINES == 0 and self._stop.is_set():
+                    return
+                m = search(line)
+                if m is None:
+                    continue
+                if not self._emit({'path': meta.path, 'line': line_num,
+                                   'content': _preview(line, m.start())}):
+                    return
+                file_hits += 1
+                if file_hits >= per_file_limit:
+                    break
@@ -0,0 +1,423 @@
+# search_index.py
+
+"""
+工作区内容搜索的持久化三元组 (trigram) 索引。
+
+索引保存在 CONFIG_DIR/search_index/ 下的 SQLite 数据库中（每个工作区一个），
+由后台线程构建，并按文件 size/mtime 增量更新；只追加写入的日志文件只索引新增的尾部。
+
+索引内容：文件中每个“词元段”（连续的字母、数字、下划线或非 ASCII 字节）的全部
+3 字节组合（ASCII 已转为小写）。查询时只取查询词中同样位于词元段内的三元组：
+文件若包含查询词，这些三元组必然也出现在文件的词元段中，因此候选集合不会漏掉匹配。
+搜索只需在候选文件中逐行验证。
+"""
+
+import os
+import re
+import time
+import zlib
+import queue
+import sqlite3
+import hashlib
+import pathlib
+import threading
+from typing import Iterable, Optional
+
+import file_cache
+
+try:
+    import config
+    log = config.log
+except ImportError:
+    config = None
+    def log(*args, level="INFO"):
+        print(f"[{time.strftime('%H:%M:%S')}] [{level}] [INDEX] {' '.join(str(a) for a in args)}")
+
+try:
+    import fs_watcher
+except ImportError:
+    fs_watcher = None
+
+
+_APP_DIR = pathlib.Path(config.APP_DIR) if config else pathlib.Path(__file__).resolve().parent
+INDEX_DIR = pathlib.Path(getattr(config, "CONFIG_DIR", _APP_DIR / "config")) / "search_index"
+
+# 每次读取的块大小
+CHUNK_SIZE = 8 * 1024 * 1024
+# 用于判断文件是否只被追加写入的尾部校验长度
+TAIL_CHECK_BYTES = 256
+
+# 词元段：ASCII 字母数字、下划线以及所有非 ASCII 字节（覆盖 UTF-8/GBK 中文）
+_TOKEN_RE = re.compile(rb"[0-9A-Za-z_\x80-\xff]{3,}")
+_TOKEN_BYTES = bytes(b for b in range(256) if _TOKEN_RE.match(bytes([b]) * 3))
+
+
+# ----------------------------------------------------------------------
+# 1. 三元组提取
+# ----------------------------------------------------------------------
+
+def _packed_trigrams(data) -> set:
+    """
+    返回 data 中所有 3 字节组合，编码为 24 位整数。
+    按 3 种偏移把字节重排到 4 字节对齐的缓冲区，再以 uint32 视图一次性放入集合，
+    避免在 Python 层逐字节循环。
+    """
+    grams = set()
+    view = memoryview(data)
+    for offset in range(3):
+        part = view[offset:]
+        n = len(part) // 3
+        if n == 0:
+            break
+        buf = bytearray(4 * n)
+        # 小端 uint32: 第 0 字节保持为 0，后 3 字节为三元组
+        buf[1::4] = part[0:3 * n:3]
+        buf[2::4] = part[1:3 * n:3]
+        buf[3::4] = part[2:3 * n:3]
+        grams.update(memoryview(buf).cast("I"))
+    return grams
+
+
+def _gram_value(gram: bytes) -> int:
+    """与 _packed_trigrams 相同的 3 字节编码方式。"""
+    return int.from_bytes(b"\0" + gram, "little")
+
+
+def trigrams_of(data: bytes) -> set:
+    """提取文本块中所有词元段的三元组（ASCII 小写）。"""
+    tokens = set(_TOKEN_RE.findall(data.lower()))
+    if not tokens:
+        return set()
+    # 以 0 字节连接各词元，跨越连接处的三元组含有 0 字节，查询永远不会用到
+    return _packed_trigrams(b"\0".join(tokens))
+
+
+def query_trigrams(term: str, encoding: str) -> Optional[set]:
+    """
+    返回查询词在给定编码下、可用于缩小范围的三元组集合。
+    查询词无法用该编码表示，或该编码文件正文的字节形式无法确定（utf-16 等由 BOM 决定字节序）时
+    返回 None（调用方应把这类文件全部视为候选）。
+    """
+    # utf-8-sig 等编码会写出 BOM，查询词必须按正文的编码转换，否则 BOM 字节会混入三元组
+    try:
+        encoding = file_cache.body_encoding(encoding)
+    except LookupError:
+        return None
+    if encoding is None:
+        return None
+    # 只有 ASCII 会被索引转为小写；含大小写的非 ASCII 字符在文件中可能是任一形式，必须跳过
+    runs, current = [], []
+    for ch in term:
+        if ord(ch) > 127 and ch.lower() != ch.upper():
+            runs.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+    runs.append("".join(current))
+
+    grams = set()
+    for run in runs:
+        if not run:
+            continue
+        try:
+            # 先编码再按字节转小写，与索引对文件原始字节的处理相同（GBK 等的尾字节可能落在 A-Z）
+            encoded = run.encode(encoding).lower()
+        except UnicodeEncodeError:
+            return None
+        for token in _TOKEN_RE.findall(encoded):
+            grams.update(_gram_value(token[i:i + 3]) for i in range(len(token) - 2))
+    return grams
+
+
+# ----------------------------------------------------------------------
+# 2. 索引
+# ----------------------------------------------------------------------
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    encoding TEXT NOT NULL,
+    indexed_size INTEGER NOT NULL,
+    tail_crc INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS grams (
+    gram INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    PRIMARY KEY (gram, file_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS grams_by_file ON grams (file_id);
+"""
+
+
+def index_path_for(root) -> pathlib.Path:
+    digest = hashlib.sha1(str(root).encode("utf-8")).hexdigest()[:16]
+    return INDEX_DIR / f"{digest}.sqlite3"
+
+
+class SearchIndex:
+    """
+    一个工作区的三元组索引。
+
+    写入只发生在后台索引线程中；查询可以在任意线程中进行（每次查询使用独立连接，
+    数据库处于 WAL 模式，读写互不阻塞）。
+    """
+
+    def __init__(self, ws, suffixes: Iterable[str]):
+        self.workspace = ws
+        self.suffixes = {s.lower() for s in suffixes}
+        self.db_path = index_path_for(ws.root)
+        self.ready = False
+
+        # path -> (size, mtime_ns, encoding)，已索引文件的状态，供查询线程快速判断是否过期
+        self._state = {}
+        self._state_lock = threading.Lock()
+
+        self._tasks = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- 生命周期 ---
+
+    def start(self):
+        """启动后台索引线程，并安排一次完整的增量扫描。"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="SearchIndexer", daemon=True)
+        self._thread.start()
+        self._tasks.put(("scan", None))
+
+    def stop(self):
+        self._stop.set()
+        self._tasks.put(("stop", None))
+
+    def notify(self, events):
+        """接收文件监视器事件，安排相关文件的增量更新（可在任意线程调用）。"""
+        for event in events:
+            if fs_watcher and event.kind == fs_watcher.RESCAN:
+                self._tasks.put(("scan", None))
+            elif not event.is_dir:
+                self._tasks.put(("file", event.path))
+            elif fs_watcher and event.kind == fs_watcher.REMOVED:
+                self._tasks.put(("drop_tree", event.path))
+            else:
+                self._tasks.put(("scan", None))
+
+    def _wants(self, path) -> bool:
+        return os.path.splitext(path)[1].lower() in self.suffixes
+
+    # --- 查询 ---
+
+    def is_current(self, meta) -> bool:
+        """文件自上次索引后未被修改时返回 True。"""
+        with self._state_lock:
+            state = self._state.get(meta.path)
+        return state is not None and state[:2] == (meta.size, meta.mtime_ns)
+
+    def candidates(self, term: str) -> Optional[set]:
+        """
+        返回可能包含 term 的已索引文件路径集合；索引尚未就绪时返回 None（表示无法缩小范围）。
+        对于未被索引或已过期的文件，调用方应使用 is_current 判断并直接搜索它们。
+        """
+        if not self.ready:
+            return None
+
+        result = set()
+        try:
+            conn = self._connect()
+        except sqlite3.Error:
+            return None
+        try:
+            by_encoding = {}
+            for file_id, path, encoding in conn.execute("SELECT id, path, encoding FROM files"):
+                by_encoding.setdefault(encoding, {})[file_id] = path
+
+            for encoding, id_to_path in by_encoding.items():
+                grams = query_trigrams(term, encoding)
+                if not grams:
+                    # 查询词中没有可用的三元组：该编码的所有文件都是候选
+                    result.update(id_to_path.values())
+                    continue
+                ids = None
+                # 逐个三元组求交集，任何一步为空即可提前结束
+                for gram in grams:
+                    rows = conn.execute("SELECT file_id FROM grams WHERE gram = ?", (gram,))
+                    found = {r[0] for r in rows}
+                    ids = found if ids is None else ids & found
+                    if not ids:
+                        break
+                result.update(id_to_path[i] for i in ids or () if i in id_to_path)
+        except sqlite3.Error as e:
+            log(f"[WARNING] 搜索索引查询失败: {e}", level="WARNING")
+            return None
+        finally:
+            conn.close()
+        return result
+
+    # --- 后台索引线程 ---
+
+    def _connect(self):
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _run(self):
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = self._connect()
+            conn.executescript(_SCHEMA)
+            with self._state_lock:
+                self._state = {
+                    path: (size, mtime_ns, encoding)
+                    for path, size, mtime_ns, encoding in conn.execute(
+                        "SELECT path, size, mtime_ns, encoding FROM files")
+                }
+        except (OSError, sqlite3.Error) as e:
+            log(f"[ERROR] 无法打开搜索索引 {self.db_path}: {e}", level="ERROR")
+            return
+
+        try:
+            while not self._stop.is_set():
+                kind, arg = self._tasks.get()
+                if kind == "stop":
+                    break
+                try:
+                    if kind == "scan":
+                        self._full_scan(conn)
+                    elif kind == "file":
+                        self._update_file(conn, arg)
+                        conn.commit()
+                    elif kind == "drop_tree":
+                        self._drop_tree(conn, arg)
+                        conn.commit()
+                except (OSError, sqlite3.Error) as e:
+                    log(f"[WARNING] 搜索索引更新失败 ({kind}): {e}", level="WARNING")
+        finally:
+            conn.close()
+
+    def _full_scan(self, conn):
+        started = time.time()
+        seen = set()
+        updated = 0
+        for meta in self.workspace.iter_files(self.suffixes):
+            if self._stop.is_set():
+                return
+            seen.add(meta.path)
+            if not self.is_current(meta):
+                if self._index_file(conn, meta):
+                    updated += 1
+                conn.commit()
+
+        with self._state_lock:
+            stale = [p for p in self._state if p not in seen]
+        for path in stale:
+            self._remove(conn, path)
+        conn.commit()
+
+        self.ready = True
+        if updated or stale:
+            log(f"Search index updated: {updated} file(s) indexed, {len(stale)} removed "
+                f"in {time.time() - started:.1f}s")
+
+    def _update_file(self, conn, path):
+        path = os.path.abspath(path)
+        if not self._wants(path):
+            return
+        meta = file_cache.get_cache().get(path)
+        if meta is None or meta.is_dir or self.workspace.is_excluded(path, False):
+            self._remove(conn, path)
+        elif not self.is_current(meta):
+            self._index_file(conn, meta)
+
+    def _drop_tree(self, conn, dir_path):
+        prefix = os.path.abspath(dir_path) + os.sep
+        with self._state_lock:
+            paths = [p for p in self._state if p.startswith(prefix)]
+        for path in paths:
+            self._remove(conn, path)
+
+    def _remove(self, conn, path):
+        row = conn.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()
+        if row:
+            conn.execute("DELETE FROM grams WHERE file_id = ?", (row[0],))
+            conn.execute("DELETE FROM files WHERE id = ?", (row[0],))
+        with self._state_lock:
+            self._state.pop(path, None)
+
+    def _index_file(self, conn, meta) -> bool:
+        """索引单个文件；文件只是被追加时仅处理新增部分。返回是否写入了索引。"""
+        info = file_cache.get_cache().content_info(meta)
+        if info.is_binary:
+            self._remove(conn, meta.path)
+            return False
+
+        row = conn.execute(
+            "SELECT id, encoding, indexed_size, tail_crc FROM files WHERE path = ?", (meta.path,)
+        ).fetchone()
+
+        with open(meta.path, "rb") as f:
+            start = 0
+            file_id = None
+            if row and row[1] == info.encoding and 0 < row[2] <= meta.size:
+                # 检查已索引部分的末尾是否未变，若是则只索引追加的内容
+                check_from = max(0, row[2] - TAIL_CHECK_BYTES)
+                f.seek(check_from)
+                if zlib.crc32(f.read(row[2] - check_from)) == row[3]:
+                    file_id = row[0]
+                    # 从旧末尾前 2 字节开始，覆盖跨越旧末尾的三元组
+                    start = max(0, row[2] - 2)
+            if file_id is None:
+                if row:
+                    conn.execute("DELETE FROM grams WHERE file_id = ?", (row[0],))
+                    conn.execute("DELETE FROM files WHERE id = ?", (row[0],))
+                cur = conn.execute(
+                    "INSERT INTO files (path, size, mtime_ns, encoding, indexed_size, tail_crc) "
+                    "VALUES (?, 0, 0, ?, 0, 0)", (meta.path, info.encoding))
+                file_id = cur.lastrowid
+
+            f.seek(start)
+            carry = b""
+            indexed_size = start
+            while indexed_size < meta.size:
+                if self._stop.is_set():
+                    return False
+                chunk = f.read(min(CHUNK_SIZE, meta.size - indexed_size))
+                if not chunk:
+                    break
+                indexed_size += len(chunk)
+                data = carry + chunk
+                # 末尾未结束的词元留到下一块，避免把一个词元拆开
+                if indexed_size >= meta.size:
+                    body, carry = data, b""
+                else:
+                    cut = len(data.rstrip(_TOKEN_BYTES))
+                    if cut:
+                        body, carry = data[:cut], data[cut:]
+                    else:
+                        # 整块都是一个超长词元：完整处理并保留最后 2 字节，保证跨块的三元组不丢失
+                        body, carry = data, data[-2:]
+                self._insert_grams(conn, file_id, trigrams_of(body))
+            if carry:
+                self._insert_grams(conn, file_id, trigrams_of(carry))
+
+            check_from = max(0, indexed_size - TAIL_CHECK_BYTES)
+            f.seek(check_from)
+            tail_crc = zlib.crc32(f.read(indexed_size - check_from))
+
+        conn.execute(
+            "UPDATE files SET size = ?, mtime_ns = ?, encoding = ?, indexed_size = ?, tail_crc = ? "
+            "WHERE id = ?",
+            (meta.size, meta.mtime_ns, info.encoding, indexed_size, tail_crc, file_id))
+        with self._state_lock:
+            self._state[meta.path] = (meta.size, meta.mtime_ns, info.encoding)
+        return True
+
+    @staticmethod
+    def _insert_grams(conn, file_id, grams):
+        if grams:
+            conn.executemany("INSERT OR IGNORE INTO grams (gram, file_id) VALUES (?, ?)",
+                             ((g, file_id) for g in grams))
@@ -0,0 +1,175 @@
+# search_results.py
+
+"""
+全局搜索结果的存储与虚拟化显示。
+
+ResultStore 以紧凑的数组保存全部命中（行号、所属文件、UTF-8 编码的预览文本），
+不为每条命中创建 Python 对象或 Tk 控件；VirtualResultList 只为可见区域
+（加上少量预留行）创建 Treeview 条目，滚动时复用这些条目并改写其内容。
+因此十万级的命中也只占用少量内存，界面刷新的代价与结果总数无关。
+"""
+
+import os
+import bisect
+import tkinter as tk
+from array import array
+from typing import Callable, Optional
+
+from virtual_table import VirtualTable
+
+
+# ----------------------------------------------------------------------
+# 1. 结果存储
+# ----------------------------------------------------------------------
+
+class ResultStore:
+    """
+    按文件分组的命中结果存储。
+
+    显示时的“行”由每个文件的标题行及其命中行依次组成；折叠的文件只占一行。
+    行号到命中的映射通过各文件起始行的前缀数组二分查找得到，仅在数据变化后重建。
+    """
+
+    def __init__(self):
+        self.paths = []               # file_idx -> path
+        self._file_index = {}         # path -> file_idx
+        self._file_hits = []          # file_idx -> array('L') of hit_idx
+        self._collapsed = set()
+        self._lines = array('L')      # hit_idx -> 行号
+        self._hit_file = array('L')   # hit_idx -> file_idx
+        self._text = bytearray()      # 所有预览文本依次拼接
+        self._text_ends = array('Q')  # hit_idx -> 预览文本在 _text 中的结束位置
+        self._row_starts = array('Q')  # file_idx -> 标题行的行号
+        self._row_count = 0
+        self._dirty = False
+
+    # --- 写入 ---
+
+    def add(self, path: str, line: int, content: str):
+        file_idx = self._file_index.get(path)
+        if file_idx is None:
+            file_idx = len(self.paths)
+            self._file_index[path] = file_idx
+            self.paths.append(path)
+            self._file_hits.append(array('L'))
+        self._file_hits[file_idx].append(len(self._lines))
+        self._lines.append(line)
+        self._hit_file.append(file_idx)
+        self._text += content.encode('utf-8', errors='replace')
+        self._text_ends.append(len(self._text))
+        self._dirty = True
+
+    def extend(self, hits):
+        """追加一批 {'path', 'line', 'content'} 形式的命中。"""
+        for hit in hits:
+            self.add(hit['path'], hit['line'], hit['content'])
+
+    # --- 查询 ---
+
+    @property
+    def hit_count(self) -> int:
+        return len(self._lines)
+
+    @property
+    def file_count(self) -> int:
+        return len(self.paths)
+
+    def file_hit_count(self, file_idx: int) -> int:
+        return len(self._file_hits[file_idx])
+
+    def hit(self, hit_idx: int) -> tuple:
+        """返回 (path, line, content)。"""
+        start = self._text_ends[hit_idx - 1] if hit_idx else 0
+        content = self._text[start:self._text_ends[hit_idx]].decode('utf-8', errors='replace')
+        return self.paths[self._hit_file[hit_idx]], self._lines[hit_idx], content
+
+    def is_collapsed(self, file_idx: int) -> bool:
+        return file_idx in self._collapsed
+
+    def toggle(self, file_idx: int):
+        """折叠或展开一个文件的命中行。"""
+        self._collapsed.symmetric_difference_update((file_idx,))
+        self._dirty = True
+
+    # --- 行映射 ---
+
+    def _rebuild_rows(self):
+        starts = array('Q')
+        row = 0
+        for file_idx, hits in enumerate(self._file_hits):
+            starts.append(row)
+            row += 1 if file_idx in self._collapsed else 1 + len(hits)
+        self._row_starts = starts
+        self._row_count = row
+        self._dirty = False
+
+    @property
+    def row_count(self) -> int:
+        if self._dirty:
+            self._rebuild_rows()
+        return self._row_count
+
+    def row(self, row: int) -> tuple:
+        """返回 ('file', file_idx) 或 ('hit', hit_idx)。"""
+        if self._dirty:
+            self._rebuild_rows()
+        file_idx = bisect.bisect_right(self._row_starts, row) - 1
+        offset = row - self._row_starts[file_idx]
+        if offset == 0:
+            return 'file', file_idx
+        return 'hit', self._file_hits[file_idx][offset - 1]
+
+
+# ----------------------------------------------------------------------
+# 2. 虚拟化列表
+# ----------------------------------------------------------------------
+
+class VirtualResultList(VirtualTable):
+    """
+    只渲染可见行的结果列表（滚动、条目复用和按键处理见 VirtualTable）。
+
+    行数跟随 ResultStore 增长。双击（或回车）命中行调用 on_open(path, line)，
+    双击文件行折叠/展开该文件。
+    """
+
+    def __init__(self, parent, store: ResultStore, on_open: Callable[[str, int], None],
+                 path_label: Optional[Callable[[str], str]] = None, **kwargs):
+        self.store = store
+        self.on_open = on_open
+        self.path_label = path_label or os.path.basename
+        super().__init__(parent, columns=[('Line', 60), ('Content Preview', 500)], get_row=self._row_values,
+                         on_activate=self._open_row, row_tags=self._row_tags, **kwargs)
+
+        self.tree.configure(bootstyle="primary")
+        self.vsb.configure(bootstyle="round")
+        line_col, preview_col = self.tree['columns']
+        self.tree.heading(line_col, anchor=tk.CENTER)
+        self.tree.column(line_col, anchor=tk.CENTER)
+        self.tree.column(preview_col, stretch=tk.YES)
+        self.tree.tag_configure('file_path', font=('Segoe UI', 10, 'bold'), foreground='#90EE90')
+        self.tree.tag_configure('match', font=('Consolas', 9))
+
+    @property
+    def row_count(self) -> int:
+        return self.store.row_count
+
+    def _row_values(self, row: int) -> tuple:
+        kind, idx = self.store.row(row)
+        if kind == 'file':
+            marker = "▶" if self.store.is_collapsed(idx) else "▼"
+            count = self.store.file_hit_count(idx)
+            return '', f"{marker} {self.path_label(self.store.paths[idx])}  ({count})"
+        _, line, content = self.store.hit(idx)
+        return line, content
+
+    def _row_tags(self, row: int) -> tuple:
+        return ('file_path',) if self.store.row(row)[0] == 'file' else ('match',)
+
+    def _open_row(self, row: int):
+        kind, idx = self.store.row(row)
+        if kind == 'file':
+            self.store.toggle(idx)
+            self.refresh()
+        else:
+            path, line, _ = self.store.hit(idx)
+            self.on_open(path, line)
@@ -0,0 +1,201 @@
+# virtual_table.py
+
+"""
+通用的虚拟化表格控件。
+
+Treeview 中只保留可见区域（加上少量预留行）的条目，滚动时复用这些条目并改写其内容；
+行数据通过 get_row(index) 按需获取，因此表格的刷新代价与总行数无关。列可以在运行时整体替换。
+全局搜索的 VirtualResultList 也建立在它之上。
+"""
+
+import tkinter as tk
+import ttkbootstrap as ttk
+from typing import Callable, Optional, Sequence
+
+
+# 在可见行之外额外创建的条目数：窗口变高时无需等待下一次刷新即可显示
+OVERSCAN_ROWS = 10
+
+# 无法测得实际行高时使用的默认值（像素）
+_DEFAULT_ROW_HEIGHT = 20
+
+
+class VirtualTable(ttk.Frame):
+    """
+    只渲染可见行的表格。
+
+    columns 为 [(标题, 宽度), ...]；get_row(index) 返回该行各列的值。
+    滚动条、鼠标滚轮和方向键都由本类接管。双击（或回车）一行时调用 on_activate(index)。
+    row_tags(index) 可选，返回该行的 Treeview 标签（用于高亮等，样式由调用方用 tag_configure 设置）。
+    行数来自 row_count 属性，子类可以覆盖它以跟随不断增长的数据源。
+    """
+
+    def __init__(self, parent, columns: Sequence[tuple] = (), row_count: int = 0,
+                 get_row: Optional[Callable[[int], Sequence]] = None,
+                 on_activate: Optional[Callable[[int], None]] = None, height: int = 10,
+                 row_tags: Optional[Callable[[int], Sequence[str]]] = None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self._row_count = row_count
+        self.get_row = get_row or (lambda index: ())
+        self.on_activate = on_activate
+        self.row_tags = row_tags
+        self.top = 0            # 第一条可见行的行号
+        self.selected = None    # 选中行的行号
+        self._visible = 1
+        self._pool = []         # 复用的 Treeview 条目 id
+
+        self.tree = ttk.Treeview(self, show="headings", selectmode="browse", height=height)
+        self.vsb = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.hsb = ttk.Scrollbar(self, orient="horizontal", command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.hsb.set)
+        self.hsb.pack(side="bottom", fill="x")
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.vsb.pack(side="right", fill="y")
+
+        self.tree.bind('<Configure>', lambda e: self.refresh())
+        self.tree.bind('<Double-1>', self._on_double_click)
+        self.tree.bind('<Return>', lambda e: self._activate(self.selected))
+        self.tree.bind('<ButtonRelease-1>', self._on_click)
+        for seq in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.tree.bind(seq, self._on_wheel)
+        for key, delta in (('<Up>', -1), ('<Down>', 1), ('<Prior>', 'page_up'),
+                           ('<Next>', 'page_down'), ('<Home>', 'home'), ('<End>', 'end')):
+            self.tree.bind(key, lambda e, d=delta: self._on_key(d))
+
+        self.set_columns(columns)
+
+    # --- 数据源 ---
+
+    def set_columns(self, columns: Sequence[tuple]):
+        """替换全部列；columns 为 [(标题, 宽度), ...]。"""
+        for item in self._pool:
+            self.tree.delete(item)
+        self._pool = []
+        ids = [f"c{i}" for i in range(len(columns))]
+        self.tree.configure(columns=ids)
+        for col_id, (title, width) in zip(ids, columns):
+            self.tree.heading(col_id, text=title, anchor=tk.W)
+            self.tree.column(col_id, width=width, minwidth=40, stretch=tk.NO, anchor=tk.W)
+
+    @property
+    def row_count(self) -> int:
+        return self._row_count
+
+    def set_source(self, row_count: int, get_row: Callable[[int], Sequence]):
+        """替换数据源并回到第一行。"""
+        self._row_count = row_count
+        self.get_row = get_row
+        self.top = 0
+        self.selected = None
+        self.refresh()
+
+    # --- 渲染 ---
+
+    def _row_height(self) -> tuple:
+        """返回 (表头高度, 行高)；条目尚未显示时使用估计值。"""
+        if self._pool:
+            bbox = self.tree.bbox(self._pool[0])
+            if bbox:
+                return bbox[1], bbox[3]
+        return _DEFAULT_ROW_HEIGHT + 4, _DEFAULT_ROW_HEIGHT
+
+    def refresh(self):
+        """数据或视口变化后调用：按当前滚动位置重新填充可见条目。"""
+        header, row_height = self._row_height()
+        self._visible = max(1, (self.tree.winfo_height() - header) // max(1, row_height))
+        total = self.row_count
+        self.top = max(0, min(self.top, total - self._visible))
+
+        wanted = min(total - self.top, self._visible + OVERSCAN_ROWS)
+        while len(self._pool) < wanted:
+            self._pool.append(self.tree.insert('', 'end'))
+        while len(self._pool) > wanted:
+            self.tree.delete(self._pool.pop())
+
+        selected_item = None
+        for i, item in enumerate(self._pool):
+            row = self.top + i
+            self.tree.item(item, values=tuple(self.get_row(row)),
+                           tags=tuple(self.row_tags(row)) if self.row_tags else ())
+            if row == self.selected:
+                selected_item = item
+
+        self.tree.selection_set(selected_item or ())
+        self.tree.yview_moveto(0)
+        if total:
+            self.vsb.set(self.top / total, min(1.0, (self.top + self._visible) / total))
+        else:
+            self.vsb.set(0, 1)
+
+    # --- 滚动 ---
+
+    def scroll_to(self, top: int):
+        self.top = max(0, top)
+        self.refresh()
+
+    def see(self, row: int):
+        """选中一行并在其不可见时滚动到该行。"""
+        self.selected = max(0, min(self.row_count - 1, row))
+        if self.selected < self.top or self.selected >= self.top + self._visible:
+            self.top = self.selected
+        self.refresh()
+
+    def _on_scrollbar(self, *args):
+        if args[0] == 'moveto':
+            self.scroll_to(int(float(args[1]) * self.row_count))
+        elif args[0] == 'scroll':
+            step = self._visible if args[2] == 'pages' else 1
+            self.scroll_to(self.top + int(args[1]) * step)
+
+    def _on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.top - 3)
+        else:
+            self.scroll_to(self.top + 3)
+        return "break"
+
+    def _on_key(self, delta):
+        total = self.row_count
+        if not total:
+            return "break"
+        current = self.top if self.selected is None else self.selected
+        if delta == 'page_up':
+            target = current - self._visible
+        elif delta == 'page_down':
+            target = current + self._visible
+        elif delta == 'home':
+            target = 0
+        elif delta == 'end':
+            target = total - 1
+        else:
+            target = current + delta
+        self.selected = max(0, min(total - 1, target))
+        # 选中行移出视口时滚动，使其保持可见
+        if self.selected < self.top:
+            self.top = self.selected
+        elif self.selected >= self.top + self._visible:
+            self.top = self.selected - self._visible + 1
+        self.refresh()
+        return "break"
+
+    # --- 交互 ---
+
+    def _row_at(self, y) -> Optional[int]:
+        item = self.tree.identify_row(y)
+        if not item or item not in self._pool:
+            return None
+        return self.top + self._pool.index(item)
+
+    def _on_click(self, event):
+        row = self._row_at(event.y)
+        if row is not None:
+            self.selected = row
+
+    def _on_double_click(self, event):
+        self._activate(self._row_at(event.y))
+        return "break"
+
+    def _activate(self, row):
+        if row is None or row >= self.row_count or self.on_activate is None:
+            return
+        self.on_activate(row)
@@ -0,0 +1,322 @@
+# workspace.py
+
+"""
+工作区抽象。
+
+文件浏览器、全局搜索、脚本运行器等子系统共享同一个工作区：
+- 可由用户选择的根目录（默认为 config.APP_DIR），设置持久化在 CONFIG_DIR/workspace.json。
+- 一个在创建时一次性编译的排除规则匹配器，规则来自根目录的 .gitignore
+  以及可配置的排除列表（gitignore 语法）。
+
+被排除的目录在遍历时会被直接剪枝，venv、node_modules、构建输出等大目录永远不会被遍历。
+"""
+
+import os
+import re
+import json
+import time
+import pathlib
+import threading
+from typing import Iterable, Iterator, Optional
+
+import file_cache
+
+try:
+    import config
+    log = config.log
+except ImportError:
+    config = None
+    def log(*args, level="INFO"):
+        print(f"[{time.strftime('%H:%M:%S')}] [{level}] [WORKSPACE] {' '.join(str(a) for a in args)}")
+
+
+# ----------------------------------------------------------------------
+# 1. 默认配置
+# ----------------------------------------------------------------------
+
+# 默认排除规则（gitignore 语法）。
+# 前两条保持了文件浏览器原有的行为：忽略隐藏文件和 __pycache__。
+DEFAULT_EXCLUDES = [
+    ".*",
+    "__pycache__*",
+    "venv/",
+    "node_modules/",
+    "build/",
+    "dist/",
+    "*.egg-info/",
+]
+
+_APP_DIR = pathlib.Path(config.APP_DIR) if config else pathlib.Path(__file__).resolve().parent
+_CONFIG_DIR = pathlib.Path(getattr(config, "CONFIG_DIR", _APP_DIR / "config"))
+SETTINGS_FILE = _CONFIG_DIR / "workspace.json"
+
+
+# ----------------------------------------------------------------------
+# 2. gitignore 风格的规则编译
+# ----------------------------------------------------------------------
+
+def _translate_glob(pattern: str) -> str:
+    """将 gitignore 通配符（*, **, ?, [...]）翻译为正则表达式片段。"""
+    i, n = 0, len(pattern)
+    out = []
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**", i):
+                i += 2
+                if i < n and pattern[i] == "/":
+                    # '**/' 匹配零个或多个目录
+                    out.append("(?:.*/)?")
+                    i += 1
+                else:
+                    out.append(".*")
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = pattern.find("]", i + 1)
+            if j == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:j].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = j
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class _Rule:
+    """单条已编译的排除规则。"""
+    __slots__ = ("pattern", "negate", "dir_only", "_self_or_child", "_child_only")
+
+    def __init__(self, pattern, negate, dir_only, anchored, body):
+        self.pattern = pattern
+        self.negate = negate
+        self.dir_only = dir_only
+        prefix = "" if anchored else "(?:.*/)?"
+        # 匹配条目本身或其任意子孙（被排除目录下的内容同样被排除）
+        self._self_or_child = re.compile(f"^{prefix}{body}(?:/.*)?$", re.DOTALL)
+        # 仅匹配子孙：用于“仅目录”规则作用在文件上的情况
+        self._child_only = re.compile(f"^{prefix}{body}/.*$", re.DOTALL)
+
+    def match(self, rel_path: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return self._child_only.match(rel_path) is not None
+        return self._self_or_child.match(rel_path) is not None
+
+
+def _compile_rule(raw: str) -> Optional[_Rule]:
+    line = raw.rstrip("\r\n")
+    if not line.strip() or line.startswith("#"):
+        return None
+    line = line.rstrip(" ")
+    negate = line.startswith("!")
+    if negate:
+        line = line[1:]
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    # 含有 '/'（末尾除外）的规则相对根目录锚定，否则匹配任意层级的名称
+    anchored = "/" in line
+    line = line.lstrip("/")
+    return _Rule(raw, negate, dir_only, anchored, _translate_glob(line))
+
+
+class ExclusionMatcher:
+    """
+    由 gitignore 风格规则一次性编译得到的匹配器。
+    规则按顺序求值，后出现的规则优先（支持 '!' 取反）。
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = [p for p in patterns]
+        self._rules = [r for r in (_compile_rule(p) for p in self.patterns) if r is not None]
+
+    def matches(self, rel_path: str, is_dir: bool = False) -> bool:
+        """rel_path 为相对工作区根目录的 POSIX 风格路径。"""
+        excluded = False
+        for rule in self._rules:
+            # 只有可能改变当前结论的规则才需要求值
+            if rule.negate == excluded and rule.match(rel_path, is_dir):
+                excluded = not rule.negate
+        return excluded
+
+
+# ----------------------------------------------------------------------
+# 3. 工作区
+# ----------------------------------------------------------------------
+
+class Workspace:
+    """
+    工作区：根目录 + 排除规则。所有遍历都通过它进行，以保证各子系统看到同一组文件。
+    """
+
+    def __init__(self, root=None, excludes: Optional[Iterable[str]] = None, use_gitignore: bool = True):
+        self.root = pathlib.Path(root or _APP_DIR).resolve()
+        self.excludes = list(DEFAULT_EXCLUDES if excludes is None else excludes)
+        self.use_gitignore = use_gitignore
+        self.matcher = self._build_matcher()
+
+    def _read_gitignore(self):
+        gitignore = self.root / ".gitignore"
+        if not self.use_gitignore or not gitignore.is_file():
+            return []
+        try:
+            with open(gitignore, "r", encoding="utf-8", errors="replace") as f:
+                return f.read().splitlines()
+        except OSError as e:
+            log(f"[WARNING] 无法读取 {gitignore}: {e}", level="WARNING")
+            return []
+
+    def _build_matcher(self) -> ExclusionMatcher:
+        # 用户配置的规则放在 .gitignore 之后，以便可以用 '!' 覆盖 .gitignore
+        return ExclusionMatcher(self._read_gitignore() + self.excludes)
+
+    def reload_rules(self):
+        """重新读取 .gitignore 并重新编译匹配器。"""
+        self.matcher = self._build_matcher()
+
+    # --- 路径判断 ---
+
+    def relpath(self, path) -> Optional[str]:
+        """返回相对根目录的 POSIX 路径；根目录本身返回 ''，不在工作区内返回 None。"""
+        try:
+            rel = os.path.relpath(str(path), str(self.root))
+        except ValueError:
+            return None  # Windows: 不同盘符
+        if rel == os.curdir:
+            return ""
+        if rel == os.pardir or rel.startswith(os.pardir + os.sep):
+            return None
+        return rel.replace(os.sep, "/")
+
+    def contains(self, path) -> bool:
+        return self.relpath(path) is not None
+
+    def is_excluded(self, path, is_dir: Optional[bool] = None) -> bool:
+        """判断路径是否被排除。is_dir 未知时会查询文件系统。工作区外的路径视为被排除。"""
+        rel = self.relpath(path)
+        if rel is None:
+            return True
+        if rel == "":
+            return False
+        if is_dir is None:
+            is_dir = os.path.isdir(path)
+        return self.matcher.matches(rel, is_dir)
+
+    # --- 遍历 ---
+
+    def list_dir(self, dir_path):
+        """
+        列出目录下未被排除的条目，返回 (dirs, files) 两个按名称排序的 file_cache.FileMeta 列表。
+        目录内容来自共享的元数据缓存，未变化的目录不会被重新扫描。
+        """
+        dirs, files = [], []
+        base_rel = self.relpath(dir_path)
+        if base_rel is None:
+            return dirs, files
+        prefix = f"{base_rel}/" if base_rel else ""
+        for meta in file_cache.get_cache().list_dir(dir_path):
+            if self.matcher.matches(prefix + meta.name, meta.is_dir):
+                continue
+            (dirs if meta.is_dir else files).append(meta)
+        return dirs, files
+
+    def walk(self, top=None, max_depth: Optional[int] = None) -> Iterator[tuple]:
+        """
+        类似 os.walk 的遍历，产出 (dir_path, dirs, files)，其中 dirs/files 为 FileMeta 列表。
+        被排除的目录不会被进入；调用方可以原地修改 dirs 以进一步剪枝。
+        """
+        stack = [(str(top or self.root), 0)]
+        while stack:
+            dir_path, depth = stack.pop()
+            try:
+                dirs, files = self.list_dir(dir_path)
+            except OSError as e:
+                log(f"[WARNING] 无法读取目录 {dir_path}: {e}", level="WARNING")
+                continue
+            yield dir_path, dirs, files
+            if max_depth is not None and depth + 1 >= max_depth:
+                continue
+            for entry in reversed(dirs):
+                stack.append((entry.path, depth + 1))
+
+    def iter_files(self, suffixes: Optional[Iterable[str]] = None, top=None) -> Iterator[file_cache.FileMeta]:
+        """产出工作区内所有未被排除文件的 FileMeta，可按扩展名（小写，含点）过滤。"""
+        suffix_set = {s.lower() for s in suffixes} if suffixes else None
+        for _, _, files in self.walk(top):
+            for meta in files:
+                if suffix_set is None or os.path.splitext(meta.name)[1].lower() in suffix_set:
+                    yield meta
+
+    # --- 持久化 ---
+
+    def to_dict(self) -> dict:
+        return {"root": str(self.root), "excludes": self.excludes, "use_gitignore": self.use_gitignore}
+
+
+# ----------------------------------------------------------------------
+# 4. 进程内共享的当前工作区
+# ----------------------------------------------------------------------
+
+_current: Optional[Workspace] = None
+_lock = threading.Lock()
+
+
+def _load_settings() -> dict:
+    try:
+        with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        log(f"[WARNING] 工作区设置读取失败，使用默认设置: {e}", level="WARNING")
+        return {}
+
+
+def save_settings(ws: Workspace):
+    try:
+        SETTINGS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
+            json.dump(ws.to_dict(), f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        log(f"[ERROR] 工作区设置保存失败: {e}", level="ERROR")
+
+
+def get_workspace() -> Workspace:
+    """返回当前工作区；首次调用时从设置文件加载。"""
+    global _current
+    with _lock:
+        if _current is None:
+            settings = _load_settings()
+            root = settings.get("root")
+            if root and not os.path.isdir(root):
+                log(f"[WARNING] 已保存的工作区目录不存在，回退到默认目录: {root}", level="WARNING")
+                root = None
+            _current = Workspace(root, settings.get("excludes"), settings.get("use_gitignore", True))
+        return _current
+
+
+def set_workspace(root=None, excludes: Optional[Iterable[str]] = None) -> Workspace:
+    """切换工作区根目录和/或排除列表，并保存设置。未给出的参数沿用当前值。"""
+    global _current
+    current = get_workspace()
+    ws = Workspace(
+        root if root is not None else current.root,
+        excludes if excludes is not None else current.excludes,
+        current.use_gitignore,
+    )
+    with _lock:
+        _current = ws
+    save_settings(ws)
+    log(f"Workspace set to: {ws.root}")
+    return ws
@@ -0,0 +1,10 @@
+# conftest.py
+
+"""测试直接导入 src 下的模块（与主程序相同的导入方式）。"""
+
+import sys
+import pathlib
+
+SRC_DIR = pathlib.Path(__file__).resolve().parent.parent / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
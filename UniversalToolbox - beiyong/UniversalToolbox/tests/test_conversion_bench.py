@@ -0,0 +1,72 @@
+# test_conversion_bench.py
+
+import json
+
+import pytest
+
+import conversion_bench
+from conversion_engine import ENGINE_ARROW, ENGINE_PANDAS
+
+
+def test_make_table_mixes_dtypes():
+    df = conversion_bench.make_table(50, columns=6, dtypes=("int", "str", "bool"), cardinality=3)
+    assert list(df.columns) == ["int_0", "str_1", "bool_2", "int_3", "str_4", "bool_5"]
+    assert [str(t) for t in df.dtypes[:3]] in (["int64", "object", "bool"], ["int64", "str", "bool"])
+    assert df["str_1"].nunique() <= 3
+    assert df.equals(conversion_bench.make_table(50, columns=6, dtypes=("int", "str", "bool"), cardinality=3))
+    with pytest.raises(ValueError):
+        conversion_bench.make_table(1, dtypes=("complex",))
+
+
+def test_run_benchmark_covers_every_pair():
+    df = conversion_bench.make_table(20, columns=3)
+    results = conversion_bench.run_benchmark(df, formats=["CSV", "Parquet"], chunk_rows=7)
+    assert {conversion_bench.case_key(r) for r in results} == {
+        f"{i}->{o}/{e}" for i in ("CSV", "Parquet") for o in ("CSV", "Parquet") for e in (ENGINE_PANDAS, ENGINE_ARROW)}
+    assert all(r["rows"] == 20 and r["output_bytes"] > 0 for r in results)
+    fastest = conversion_bench.fastest_engines(results)
+    assert set(fastest) == {(i, o) for i in ("CSV", "Parquet") for o in ("CSV", "Parquet")}
+
+
+def _result(engine, seconds, rss=100.0):
+    return {"input_format": "CSV", "output_format": "Parquet", "engine": engine, "rows": 10,
+            "seconds": seconds, "peak_rss_mb": rss, "output_bytes": 1}
+
+
+def test_compare_flags_only_cases_beyond_tolerance():
+    baseline = {"results": [_result("pandas", 1.0), _result("arrow", 1.0, rss=None)]}
+    results = [_result("pandas", 1.1, rss=150.0), _result("arrow", 1.5), _result("auto", 9.0)]
+    regressions = conversion_bench.compare(results, baseline, tolerance=0.2)
+    assert [(metric, old, new) for _, metric, old, new in regressions] == [("peak_rss_mb", 100.0, 150.0),
+                                                                          ("seconds", 1.0, 1.5)]
+
+
+def test_baseline_round_trip_on_this_machine(tmp_path, capsys):
+    path = tmp_path / "baseline.json"
+    args = ["--rows", "50", "--columns", "3", "--formats", "CSV,JSONL"]
+    assert conversion_bench._main(args + ["--save-baseline", str(path)]) == 0
+    saved = json.loads(path.read_text(encoding="utf-8"))
+    assert saved["machine"] == conversion_bench.machine_info()
+    assert {(r["input_format"], r["output_format"]) for r in saved["results"]} == {
+        ("CSV", "CSV"), ("CSV", "JSONL"), ("JSONL", "CSV"), ("JSONL", "JSONL")}
+    # 行数极少时耗时噪声很大，只检查流程
+    assert conversion_bench._main(args + ["--baseline", str(path), "--tolerance", "1000"]) == 0
+
+
+def test_baseline_from_another_machine_is_rejected(tmp_path, capsys):
+    path = tmp_path / "baseline.json"
+    machine = dict(conversion_bench.machine_info(), host="elsewhere")
+    path.write_text(json.dumps({"machine": machine, "params": {}, "results": [_result("pandas", 1.0)]}))
+    assert conversion_bench._main(["--rows", "50", "--baseline", str(path)]) == 2
+    assert "--save-baseline" in capsys.readouterr().out
+
+
+def test_compare_engines_on_an_existing_file(tmp_path, capsys):
+    path = tmp_path / "in.jsonl"
+    conversion_bench.write_table(conversion_bench.make_table(20, columns=3), path, "JSONL")
+    assert conversion_bench.format_of(str(path)) == "JSONL"
+    assert conversion_bench.format_of("data.unknown") is None
+    results = conversion_bench.compare_engines(str(path), "JSONL", "CSV")
+    assert [r["engine"] for r in results] == [ENGINE_PANDAS, ENGINE_ARROW]
+    assert conversion_bench._main(["--engines", str(path), "--output-format", "Parquet"]) == 0
+    assert "JSONL->Parquet/arrow" in capsys.readouterr().out
@@ -0,0 +1,112 @@
+# test_conversion_cache.py
+
+import os
+
+import pandas as pd
+
+import conversion_cache
+import conversion_engine
+from conversion_cache import ConversionCache, RESTORE_CLONED, RESTORE_COPIED, RESTORE_CURRENT
+
+
+def _write_input(path):
+    pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]}).to_csv(path, index=False)
+
+
+def test_restored_outputs_do_not_share_storage(tmp_path):
+    # 输出 b.csv 从缓存恢复后，再次转换 a.csv 不能改写 b.csv（不能与 a.csv 或缓存产物共享 inode）
+    cache = ConversionCache(tmp_path / "cache")
+    src, a, b = tmp_path / "in.csv", tmp_path / "a.csv", tmp_path / "b.csv"
+    _write_input(src)
+
+    conversion_engine.convert(src, a, "CSV", "CSV", cache=cache)
+    hit = conversion_engine.convert(src, b, "CSV", "CSV", cache=cache)
+    assert hit.cached in (RESTORE_CLONED, RESTORE_COPIED)
+    conversion_engine.convert(src, a, "CSV", "CSV", columns=["a"], cache=cache)
+
+    assert list(pd.read_csv(a).columns) == ["a"]
+    assert list(pd.read_csv(b).columns) == ["a", "b"]
+    assert os.stat(a).st_ino != os.stat(b).st_ino
+    # 缓存产物本身也未被改写：再恢复一次得到完整的两列
+    c = tmp_path / "c.csv"
+    conversion_engine.convert(src, c, "CSV", "CSV", cache=cache)
+    assert list(pd.read_csv(c).columns) == ["a", "b"]
+
+
+def test_content_hash_fingerprint(tmp_path):
+    src, copy = tmp_path / "in.csv", tmp_path / "copy.csv"
+    _write_input(src)
+    copy.write_bytes(src.read_bytes())
+    by_path = ConversionCache(tmp_path / "cache")
+    by_content = ConversionCache(tmp_path / "cache", hash_content=True)
+    options = {"output_format": "CSV"}
+    assert by_path.key(src, options) != by_path.key(copy, options)
+    assert by_content.key(src, options) == by_content.key(copy, options)
+
+    conversion_engine.convert(src, tmp_path / "a.csv", "CSV", "CSV", cache=by_content)
+    hit = conversion_engine.convert(copy, tmp_path / "b.csv", "CSV", "CSV", cache=by_content)
+    assert hit.cached is not None
+
+
+def test_shared_instances():
+    assert conversion_cache.get_cache() is conversion_cache.get_cache(False)
+    assert conversion_cache.get_cache(True).hash_content
+    assert not conversion_cache.get_cache().hash_content
+
+
+def _cached_output(tmp_path, name: str, size: int):
+    path = tmp_path / name
+    path.write_bytes(os.urandom(size))
+    return path
+
+
+def test_store_and_restore(tmp_path):
+    cache = ConversionCache(tmp_path / "cache")
+    out = _cached_output(tmp_path, "out.bin", 1000)
+    assert cache.restore("k" * 64, out) is None
+
+    cache.store("k" * 64, out, rows=10, chunks=2)
+    assert cache.stats() == (1, 1000)
+    again = tmp_path / "sub" / "again.bin"
+    hit = cache.restore("k" * 64, again)
+    assert (hit.rows, hit.chunks) == (10, 2)
+    assert hit.how in (RESTORE_CLONED, RESTORE_COPIED)
+    assert again.read_bytes() == out.read_bytes()
+    assert cache.restore("k" * 64, again).how == RESTORE_CURRENT
+
+    # 输出被改写后重新恢复，而不是当作最新
+    again.write_bytes(b"changed")
+    assert cache.restore("k" * 64, again).how in (RESTORE_CLONED, RESTORE_COPIED)
+    assert again.read_bytes() == out.read_bytes()
+
+
+def test_tampered_object_is_dropped(tmp_path):
+    cache = ConversionCache(tmp_path / "cache")
+    out = _cached_output(tmp_path, "out.bin", 100)
+    cache.store("k" * 64, out, rows=1, chunks=1)
+    cache._object_path("k" * 64).write_bytes(b"tampered")
+    assert cache.restore("k" * 64, tmp_path / "new.bin") is None
+    assert cache.stats() == (0, 0)
+    assert not (tmp_path / "new.bin").exists()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ConversionCache(tmp_path / "cache", max_bytes=2500)
+    for name in "abc":
+        cache.store(name * 64, _cached_output(tmp_path, name, 1000), rows=1, chunks=1)
+        if name == "b":
+            # 访问 a，使 b 成为最久未使用的条目
+            assert cache.restore("a" * 64, tmp_path / "a2") is not None
+    assert cache.stats() == (2, 2000)
+    assert cache.restore("b" * 64, tmp_path / "b2") is None
+    assert not cache._object_path("b" * 64).exists()
+    assert cache.restore("a" * 64, tmp_path / "a3") is not None
+    assert cache.restore("c" * 64, tmp_path / "c3") is not None
+
+    # 超过上限的产物不缓存
+    cache.store("d" * 64, _cached_output(tmp_path, "d", 3000), rows=1, chunks=1)
+    assert cache.stats() == (2, 2000)
+
+    cache.clear()
+    assert cache.stats() == (0, 0)
+    assert cache.restore("a" * 64, tmp_path / "a4") is None
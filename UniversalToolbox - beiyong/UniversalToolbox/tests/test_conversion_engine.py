@@ -0,0 +1,400 @@
+# test_conversion_engine.py
+
+import bz2
+import gzip
+import io
+import json
+import lzma
+import os
+
+import pandas as pd
+import pytest
+
+import conversion_engine
+from conversion_engine import COMPRESSION_NONE, ENGINE_ARROW, ENGINE_AUTO, ENGINE_PANDAS, PARQUET_CODECS, TEXT_CODECS
+
+FRAME = pd.DataFrame({
+    "id": range(1, 8),
+    "price": [0.5, 1.25, -3.0, 4.75, 10.0, 0.0, 2.5],
+    "name": ["a", "中文", "x,y", "quote\"d", "é", "测试", "z"],
+})
+
+# 小块行数，让每次转换都跨越多个块（多个压缩帧 / 多个 row group）
+CHUNK_ROWS = 3
+
+
+def _read_text(data: bytes, fmt: str) -> pd.DataFrame:
+    if fmt == "CSV":
+        return pd.read_csv(io.BytesIO(data))
+    return pd.read_json(io.BytesIO(data), lines=fmt == "JSONL")
+
+
+def _decompress(path, codec: str) -> bytes:
+    if codec == "gzip":
+        return gzip.decompress(path.read_bytes())
+    if codec == "bz2":
+        return bz2.decompress(path.read_bytes())
+    if codec == "xz":
+        return lzma.decompress(path.read_bytes())
+    import pyarrow as pa
+    with pa.input_stream(str(path), compression="zstd") as stream:
+        return stream.read()
+
+
+def _assert_same(frame):
+    pd.testing.assert_frame_equal(frame.reset_index(drop=True), FRAME, check_dtype=False)
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "in.csv"
+    FRAME.to_csv(path, index=False)
+    return path
+
+
+@pytest.mark.parametrize("engine", [ENGINE_PANDAS, ENGINE_ARROW])
+@pytest.mark.parametrize("fmt", conversion_engine.SUPPORTED_FORMATS)
+def test_format_round_trip(tmp_path, source, fmt, engine):
+    middle = tmp_path / f"mid{conversion_engine.format_ext(fmt)}"
+    back = tmp_path / "back.csv"
+    result = conversion_engine.convert(source, middle, "CSV", fmt, chunk_rows=CHUNK_ROWS, engine=engine)
+    assert result.rows == len(FRAME)
+    conversion_engine.convert(middle, back, fmt, "CSV", chunk_rows=CHUNK_ROWS, engine=engine)
+    _assert_same(pd.read_csv(back))
+
+
+@pytest.mark.parametrize("fmt", ["CSV", "JSON", "JSONL"])
+@pytest.mark.parametrize("codec", TEXT_CODECS)
+def test_text_codec_round_trip(tmp_path, source, fmt, codec):
+    if codec not in conversion_engine.compression_codecs(fmt):
+        pytest.skip(f"{codec} 不可用")
+    output = tmp_path / f"out{conversion_engine.format_ext(fmt)}{conversion_engine.COMPRESSION_EXT[codec]}"
+    conversion_engine.convert(source, output, "CSV", fmt, chunk_rows=CHUNK_ROWS, compression=codec)
+    _assert_same(_read_text(_decompress(output, codec), fmt))
+
+
+@pytest.mark.parametrize("codec", PARQUET_CODECS + (COMPRESSION_NONE,))
+def test_parquet_codec_round_trip(tmp_path, source, codec):
+    pq = pytest.importorskip("pyarrow.parquet")
+    if codec not in conversion_engine.compression_codecs("Parquet"):
+        pytest.skip(f"{codec} 不可用")
+    output = tmp_path / "out.parquet"
+    conversion_engine.convert(source, output, "CSV", "Parquet", chunk_rows=CHUNK_ROWS, compression=codec)
+    expected = "UNCOMPRESSED" if codec == COMPRESSION_NONE else codec.upper()
+    assert pq.ParquetFile(output).metadata.row_group(0).column(0).compression == expected
+    _assert_same(pd.read_parquet(output))
+
+
+def _write_drift(path, rows: int):
+    """整数列 k 和 x 在第 rows 行之后分别出现文本和小数。"""
+    lines = ["k,v,x"] + [f"{i},v{i},{i}" for i in range(rows)] + ["A17,y,1.5"]
+    path.write_text("\n".join(lines) + "\n")
+
+
+def test_parquet_widens_types_after_first_chunk(tmp_path):
+    source, output = tmp_path / "drift.csv", tmp_path / "out.parquet"
+    _write_drift(source, 20)
+    result = conversion_engine.convert(source, output, "CSV", "Parquet", chunk_rows=CHUNK_ROWS,
+                                       engine=ENGINE_PANDAS)
+    assert result.rows == 21
+    # 与一次读入整个文件的结果相同：k 为文本，x 为浮点数
+    expected = pd.read_csv(source)
+    table = pd.read_parquet(output)
+    assert table["k"].tolist() == expected["k"].astype(str).tolist()
+    assert table["x"].tolist() == expected["x"].tolist()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["drift.csv", "out.parquet"]
+
+
+def test_engines_write_identical_csv(tmp_path):
+    source = tmp_path / "in.csv"
+    source.write_text('id,flag,price,name,note\n1,True,0.5,"a,b",\n2,False,1.0,q"x,x\n'
+                      '3,,1e-05,,"line\nbreak"\n4,True,,中文,y\n5,False,2.25,z,\n', encoding="utf-8")
+    outputs = {}
+    for engine in (ENGINE_PANDAS, ENGINE_ARROW):
+        output = tmp_path / f"{engine}.csv"
+        assert conversion_engine.convert(source, output, "CSV", "CSV", engine=engine).engine == engine
+        outputs[engine] = output.read_bytes()
+    assert outputs[ENGINE_ARROW] == outputs[ENGINE_PANDAS]
+
+
+@pytest.mark.parametrize("fmt", ["CSV", "Parquet"])
+def test_arrow_type_drift_falls_back_to_pandas(tmp_path, monkeypatch, fmt):
+    # Arrow 按第一个块推断列类型；让文本出现在第一个块之后
+    monkeypatch.setattr(conversion_engine, "ARROW_BLOCK_SIZE", 4096)
+    source = tmp_path / "drift.csv"
+    _write_drift(source, 2000)
+    output, expected = tmp_path / f"arrow{conversion_engine.format_ext(fmt)}", tmp_path / f"pandas{fmt}"
+    result = conversion_engine.convert(source, output, "CSV", fmt, chunk_rows=500, engine=ENGINE_AUTO)
+    assert (result.engine, result.rows) == (ENGINE_PANDAS, 2001)
+    conversion_engine.convert(source, expected, "CSV", fmt, chunk_rows=500, engine=ENGINE_PANDAS)
+    if fmt == "CSV":
+        assert output.read_bytes() == expected.read_bytes()
+    else:
+        pd.testing.assert_frame_equal(pd.read_parquet(output), pd.read_parquet(expected))
+
+
+def _batch_inputs(tmp_path, count: int) -> list:
+    folder = tmp_path / "batch"
+    folder.mkdir()
+    for i in range(count):
+        FRAME.to_csv(folder / f"in{i}.csv", index=False)
+    return conversion_engine.plan_batch(str(folder), "CSV", "JSONL")
+
+
+def test_cancelled_batch_reports_every_item(tmp_path):
+    items = _batch_inputs(tmp_path, 8)
+    progress = conversion_engine.ConversionProgress()
+    progress.cancel()
+    final = {}
+    summary = conversion_engine.run_batch(items, "CSV", "JSONL", workers=1, progress=progress,
+                                          on_update=lambda index, status, detail: final.__setitem__(index, status))
+    # 已交给子进程的文件会完成，其余文件立即以 cancelled 报告
+    assert summary.cancelled > 0
+    assert summary.done + summary.failed + summary.cancelled == len(items)
+    assert sorted(final) == list(range(len(items)))
+    assert conversion_engine.BATCH_PENDING not in final.values()
+    for index, status in final.items():
+        exists = os.path.exists(items[index].output_path)
+        assert exists == (status == conversion_engine.BATCH_DONE)
+
+
+def test_plan_batch_skips_its_own_outputs(tmp_path):
+    for name in ("a.csv", "b.csv", "a_converted.csv", "notes.txt"):
+        (tmp_path / name).write_text("x\n1\n")
+    items = conversion_engine.plan_batch(str(tmp_path), "CSV", "CSV")
+    assert [os.path.basename(item.input_path) for item in items] == ["a.csv", "b.csv"]
+    assert items[0].output_path == str(tmp_path / "a_converted.csv")
+    items = conversion_engine.plan_batch(str(tmp_path / "*.csv"), "CSV", "JSON", output_dir=str(tmp_path / "out"))
+    assert [item.output_path for item in items][:1] == [str(tmp_path / "out" / "a.json")]
+
+
+def test_batch_converts_skips_and_reports_failures(tmp_path):
+    items = _batch_inputs(tmp_path, 3)
+    # 输出目录无法创建（其父路径是一个文件）
+    items[1] = items[1]._replace(output_path=os.path.join(items[0].input_path, "x.jsonl"))
+    statuses = {}
+    summary = conversion_engine.run_batch(items, "CSV", "JSONL", workers=2,
+                                          on_update=lambda index, status, detail: statuses.__setitem__(index, status))
+    assert (summary.done, summary.skipped, summary.failed, summary.rows) == (2, 0, 1, 2 * len(FRAME))
+    assert statuses == {0: conversion_engine.BATCH_DONE, 1: conversion_engine.BATCH_FAILED,
+                        2: conversion_engine.BATCH_DONE}
+    assert not os.path.exists(items[1].output_path)
+    _assert_same(pd.read_json(items[0].output_path, lines=True))
+
+    summary = conversion_engine.run_batch(items, "CSV", "JSONL", workers=2)
+    assert (summary.done, summary.skipped, summary.failed) == (0, 2, 1)
+    assert conversion_engine.is_up_to_date(items[0].input_path, items[0].output_path)
+    assert not conversion_engine.is_up_to_date(items[1].input_path, items[1].output_path)
+
+
+class _CancelAfterFirstChunk(conversion_engine.ConversionProgress):
+    def update(self, rows, bytes_read):
+        super().update(rows, bytes_read)
+        self.cancel()
+
+
+@pytest.mark.parametrize("engine", [ENGINE_PANDAS, ENGINE_ARROW])
+@pytest.mark.parametrize("fmt", ["CSV", "Parquet"])
+def test_cancel_removes_partial_output(tmp_path, source, monkeypatch, fmt, engine):
+    # Arrow 每个读取块产出一个批次；缩小块大小使小文件也被分成多个批次
+    monkeypatch.setattr(conversion_engine, "ARROW_BLOCK_SIZE", 64)
+    output = tmp_path / f"out{conversion_engine.format_ext(fmt)}"
+    progress = _CancelAfterFirstChunk()
+    with pytest.raises(conversion_engine.ConversionCancelled):
+        conversion_engine.convert(source, output, "CSV", fmt, chunk_rows=CHUNK_ROWS, engine=engine, progress=progress)
+    assert 0 < progress.snapshot().rows < len(FRAME)
+    assert not output.exists()
+
+
+def test_progress_reaches_the_input_size(tmp_path, source):
+    progress = conversion_engine.ConversionProgress()
+    conversion_engine.convert(source, tmp_path / "out.json", "CSV", "JSON", chunk_rows=CHUNK_ROWS, progress=progress)
+    snapshot = progress.snapshot()
+    assert (snapshot.rows, snapshot.bytes_read, snapshot.bytes_total) == (len(FRAME),) + (os.path.getsize(source),) * 2
+    assert not progress.cancelled
+
+
+def test_failed_conversion_removes_partial_output(tmp_path):
+    source, output = tmp_path / "in.json", tmp_path / "out.csv"
+    source.write_text('[{"a": 1}, {"a": 2}, {"a": 3}, {"a": 4} oops]')
+    with pytest.raises(ValueError):
+        conversion_engine.convert(source, output, "JSON", "CSV", chunk_rows=2)
+    assert not output.exists()
+
+
+@pytest.mark.parametrize("text, encoding, expected", [
+    ("a,b\n1,中文\n", "utf-8", "utf-8"),
+    ("a,b\n1,中文\n", "utf-8-sig", "utf-8-sig"),
+    ("a,b\n1,中文\n", "gbk", "gbk"),
+    ("a,b\n1,中文𠀀\n", "gb18030", "gb18030"),
+    ("a,b\n1,x\n", "ascii", "utf-8"),
+])
+def test_detect_encoding(tmp_path, text, encoding, expected):
+    path = tmp_path / "in.csv"
+    path.write_bytes(text.encode(encoding))
+    assert conversion_engine.detect_encoding(str(path)) == expected
+
+
+def test_detect_encoding_samples_head_middle_and_tail(tmp_path, monkeypatch):
+    monkeypatch.setattr(conversion_engine, "ENCODING_SAMPLE_BYTES", 64)
+    path = tmp_path / "in.csv"
+    # 中部和尾部的样本从多字节字符中间开始
+    path.write_bytes(("a,b\n" + "1,中文字符\n" * 100).encode("utf-8"))
+    assert conversion_engine.detect_encoding(str(path)) == "utf-8"
+    # 只有尾部出现 GBK 文本：头部是纯 ASCII
+    path.write_bytes(b"a,b\n" + b"1,x\n" * 200 + "2,中文\n".encode("gbk"))
+    assert conversion_engine.detect_encoding(str(path)) == "gbk"
+    result = conversion_engine.convert(path, tmp_path / "out.csv", "CSV", "CSV", chunk_rows=50)
+    assert result.encoding == "gbk"
+    assert pd.read_csv(tmp_path / "out.csv")["b"].iloc[-1] == "中文"
+
+
+def test_infer_dtype_plan():
+    df = pd.DataFrame({
+        "small": [0, 200, 7, 7],
+        "signed": [-5, 100, 0, 1],
+        "big": [0, 2**40, 1, 1],
+        "half": [0.5, 1.25, float("nan"), 2.0],
+        "tenth": [0.1, 0.2, 0.3, 0.4],
+        "label": ["a", "b", "a", "a"],
+        "unique": ["w", "x", "y", "z"],
+        "when": ["2024-01-31", "2024-02-01 10:00:00", None, "2024-03-01"],
+        "flag": [True, False, True, True],
+    })
+    assert conversion_engine.infer_dtype_plan(df) == {
+        "small": "uint8", "signed": "int8", "big": "uint64", "half": "float32",
+        "label": "category", "when": "datetime"}
+
+
+def test_apply_dtype_plan_widens_and_drops():
+    plan = {"n": "uint8", "f": "float32", "when": "datetime", "label": "category"}
+    first = conversion_engine.apply_dtype_plan(
+        pd.DataFrame({"n": [1, 2], "f": [0.5, 1.5], "when": ["2024-01-01", "2024-01-02"], "label": ["a", "a"]}),
+        plan)
+    assert [str(t) for t in first.dtypes] == ["uint8", "float32", "datetime64[us]", "category"]
+    second = conversion_engine.apply_dtype_plan(
+        pd.DataFrame({"n": [-1, 300], "f": [0.1, 1.0], "when": ["2024-01-03", "later"], "label": ["b", "b"]}),
+        plan)
+    # 超出范围的整数放宽类型；不能无损转换的浮点数和日期时间从计划中移除
+    assert plan == {"n": "int16", "label": "category"}
+    assert second["n"].tolist() == [-1, 300]
+    assert second["f"].dtype == "float64"
+    assert second["when"].tolist() == ["2024-01-03", "later"]
+
+
+@pytest.mark.parametrize("engine", [ENGINE_PANDAS, ENGINE_ARROW])
+def test_optimized_conversion_keeps_values(tmp_path, engine):
+    source, output = tmp_path / "in.csv", tmp_path / "out.parquet"
+    frame = pd.DataFrame({"n": range(1000), "f": [i / 4 for i in range(1000)],
+                          "label": ["x", "y"] * 500, "when": ["2024-01-01"] * 1000})
+    frame.to_csv(source, index=False)
+    result = conversion_engine.convert(source, output, "CSV", "Parquet", chunk_rows=300, engine=engine,
+                                       optimize_dtypes=True)
+    before, after = result.memory
+    assert after < before
+    back = pd.read_parquet(output)
+    # Parquet 中数值列放宽为 64 位（后续块可能超出第一块推断的范围），分类和日期时间保持
+    assert isinstance(back["label"].dtype, pd.CategoricalDtype)
+    assert back["n"].tolist() == frame["n"].tolist()
+    assert back["f"].tolist() == frame["f"].tolist()
+    assert back["label"].astype(str).tolist() == frame["label"].tolist()
+    # Arrow 读取时已把日期解析为 date32
+    assert (pd.to_datetime(back["when"]) == pd.Timestamp("2024-01-01")).all()
+
+
+@pytest.mark.parametrize("fmt, total, estimated", [
+    ("CSV", 7, True), ("JSONL", 7, True), ("JSON", None, False), ("Parquet", 7, False),
+])
+def test_preview_reads_only_the_head(tmp_path, source, fmt, total, estimated):
+    path = tmp_path / f"in{conversion_engine.format_ext(fmt)}"
+    if fmt != "CSV":
+        conversion_engine.convert(source, path, "CSV", fmt, chunk_rows=CHUNK_ROWS)
+    else:
+        path = source
+    result = conversion_engine.preview(str(path), fmt, rows=3)
+    assert result.columns == ["id", "price", "name"]
+    assert result.rows == [("1", "0.5", "a"), ("2", "1.25", "中文"), ("3", "-3.0", "x,y")]
+    assert (result.total_rows, result.estimated) == (total, estimated)
+    assert result.encoding == ("utf-8" if fmt == "CSV" else None)
+    # 行数少于请求的行数时总行数是准确的
+    assert conversion_engine.preview(str(path), fmt, rows=100).total_rows == len(FRAME)
+
+
+@pytest.mark.parametrize("block", [1, 7, 4096])
+def test_json_array_is_parsed_incrementally(tmp_path, monkeypatch, block):
+    monkeypatch.setattr(conversion_engine, "JSON_READ_BLOCK", block)
+    records = [{"id": i, "text": "}, {" * (i % 3) + "中文", "nested": {"list": [i, {"k": "]"}]}}
+               for i in range(10)]
+    path = tmp_path / "in.json"
+    path.write_text("﻿ \n[\n" + ",\n".join(json.dumps(r, ensure_ascii=False) for r in records) + "\n]\n",
+                    encoding="utf-8")
+    chunks = list(conversion_engine.iter_chunks(str(path), "JSON", chunk_rows=4))
+    assert [len(c) for c in chunks] == [4, 4, 2]
+    assert pd.concat(chunks, ignore_index=True).to_dict("records") == records
+
+
+def test_json_lines_input_and_output(tmp_path, source):
+    output = tmp_path / "out.jsonl"
+    conversion_engine.convert(source, output, "CSV", "JSONL", chunk_rows=CHUNK_ROWS, engine=ENGINE_PANDAS)
+    lines = output.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == len(FRAME)
+    assert json.loads(lines[1]) == {"id": 2, "price": 1.25, "name": "中文"}
+    # .json 文件中的 JSON Lines 也能识别
+    as_json = tmp_path / "lines.json"
+    as_json.write_bytes(output.read_bytes())
+    _assert_same(pd.concat(conversion_engine.iter_chunks(str(as_json), "JSON", chunk_rows=CHUNK_ROWS)))
+
+
+@pytest.mark.parametrize("streaming", [False, True], ids=["calamine", "openpyxl"])
+def test_excel_round_trip_across_sheets(tmp_path, monkeypatch, streaming):
+    pytest.importorskip("openpyxl")
+    workbook = tmp_path / "out.xlsx"
+    writer = conversion_engine._ExcelWriter(str(workbook), max_rows=4)
+    for start in range(0, len(FRAME), CHUNK_ROWS):
+        writer.write(FRAME.iloc[start:start + CHUNK_ROWS])
+    writer.close()
+    # 每个工作表包含表头和最多 3 行数据
+    sheets = conversion_engine.list_excel_sheets(str(workbook))
+    assert len(sheets) == 3
+    if streaming:
+        monkeypatch.setattr(conversion_engine, "EXCEL_IN_MEMORY_LIMIT", 0)
+    frames = [pd.concat(conversion_engine.iter_chunks(str(workbook), "Excel", chunk_rows=2, sheet=sheet))
+              for sheet in sheets]
+    _assert_same(pd.concat(frames))
+    assert conversion_engine.preview(str(workbook), "Excel", rows=2, sheet=sheets[1]).rows == [
+        ("4", "4.75", "quote\"d"), ("5", "10.0", "é")]
+
+
+def test_parse_columns_and_row_filter():
+    assert conversion_engine.parse_columns(" a, `b c` ,, ") == ["a", "`b c`"]
+    assert conversion_engine.parse_columns("  ") is None
+    assert conversion_engine.parse_row_filter("") == []
+    assert conversion_engine.parse_row_filter(
+        "price >= 1 and `full name` in ('a', 'b') and flag != True and id not in [1]") == [
+        ("price", ">=", 1), ("full name", "in", ["a", "b"]), ("flag", "!=", True), ("id", "not in", [1])]
+    for bad in ("price >", "price > 1 or id < 2", "1 < price", "price > other", "0 < price < 2", "id in 3"):
+        with pytest.raises(ValueError):
+            conversion_engine.parse_row_filter(bad)
+
+
+@pytest.mark.parametrize("engine", [ENGINE_PANDAS, ENGINE_ARROW])
+@pytest.mark.parametrize("fmt", ["CSV", "JSONL", "Parquet", "Excel"])
+def test_projection_and_filter_pushdown(tmp_path, source, fmt, engine):
+    path = tmp_path / f"in{conversion_engine.format_ext(fmt)}"
+    if fmt == "CSV":
+        path = source
+    else:
+        conversion_engine.convert(source, path, "CSV", fmt, chunk_rows=CHUNK_ROWS)
+    output = tmp_path / "out.csv"
+    result = conversion_engine.convert(path, output, fmt, "CSV", chunk_rows=CHUNK_ROWS, engine=engine,
+                                       columns=["name", "id"], row_filter="price > 0.5 and id not in (5,)")
+    expected = FRAME[(FRAME.price > 0.5) & (FRAME.id != 5)][["name", "id"]]
+    assert result.rows == len(expected)
+    pd.testing.assert_frame_equal(pd.read_csv(output), expected.reset_index(drop=True))
+
+    # 没有任何行满足条件时仍写出表头
+    conversion_engine.convert(path, output, fmt, "CSV", engine=engine, columns=["id"], row_filter="id > 100")
+    assert output.read_text().strip() == "id"
+    with pytest.raises(ValueError, match="missing"):
+        conversion_engine.convert(path, output, fmt, "CSV", engine=engine, columns=["missing"])
+
@@ -0,0 +1,90 @@
+# test_file_cache.py
+
+import os
+
+import pytest
+
+import file_cache
+
+
+def _names(entries):
+    return [m.name for m in entries]
+
+
+def _touch_later(path):
+    """新建文件后把目录 mtime 往后推，避免与缓存时的 mtime 落在同一时间粒度内。"""
+    path.write_text("x")
+    st = os.stat(path.parent)
+    os.utime(path.parent, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+def test_watched_listings_are_trusted_only_where_covered(tmp_path):
+    covered, uncovered = tmp_path / "covered", tmp_path / "uncovered"
+    covered.mkdir()
+    uncovered.mkdir()
+    cache = file_cache.MetadataCache()
+    cache.set_watched_root(tmp_path, covers=lambda d: d != str(uncovered))
+    assert _names(cache.list_dir(covered)) == _names(cache.list_dir(uncovered)) == []
+
+    _touch_later(covered / "new.txt")
+    _touch_later(uncovered / "new.txt")
+    # 被监视的目录等待监视器事件失效；监视器未覆盖的目录按 mtime 重新列出
+    assert _names(cache.list_dir(covered)) == []
+    assert _names(cache.list_dir(uncovered)) == ["new.txt"]
+
+    cache.apply_events([file_cache.fs_watcher.FsEvent(file_cache.fs_watcher.ADDED, str(covered / "new.txt"), False)])
+    assert _names(cache.list_dir(covered)) == ["new.txt"]
+
+
+def test_unwatched_root_revalidates_by_mtime(tmp_path):
+    cache = file_cache.MetadataCache()
+    assert cache.list_dir(tmp_path) == []
+    _touch_later(tmp_path / "a.txt")
+    assert _names(cache.list_dir(tmp_path)) == ["a.txt"]
+    hits = cache.hits
+    assert _names(cache.list_dir(tmp_path)) == ["a.txt"]
+    assert cache.hits == hits + 1
+
+
+@pytest.mark.parametrize("head, expected", [
+    (b"\xef\xbb\xbfabc", ("utf-8-sig", False)),
+    ("abc".encode("utf-16"), ("utf-16", False)),
+    ("中文".encode("utf-8"), ("utf-8", False)),
+    ("中文".encode("utf-8")[:-1], ("utf-8", False)),  # 头部在多字节字符中间截断
+    ("中文".encode("gbk"), ("gbk", False)),
+    (b"\x81", ("gbk", False)),
+    (b"a\xffz", ("latin-1", False)),
+    (b"ELF\0\x01", (None, True)),
+    (b"", ("utf-8", False)),
+])
+def test_detect_content(head, expected):
+    assert tuple(file_cache.detect_content(head)) == expected
+
+
+def test_content_info_is_cached_until_the_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / "a.txt"
+    path.write_text("中文", encoding="gbk")
+    cache = file_cache.MetadataCache()
+    sniffed = []
+    monkeypatch.setattr(file_cache, "detect_content",
+                        lambda head: sniffed.append(head) or file_cache.ContentInfo("gbk", False))
+    meta = cache.get(path)
+    assert cache.content_info(meta).encoding == "gbk"
+    assert cache.content_info(meta).encoding == "gbk"
+    assert len(sniffed) == 1
+
+    path.write_bytes(b"\0\0\0\0\0")
+    cache.invalidate(path)
+    cache.content_info(cache.get(path))
+    assert sniffed[-1] == b"\0" * 5
+    assert cache.get(tmp_path / "missing") is None
+
+
+def test_watched_root_waits_for_events(tmp_path):
+    cache = file_cache.MetadataCache()
+    cache.set_watched_root(str(tmp_path))
+    assert cache.list_dir(tmp_path / ".") == []
+    _touch_later(tmp_path / "a.txt")
+    assert cache.list_dir(tmp_path) == []
+    cache.apply_events([file_cache.fs_watcher.FsEvent(file_cache.fs_watcher.RESCAN, str(tmp_path), True)])
+    assert _names(cache.list_dir(tmp_path)) == ["a.txt"]
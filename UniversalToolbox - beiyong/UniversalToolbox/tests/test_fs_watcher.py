@@ -0,0 +1,119 @@
+# test_fs_watcher.py
+
+import os
+import sys
+import time
+import errno
+import ctypes
+
+import pytest
+
+import fs_watcher
+
+
+def _wait_for(predicate, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture(params=[False, True], ids=["polling", "inotify"])
+def use_inotify(request):
+    if request.param and not sys.platform.startswith("linux"):
+        pytest.skip("inotify 仅在 Linux 上可用")
+    return request.param
+
+
+def test_reports_added_modified_and_removed(tmp_path, use_inotify):
+    events = []
+    watcher = fs_watcher.WorkspaceWatcher(tmp_path, events.extend, interval=0.05, use_inotify=use_inotify)
+    watcher.start()
+    try:
+        assert _wait_for(lambda: watcher.backend_name)
+        assert watcher.backend_name == ("inotify" if use_inotify else "polling")
+
+        def seen(kind, path):
+            return _wait_for(lambda: (kind, str(path)) in {(e.kind, e.path) for e in events})
+
+        (tmp_path / "a.txt").write_text("x")
+        (tmp_path / ".hidden").write_text("x")
+        assert seen(fs_watcher.ADDED, tmp_path / "a.txt")
+        (tmp_path / "a.txt").write_text("longer")
+        assert seen(fs_watcher.MODIFIED, tmp_path / "a.txt")
+        (tmp_path / "sub").mkdir()
+        assert seen(fs_watcher.ADDED, tmp_path / "sub")
+        # 新目录会被自动加入监视
+        (tmp_path / "sub" / "b.txt").write_text("x")
+        assert seen(fs_watcher.ADDED, tmp_path / "sub" / "b.txt")
+        (tmp_path / "a.txt").unlink()
+        assert seen(fs_watcher.REMOVED, tmp_path / "a.txt")
+    finally:
+        watcher.stop()
+    assert all(not e.path.endswith(".hidden") for e in events)
+    assert [e.is_dir for e in events if e.path == str(tmp_path / "sub")] == [True]
+
+
+def test_stop_joins_the_thread(tmp_path):
+    batches = []
+    watcher = fs_watcher.WorkspaceWatcher(tmp_path, batches.append, interval=0.05, use_inotify=False)
+    watcher.start()
+    assert _wait_for(lambda: watcher.backend_name)
+    assert watcher.stop(timeout=5)
+    assert not watcher.is_running()
+    (tmp_path / "late.txt").write_text("x")
+    time.sleep(0.2)
+    assert batches == []
+
+
+def test_polling_is_limited_to_poll_max_depth(tmp_path):
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    watcher = fs_watcher.WorkspaceWatcher(tmp_path, lambda events: None, interval=0.05, use_inotify=False,
+                                          poll_max_depth=2)
+    assert not watcher.covers(str(tmp_path))
+    watcher.start()
+    try:
+        assert _wait_for(lambda: watcher.covers(str(tmp_path)))
+        assert watcher.covers(str(tmp_path / "a"))
+        assert not watcher.covers(str(tmp_path / "a" / "b"))
+    finally:
+        watcher.stop(timeout=5)
+    assert not watcher.covers(str(tmp_path))
+
+
+class _LimitedLibc:
+    """把 inotify_add_watch 对指定目录的调用变为 ENOSPC 失败的 libc 包装。"""
+
+    def __init__(self, libc, blocked):
+        self._libc = libc
+        self._blocked = os.fsencode(blocked)
+
+    def inotify_add_watch(self, fd, path, mask):
+        if path == self._blocked:
+            ctypes.set_errno(errno.ENOSPC)
+            return -1
+        return self._libc.inotify_add_watch(fd, path, mask)
+
+    def __getattr__(self, name):
+        return getattr(self._libc, name)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify 仅在 Linux 上可用")
+def test_inotify_reports_directories_it_could_not_watch(tmp_path, monkeypatch):
+    blocked = tmp_path / "blocked"
+    (blocked / "deeper").mkdir(parents=True)
+    (tmp_path / "fine").mkdir()
+    cdll = ctypes.CDLL
+    monkeypatch.setattr(ctypes, "CDLL", lambda *args, **kwargs: _LimitedLibc(cdll(*args, **kwargs), blocked))
+    watcher = fs_watcher.WorkspaceWatcher(tmp_path, lambda events: None)
+    watcher.start()
+    try:
+        assert _wait_for(lambda: watcher.backend_name)
+        assert watcher.backend_name == "inotify"
+        assert watcher.covers(str(tmp_path)) and watcher.covers(str(tmp_path / "fine"))
+        assert not watcher.covers(str(blocked))
+        assert not watcher.covers(str(blocked / "deeper"))
+    finally:
+        watcher.stop(timeout=5)
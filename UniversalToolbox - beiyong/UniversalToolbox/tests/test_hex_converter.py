@@ -0,0 +1,145 @@
+# test_hex_converter.py
+
+import io
+import os
+import random
+import struct
+import threading
+
+import pytest
+
+from plugins import hex_converter
+from plugins.hex_converter import FileConversionCancelled, _bin_file_to_hex, _hex_file_to_bin
+
+DATA = random.Random(0).randbytes(1000)
+BLOCK_SIZES = [1, 3, 7, 16, 4096]
+
+
+def _to_bin(text: bytes, block_size: int) -> bytes:
+    dst = io.BytesIO()
+    read, written = _hex_file_to_bin(io.BytesIO(text), dst, block_size=block_size)
+    assert (read, written) == (len(text), len(dst.getvalue()))
+    return dst.getvalue()
+
+
+def _to_hex(data: bytes, block_size: int, byte_interval=None, line_bytes=0) -> bytes:
+    dst = io.BytesIO()
+    read, written = _bin_file_to_hex(io.BytesIO(data), dst, byte_interval, line_bytes, block_size=block_size)
+    assert (read, written) == (len(data), len(dst.getvalue()))
+    return dst.getvalue()
+
+
+def _expected_hex(data: bytes, byte_interval=None, line_bytes=0) -> bytes:
+    """整个缓冲区一次转换的结果（逐行分组，不经过分块）。"""
+    if not line_bytes:
+        return hex_converter._hexlify(data, byte_interval)
+    lines = [hex_converter._hexlify(data[i:i + line_bytes], byte_interval) for i in range(0, len(data), line_bytes)]
+    return b"\n".join(lines) + b"\n"
+
+
+@pytest.mark.parametrize("block_size", BLOCK_SIZES)
+def test_hex_to_bin_across_blocks(block_size):
+    assert _to_bin(DATA.hex().encode(), block_size) == DATA
+    # 空白把数字对拆开，奇数位数字跨越块边界
+    spaced = " \n".join(DATA.hex()[i:i + 5] for i in range(0, len(DATA) * 2, 5)).encode()
+    assert _to_bin(b"\t" + spaced + b"\r\n", block_size) == DATA
+
+
+@pytest.mark.parametrize("block_size", BLOCK_SIZES)
+def test_hex_to_bin_errors(block_size):
+    with pytest.raises(ValueError, match="odd number"):
+        _to_bin(b"0A 1", block_size)
+    with pytest.raises(ValueError, match=r"offset 6 \(b'G'\)"):
+        _to_bin(b"0a 1b G2", block_size)
+    # 末尾单独的非法字符不能被当作奇数位数字
+    with pytest.raises(ValueError, match=r"offset 3 \(b'G'\)"):
+        _to_bin(b"0a G", block_size)
+
+
+@pytest.mark.parametrize("block_size", BLOCK_SIZES)
+@pytest.mark.parametrize("byte_interval, line_bytes", [
+    (None, 0), (1, 0), (4, 0), (None, 16), (4, 16), (3, 16), (8, 5),
+])
+def test_bin_to_hex_layout_matches_whole_buffer(block_size, byte_interval, line_bytes):
+    for data in (DATA, DATA[:1], DATA[:17]):
+        text = _to_hex(data, block_size, byte_interval, line_bytes)
+        assert text == _expected_hex(data, byte_interval, line_bytes)
+        assert _to_bin(text, block_size) == data
+
+
+def test_convert_file_round_trip(tmp_path):
+    src, hex_path, back = tmp_path / "in.bin", tmp_path / "out.hex", tmp_path / "back.bin"
+    src.write_bytes(DATA)
+    progress = []
+    read, written, _ = hex_converter.convert_file("bin->hex", src, hex_path, 4, 16, on_progress=progress.append)
+    assert (read, written) == (len(DATA), os.path.getsize(hex_path))
+    assert progress[-1] == len(DATA)
+    hex_converter.convert_file("hex->bin", hex_path, back)
+    assert back.read_bytes() == DATA
+
+
+def test_convert_file_removes_partial_output(tmp_path):
+    src, dst = tmp_path / "in.hex", tmp_path / "out.bin"
+    src.write_bytes(b"0A 1")
+    with pytest.raises(ValueError):
+        hex_converter.convert_file("hex->bin", src, dst)
+    assert not dst.exists()
+
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(FileConversionCancelled):
+        hex_converter.convert_file("bin->hex", src, dst, cancel=cancel)
+    assert not dst.exists()
+    with pytest.raises(ValueError):
+        hex_converter.convert_file("bin->hex", src, src)
+
+
+@pytest.fixture(params=["numpy", "struct"])
+def decoder(request, monkeypatch):
+    if request.param == "struct":
+        monkeypatch.setattr(hex_converter, "np", None)
+    elif hex_converter.np is None:
+        pytest.skip("numpy 不可用")
+    return hex_converter.decode_typed
+
+
+def _same_values(values, expected):
+    # NaN 与自身不相等，按位置比较时视为相同
+    return len(values) == len(expected) and all(
+        a == b or (a != a and b != b) for a, b in zip(values, expected))
+
+
+@pytest.mark.parametrize("type_name", list(hex_converter.TYPED_CODES))
+@pytest.mark.parametrize("endian", hex_converter.ENDIANNESS)
+def test_decode_typed_matches_struct(decoder, type_name, endian):
+    order = "<" if endian == "little" else ">"
+    code = hex_converter.TYPED_CODES[type_name]
+    size = struct.calcsize(code)
+    payload = DATA[:10 * size + size // 2]  # 末尾不足一个元素的字节被忽略
+    values, itemsize, stride = decoder(payload, type_name, endian)
+    expected = [v for (v,) in struct.iter_unpack(order + code, payload[:10 * size])]
+    assert (itemsize, stride) == (size, size)
+    assert _same_values(list(values), expected)
+
+
+def test_decode_typed_stride_and_offset(decoder):
+    # 结构体数组 {uint8 tag; int16 value; uint8 pad}，只取 value 字段
+    records = b"".join(struct.pack("<BhB", i, -i * 100, 0) for i in range(5))
+    values, itemsize, stride = decoder(records[:-1], "int16", "little", stride=4, offset=1)
+    assert list(values) == [0, -100, -200, -300, -400]
+    assert (itemsize, stride) == (2, 4)
+    assert list(decoder(b"\x01", "int16")[0]) == []
+    assert list(decoder(records, "uint8", offset=len(records))[0]) == []
+    with pytest.raises(ValueError):
+        decoder(records, "int32", stride=2)
+    with pytest.raises(ValueError):
+        decoder(records, "int8", offset=len(records) + 1)
+
+
+def test_typed_summary():
+    if hex_converter.np is None:
+        pytest.skip("numpy 不可用")
+    values, _, _ = hex_converter.decode_typed(struct.pack("<4f", 1.0, float("nan"), 3.0, float("inf")), "float32")
+    assert hex_converter._typed_summary(values, "float32") == "Count: 4 | Finite: 2 | Min: 1.0 | Max: 3.0 | Mean: 2"
+    values, _, _ = hex_converter.decode_typed(bytes([255, 1]), "int8")
+    assert hex_converter._typed_summary(values, "int8") == "Count: 2 | Min: -1 | Max: 1 | Mean: 0"
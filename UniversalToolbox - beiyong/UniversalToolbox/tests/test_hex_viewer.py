@@ -0,0 +1,50 @@
+# test_hex_viewer.py
+
+import pytest
+
+pytest.importorskip("ttkbootstrap")
+
+import hex_viewer
+from hex_viewer import HexDocument
+
+
+@pytest.mark.parametrize("text, offset", [
+    ("0x1F", 31), ("1F00h", 0x1F00), ("0o17", 15), ("0b101", 5), (" 4_096 ", 4096), ("0", 0),
+])
+def test_parse_offset(text, offset):
+    assert hex_viewer.parse_offset(text) == offset
+
+
+@pytest.mark.parametrize("text", ["", "  ", "xyz", "12h3", "017"])
+def test_parse_offset_rejects_garbage(text):
+    with pytest.raises(ValueError):
+        hex_viewer.parse_offset(text)
+
+
+def test_document_rows(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"Hello, world!\x00\x01\x02" + bytes(range(0x41, 0x45)))
+    with HexDocument(path) as doc:
+        assert (doc.size, doc.row_count) == (20, 2)
+        assert doc.row(0) == ("00000000", "48 65 6C 6C 6F 2C 20 77  6F 72 6C 64 21 00 01 02", "Hello, world!...")
+        assert doc.row(1) == ("00000010", "41 42 43 44", "ABCD")
+        assert doc.read(18, 100) == b"CD"
+        assert doc.read(100, 4) == b""
+    assert doc.closed
+
+    empty = tmp_path / "empty.bin"
+    empty.write_bytes(b"")
+    with HexDocument(empty) as doc:
+        assert (doc.row_count, doc.read(0, 16)) == (0, b"")
+
+
+def test_bookmarks_persist_per_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(hex_viewer, "BOOKMARKS_FILE", tmp_path / "config" / "bookmarks.json")
+    a, b = tmp_path / "a.bin", tmp_path / "b.bin"
+    assert hex_viewer.load_bookmarks(a) == []
+    hex_viewer.save_bookmarks(a, [(32, "header end"), (0, "start")])
+    hex_viewer.save_bookmarks(b, [(1, "x")])
+    assert hex_viewer.load_bookmarks(a) == [(0, "start"), (32, "header end")]
+    hex_viewer.save_bookmarks(a, [])
+    assert hex_viewer.load_bookmarks(a) == []
+    assert hex_viewer.load_bookmarks(b) == [(1, "x")]
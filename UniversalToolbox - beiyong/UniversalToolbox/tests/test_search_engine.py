@@ -0,0 +1,215 @@
+# test_search_engine.py
+
+import os
+import re
+import time
+
+import pytest
+
+import workspace
+import search_index
+import search_engine
+from search_engine import SearchOptions
+
+
+def _run(root, term, suffixes=(".txt",), index=None, **options):
+    """在 root 下同步执行一次搜索，返回已结束的 SearchJob。"""
+    ws = workspace.Workspace(root, excludes=[], use_gitignore=False)
+    job = search_engine.SearchJob(ws, term, suffixes, index=index, options=SearchOptions(**options))
+    job.start()
+    assert job.finished.wait(30)
+    assert job.error is None
+    return job
+
+
+def _hits(job):
+    """取出全部命中，返回按文件名和行号排序的 (文件名, 行号, 预览) 列表。"""
+    hits = []
+    while not job.hits.empty():
+        hit = job.hits.get()
+        hits.append((os.path.basename(hit["path"]), hit["line"], hit["content"]))
+    return sorted(hits)
+
+
+def _search(root, term, index=None, **options):
+    """返回命中文件名的有序列表（去重）。"""
+    return sorted({name for name, _, _ in _hits(_run(root, term, index=index, **options))})
+
+
+# '丄' 的 GBK 编码为 b"\x81A"，尾字节落在 ASCII 大写字母范围内
+CONTENT = "hello world\n中文 测试\nxx丄yy\n"
+
+
+@pytest.fixture
+def encoded_files(tmp_path):
+    (tmp_path / "plain.txt").write_bytes(CONTENT.encode("utf-8"))
+    (tmp_path / "bom.txt").write_bytes(b"\xef\xbb\xbf" + CONTENT.encode("utf-8"))
+    (tmp_path / "u16.txt").write_bytes(CONTENT.encode("utf-16"))
+    (tmp_path / "gbk.txt").write_bytes(CONTENT.encode("gbk"))
+    (tmp_path / "other.txt").write_bytes(b"nothing to see\n")
+    return tmp_path
+
+
+ALL_MATCHING = ["bom.txt", "gbk.txt", "plain.txt", "u16.txt"]
+
+
+def test_literal_search_across_encodings(encoded_files):
+    assert _search(encoded_files, "world") == ALL_MATCHING
+    assert _search(encoded_files, "中文") == ALL_MATCHING
+
+
+def test_utf8_sig_file_without_index(tmp_path):
+    (tmp_path / "bom.txt").write_bytes(b"\xef\xbb\xbfhello world")
+    assert _search(tmp_path, "world") == ["bom.txt"]
+    assert _search(tmp_path, "world", case_sensitive=True) == ["bom.txt"]
+
+
+@pytest.mark.parametrize("term", ["world", "中文", "hello world", "xx丄yy", "XX丄YY"])
+def test_indexed_search_matches_unindexed(encoded_files, tmp_path_factory, monkeypatch, term):
+    monkeypatch.setattr(search_index, "INDEX_DIR", tmp_path_factory.mktemp("index"))
+    ws = workspace.Workspace(encoded_files, excludes=[], use_gitignore=False)
+    index = search_index.SearchIndex(ws, [".txt"])
+    index.start()
+    try:
+        deadline = time.time() + 30
+        while not index.ready and time.time() < deadline:
+            time.sleep(0.02)
+        assert index.ready
+        assert _search(encoded_files, term, index=index) == _search(encoded_files, term) == ALL_MATCHING
+    finally:
+        index.stop()
+
+
+def test_whole_word_search(encoded_files):
+    assert _search(encoded_files, "world", whole_word=True) == ALL_MATCHING
+    assert _search(encoded_files, "worl", whole_word=True) == []
+    # 非 ASCII 搜索词的整词匹配与普通搜索找到相同的文件
+    assert _search(encoded_files, "中文", whole_word=True) == ALL_MATCHING
+    assert _search(encoded_files, "中", whole_word=True) == []
+
+
+def test_compile_hex_pattern():
+    pattern = search_engine.compile_hex_pattern("62 F1 ?? 6? ?6")
+    assert pattern.fullmatch(b"\x62\xf1\x00\x6a\xf6")
+    assert pattern.fullmatch(b"\x62\xf1\n\x60\x06")
+    assert not pattern.fullmatch(b"\x62\xf1\x00\x7a\xf6")
+    assert search_engine.compile_hex_pattern("62f1").pattern == search_engine.compile_hex_pattern("62 F1").pattern
+
+
+@pytest.mark.parametrize("text", ["", "1", "ag", "+1 ff", "０１", "1_", "-1", "?? ??"])
+def test_compile_hex_pattern_rejects_malformed(text):
+    with pytest.raises(ValueError):
+        search_engine.compile_hex_pattern(text)
+
+
+@pytest.fixture
+def lines_tree(tmp_path):
+    (tmp_path / "a.txt").write_text("one\nFoo bar\nfoo\nfood\n")
+    (tmp_path / "b.txt").write_text("nothing\nfoo\n")
+    (tmp_path / "c.md").write_text("foo\n")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "d.txt").write_text("x = foo(1)\n")
+    return tmp_path
+
+
+def test_streams_first_hit_per_file(lines_tree):
+    job = _run(lines_tree, "FOO")
+    assert _hits(job) == [("a.txt", 2, "Foo bar"), ("b.txt", 2, "foo"), ("d.txt", 1, "x = foo(1)")]
+    assert (job.files_total, job.files_done, job.hit_count) == (3, 3, 3)
+    assert _search(lines_tree, "missing") == []
+
+
+def test_cancel_stops_the_search(tmp_path, monkeypatch):
+    for i in range(50):
+        (tmp_path / f"{i:02}.txt").write_text("needle\n")
+    search_file = search_engine.SearchJob._search_file
+
+    def slow_search_file(self, meta):
+        time.sleep(0.02)
+        search_file(self, meta)
+
+    monkeypatch.setattr(search_engine.SearchJob, "_search_file", slow_search_file)
+    ws = workspace.Workspace(tmp_path, excludes=[], use_gitignore=False)
+    job = search_engine.SearchJob(ws, "needle", [".txt"], max_workers=1)
+    job.start()
+    deadline = time.time() + 10
+    while job.hit_count == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    job.cancel()
+    assert job.finished.wait(10)
+    assert job.cancelled
+    assert job.hit_count < 50
+
+
+def test_match_modes(lines_tree):
+    all_lines = {"all_matches": True}
+    assert [(n, line) for n, line, _ in _hits(_run(lines_tree, "foo", **all_lines))] == [
+        ("a.txt", 2), ("a.txt", 3), ("a.txt", 4), ("b.txt", 2), ("d.txt", 1)]
+    assert [(n, line) for n, line, _ in _hits(_run(lines_tree, "foo", case_sensitive=True, **all_lines))] == [
+        ("a.txt", 3), ("a.txt", 4), ("b.txt", 2), ("d.txt", 1)]
+    assert [(n, line) for n, line, _ in _hits(_run(lines_tree, "foo", whole_word=True, **all_lines))] == [
+        ("a.txt", 2), ("a.txt", 3), ("b.txt", 2), ("d.txt", 1)]
+    assert [(n, line) for n, line, _ in _hits(_run(lines_tree, r"^fo+d?$", regex=True, **all_lines))] == [
+        ("a.txt", 3), ("a.txt", 4), ("b.txt", 2)]
+    with pytest.raises(re.error):
+        SearchOptions(regex=True).compile("(")
+
+
+def test_hit_caps(lines_tree):
+    assert len(_hits(_run(lines_tree, "foo", all_matches=True, max_hits_per_file=2))) == 4
+    job = _run(lines_tree, "foo", all_matches=True, max_hits=2)
+    assert len(_hits(job)) == 2
+    assert job.truncated
+    assert not _run(lines_tree, "foo", max_hits=3).truncated
+
+
+def test_file_filters(lines_tree):
+    assert SearchOptions.parse_file_filter(" *.md, sub/** ,!*.txt, !, ") == (["*.md", "sub/**"], ["*.txt"])
+    # include 替代默认的文件类型过滤
+    assert _search(lines_tree, "foo", include=["*.md", "b.txt"]) == ["b.txt", "c.md"]
+    assert _search(lines_tree, "foo", include=["sub/*"]) == ["d.txt"]
+    assert _search(lines_tree, "foo", exclude=["a.*", "sub/*"]) == ["b.txt"]
+
+
+@pytest.mark.parametrize("threshold", [1, 1 << 30], ids=["mmap", "read"])
+def test_byte_scan_line_numbers_across_windows(tmp_path, monkeypatch, threshold):
+    monkeypatch.setattr(search_engine, "MMAP_THRESHOLD", threshold)
+    monkeypatch.setattr(search_engine, "SCAN_WINDOW", 16)
+    lines = [f"line {i} " + ("needle" if i % 7 == 3 else "hay") for i in range(200)]
+    lines[50] = "x" * 5000 + " needle " + "y" * 5000
+    (tmp_path / "big.txt").write_text("\n".join(lines), encoding="gbk")
+    hits = _hits(_run(tmp_path, "NEEDLE", all_matches=True))
+    expected = [i + 1 for i, line in enumerate(lines) if "needle" in line]
+    assert [line for _, line, _ in hits] == expected
+    long_preview = hits[expected.index(51)][2]
+    assert "needle" in long_preview and len(long_preview) <= search_engine.PREVIEW_CHARS + 2
+
+
+def test_binary_files_are_searched_by_bytes(tmp_path):
+    (tmp_path / "blob.bin").write_bytes(b"\x00\x01" * 40 + b"MAGIC\xff\x00tail")
+    hits = _hits(_run(tmp_path, "magic", suffixes=(".bin",)))
+    assert hits == [("blob.bin", 1, "@0x00000050  " + "." * 16 + "MAGIC..tail")]
+    assert _hits(_run(tmp_path, "magic", suffixes=(".bin",), case_sensitive=True)) == []
+
+
+def test_regex_on_utf16_uses_line_scan(tmp_path):
+    (tmp_path / "u16.txt").write_bytes("alpha\n中文 beta42\n".encode("utf-16"))
+    assert [(line, text) for _, line, text in _hits(_run(tmp_path, r"\w+\d+", regex=True))] == [
+        (2, "中文 beta42")]
+
+
+def test_hex_pattern_search(tmp_path, monkeypatch):
+    monkeypatch.setattr(search_engine, "SCAN_WINDOW", 8)
+    (tmp_path / "a.dat").write_bytes(b"\x00\x01\x4d\x5a\x90\x00\x11\x22")
+    (tmp_path / "b.txt").write_bytes(b"MZ\x00\x00 and MZ\n\x00")
+    (tmp_path / "c.bin").write_bytes(bytes(30) + b"\x4d\x5a\x00")
+    (tmp_path / "d.bin").write_bytes(b"\x4d\x5b\x00\x00")
+    hits = _hits(_run(tmp_path, "4d 5a ?? 00", hex_pattern=True, all_matches=True))
+    assert hits == [
+        ("a.dat", 1, "@0x00000002  00 01 [4D 5A 90 00] 11 22"),
+        ("b.txt", 1, "@0x00000000  [4D 5A 00 00] 20 61 6E 64 20 4D 5A 0A"),
+        ("b.txt", 1, "@0x00000009  5A 00 00 20 61 6E 64 20 [4D 5A 0A 00]"),
+    ]
+    assert _search(tmp_path, "4D 5A 00", hex_pattern=True) == ["b.txt", "c.bin"]
+    with pytest.raises(ValueError):
+        _run(tmp_path, "4D 5", hex_pattern=True)
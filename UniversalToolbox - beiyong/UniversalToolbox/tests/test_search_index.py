@@ -0,0 +1,139 @@
+# test_search_index.py
+
+import os
+import time
+
+import pytest
+
+import file_cache
+import fs_watcher
+import search_index
+import workspace
+
+
+def _naive_trigrams(data: bytes) -> set:
+    grams = set()
+    for token in search_index._TOKEN_RE.findall(data.lower()):
+        grams.update(search_index._gram_value(token[i:i + 3]) for i in range(len(token) - 2))
+    return grams
+
+
+@pytest.mark.parametrize("data", [b"", b"ab", b"abc", b"Hello, World_42!", "中文 测试ab".encode("utf-8"),
+                                  bytes(range(256)) * 3], ids=["empty", "short", "one", "ascii", "utf8", "all"])
+def test_trigrams_of_matches_naive_extraction(data):
+    grams = search_index.trigrams_of(data)
+    expected = _naive_trigrams(data)
+    assert grams >= expected
+    # 多出的只有跨越词元连接处的三元组，它们都含有 0 字节
+    assert all(any((g >> shift) & 0xff == 0 for shift in (8, 16, 24)) for g in grams - expected)
+
+
+def test_query_trigrams():
+    assert search_index.query_trigrams("Hello", "utf-8") == _naive_trigrams(b"hello")
+    # 查询词中不在词元段内的部分不产生三元组
+    assert search_index.query_trigrams("a-b", "utf-8") == set()
+    assert search_index.query_trigrams("中文", "ascii") is None
+
+
+def test_query_trigrams_have_no_bom_bytes():
+    plain = search_index.query_trigrams("hello", "utf-8")
+    assert plain
+    assert search_index.query_trigrams("hello", "utf-8-sig") == plain
+    # utf-16 文件的字节序由 BOM 决定，无法缩小范围
+    assert search_index.query_trigrams("hello", "utf-16") is None
+    # 索引对原始字节做 ASCII 小写，GBK 尾字节也会被转换；查询词的三元组必须一致
+    assert search_index.trigrams_of("xx丄yy".encode("gbk")) >= search_index.query_trigrams("xx丄yy", "gbk")
+
+
+def _wait_until(predicate, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def make_index(tmp_path_factory, monkeypatch):
+    monkeypatch.setattr(search_index, "INDEX_DIR", tmp_path_factory.mktemp("index"))
+    started = []
+
+    def make(root):
+        ws = workspace.Workspace(root, excludes=[], use_gitignore=False)
+        index = search_index.SearchIndex(ws, [".txt"])
+        started.append(index)
+        index.start()
+        assert _wait_until(lambda: index.ready)
+        return index
+
+    yield make
+    for index in started:
+        index.stop()
+
+
+def _candidates(index, term):
+    return sorted(os.path.basename(p) for p in index.candidates(term))
+
+
+def test_candidates_narrow_the_search(tmp_path, make_index):
+    (tmp_path / "a.txt").write_text("alpha beta\n")
+    (tmp_path / "b.txt").write_text("beta gamma\n")
+    (tmp_path / "c.txt").write_text("中文 gamma\n", encoding="gbk")
+    (tmp_path / "d.bin").write_text("alpha\n")
+    (tmp_path / "e.txt").write_bytes(b"alpha\0binary")
+    index = make_index(tmp_path)
+    assert _candidates(index, "ALPHA") == ["a.txt"]
+    assert _candidates(index, "gamma") == ["b.txt", "c.txt"]
+    assert _candidates(index, "中文") == ["c.txt"]
+    assert _candidates(index, "delta") == []
+    # 没有可用三元组的查询词不能缩小范围
+    assert _candidates(index, "ab") == ["a.txt", "b.txt", "c.txt"]
+
+
+def test_tokens_split_across_chunks(tmp_path, make_index, monkeypatch):
+    monkeypatch.setattr(search_index, "CHUNK_SIZE", 7)
+    words = ["tokenizer", "x" * 20 + "end", "abc", "中文字符"]
+    (tmp_path / "a.txt").write_text(" ".join(words) + " tail", encoding="utf-8")
+    index = make_index(tmp_path)
+    for word in words + ["xxxxend", "tail"]:
+        assert _candidates(index, word) == ["a.txt"], word
+
+
+def test_incremental_updates(tmp_path, make_index):
+    path = tmp_path / "log.txt"
+    path.write_text("first line\n")
+    index = make_index(tmp_path)
+
+    def changed(kind, target):
+        events = [fs_watcher.FsEvent(kind, str(target), False)]
+        # 与主程序相同：先让元数据缓存失效，再通知索引
+        file_cache.get_cache().apply_events(events)
+        index.notify(events)
+
+    with open(path, "a") as f:
+        f.write("appended second\n")
+    changed(fs_watcher.MODIFIED, path)
+    assert _wait_until(lambda: _candidates(index, "appended") == ["log.txt"])
+    assert _candidates(index, "first") == ["log.txt"]
+
+    path.write_text("rewritten\n")
+    changed(fs_watcher.MODIFIED, path)
+    assert _wait_until(lambda: _candidates(index, "first") == [])
+
+    path.unlink()
+    changed(fs_watcher.REMOVED, path)
+    assert _wait_until(lambda: _candidates(index, "rewritten") == [])
+
+
+@pytest.mark.parametrize("term", ["world", "中文", "hello world", "xx丄yy", "XX丄YY"])
+def test_candidates_across_encodings(tmp_path, make_index, term):
+    # '丄' 的 GBK 编码为 b"\x81A"，尾字节落在 ASCII 大写字母范围内
+    content = "hello world\n中文 测试\nxx丄yy\n"
+    (tmp_path / "plain.txt").write_bytes(content.encode("utf-8"))
+    (tmp_path / "bom.txt").write_bytes(b"\xef\xbb\xbf" + content.encode("utf-8"))
+    (tmp_path / "u16.txt").write_bytes(content.encode("utf-16"))
+    (tmp_path / "gbk.txt").write_bytes(content.encode("gbk"))
+    (tmp_path / "other.txt").write_bytes(b"nothing to see\n")
+    index = make_index(tmp_path)
+    assert _candidates(index, term) == ["bom.txt", "gbk.txt", "plain.txt", "u16.txt"]
@@ -0,0 +1,41 @@
+# test_search_results.py
+
+import pytest
+
+pytest.importorskip("ttkbootstrap")
+
+from search_results import ResultStore
+
+
+def _rows(store):
+    return [store.row(i) for i in range(store.row_count)]
+
+
+def test_rows_are_grouped_by_file():
+    store = ResultStore()
+    store.extend([{"path": "a", "line": 3, "content": "x"}, {"path": "b", "line": 1, "content": "中文"}])
+    store.add("a", 9, "")
+    assert (store.hit_count, store.file_count) == (3, 2)
+    assert [store.file_hit_count(i) for i in range(2)] == [2, 1]
+    assert _rows(store) == [("file", 0), ("hit", 0), ("hit", 2), ("file", 1), ("hit", 1)]
+    assert [store.hit(i) for i in range(3)] == [("a", 3, "x"), ("b", 1, "中文"), ("a", 9, "")]
+
+
+def test_collapsed_files_take_one_row():
+    store = ResultStore()
+    for i in range(1000):
+        store.add(f"f{i % 10}", i, str(i))
+    assert store.row_count == 1010
+    store.toggle(0)
+    assert store.is_collapsed(0)
+    assert store.row_count == 1010 - 100
+    assert store.row(0) == ("file", 0)
+    assert store.row(1) == ("file", 1)
+    assert store.row(2) == ("hit", 1)
+    # 折叠状态下继续追加的命中同样不显示
+    store.add("f0", 5000, "late")
+    assert store.row_count == 910
+    store.toggle(0)
+    assert store.row_count == 1011
+    assert store.row(101) == ("hit", 1000)
+    assert store.hit(1000) == ("f0", 5000, "late")
@@ -0,0 +1,79 @@
+# test_workspace.py
+
+import pytest
+
+import workspace
+from workspace import ExclusionMatcher
+
+
+@pytest.mark.parametrize("rel_path, is_dir, excluded", [
+    ("app.log", False, True),
+    ("deep/nested/app.log", False, True),
+    ("keep.log", False, False),
+    ("build", True, True),
+    ("build", False, False),  # 'build/' 只匹配目录
+    ("build/out.bin", False, True),
+    ("src/build/out.bin", False, True),
+    ("top.txt", False, True),
+    ("sub/top.txt", False, False),  # 以 '/' 开头的规则锚定到根目录
+    ("docs/a.md", False, True),
+    ("docs/x/y/a.md", False, True),
+    ("docs/a.txt", False, False),
+    ("file?.txt", False, False),
+    ("file1.txt", False, True),
+])
+def test_exclusion_rules(rel_path, is_dir, excluded):
+    matcher = ExclusionMatcher(["# 注释", "", "*.log", "!keep.log", "build/", "/top.txt",
+                                "docs/**/*.md", "file[0-9].txt"])
+    assert matcher.matches(rel_path, is_dir) is excluded
+
+
+def test_later_rules_take_precedence():
+    assert not ExclusionMatcher(["*.log", "!*.log"]).matches("a.log")
+    assert ExclusionMatcher(["!a.log", "*.log"]).matches("a.log")
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for rel in ("a.py", "b.log", "keep.log", "src/c.py", "src/__pycache__/c.pyc",
+                "node_modules/pkg/index.js", ".git/HEAD", "out/d.py"):
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x")
+    (tmp_path / ".gitignore").write_text("*.log\nout/\n")
+    return tmp_path
+
+
+def _walked(ws):
+    seen = []
+    for dir_path, dirs, files in ws.walk():
+        rel = ws.relpath(dir_path)
+        seen.extend(f"{rel}/{f.name}" if rel else f.name for f in files)
+    return sorted(seen)
+
+
+def test_walk_prunes_excluded_directories(tree):
+    ws = workspace.Workspace(tree)
+    assert _walked(ws) == ["a.py", "src/c.py"]
+    # 用户规则排在 .gitignore 之后，可以用 '!' 重新包含
+    ws = workspace.Workspace(tree, excludes=workspace.DEFAULT_EXCLUDES + ["!keep.log"])
+    assert _walked(ws) == ["a.py", "keep.log", "src/c.py"]
+    ws = workspace.Workspace(tree, excludes=[], use_gitignore=False)
+    assert "node_modules/pkg/index.js" in _walked(ws)
+    assert "b.log" in _walked(ws)
+
+
+def test_is_excluded(tree):
+    ws = workspace.Workspace(tree)
+    assert not ws.is_excluded(tree)
+    assert ws.is_excluded(tree / "node_modules")
+    assert ws.is_excluded(tree / "node_modules" / "pkg" / "index.js")
+    assert ws.is_excluded(tree / "b.log")
+    assert not ws.is_excluded(tree / "src" / "c.py")
+    assert ws.is_excluded(tree.parent)
+    assert ws.relpath(tree / "src" / "c.py") == "src/c.py"
+
+    (tree / ".gitignore").write_text("*.py\n")
+    assert not ws.is_excluded(tree / "a.py")
+    ws.reload_rules()
+    assert ws.is_excluded(tree / "a.py")